@@ -0,0 +1,326 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+
+
+def register_bank(count):
+    """Names of a bank of `count` general-purpose registers: AX, BX, CX, DX, then R4, R5, ..."""
+    if count < 2:
+        raise ValueError(f"At least 2 registers are needed, got {count}")
+    return tuple(["AX", "BX", "CX", "DX"][:count] + [f"R{number}" for number in range(4, count)])
+
+
+# Registers and integer memory cells hold signed 64-bit values; arithmetic wraps around
+INTEGER_MIN, INTEGER_MAX = -(1 << 63), (1 << 63) - 1
+
+
+def wrap_integer(value):
+    """`value` reduced to a signed 64-bit integer, the way the machine stores it."""
+    return ((value - INTEGER_MIN) & 0xFFFFFFFFFFFFFFFF) + INTEGER_MIN
+
+
+# Types of memory slots; the VM keeps integers and strings in separate stores
+INTEGER_SLOT, STRING_SLOT = range(2)
+SLOT_TYPES = {"integer": INTEGER_SLOT, "string": STRING_SLOT}
+
+
+# Opcodes. CMP compares its operands for the conditional jump that follows it
+MOV, ADD, SUB, MUL, DIV, PUSH, POP, OUT, OUT_STR, CMP, JMP, JE, JNE, JL, JLE, JG, JGE = range(17)
+OPCODE_NAMES = ("MOV", "ADD", "SUB", "MUL", "DIV", "PUSH", "POP", "OUT", "OUT_STR", "CMP", "JMP", "JE", "JNE",
+                "JL", "JLE", "JG", "JGE")
+JUMPS = frozenset([JMP, JE, JNE, JL, JLE, JG, JGE])
+# Pseudo-instruction (LABEL, (label,)) placing a label before the next instruction; assemble()
+# records it in the label table instead of encoding it
+LABEL = len(OPCODE_NAMES)
+
+# Operand kinds. An operand is a (kind, value) pair: a register index, an integer, a memory
+# slot, an index into the constant pool or a label number
+NO_OPERAND, REGISTER, IMMEDIATE, ADDRESS, CONSTANT, TARGET = range(6)
+
+# Every instruction is 3 signed 32-bit words: the opcode and both operand kinds packed into the
+# first (opcode | first kind << 8 | second kind << 16), then the value of each operand
+INSTRUCTION_WORDS = 3
+WORD_TYPE = "i"
+WORD_MIN, WORD_MAX = -(1 << 31), (1 << 31) - 1
+
+# .pbc layout: header, one type byte per slot, label table, source map (runs, then line starts),
+# constant pool, padding to 4 bytes, little-endian code words
+MAGIC = b"MPBC"
+VERSION = 4
+# Header: magic, version, registers, slots, instructions, name constant (-1 for none), labels,
+# source map runs, source lines, constants, pool bytes
+HEADER = struct.Struct("<4sHHIIiIIIII")
+POOL_ENTRY = struct.Struct("<BI")  # tag, byte length
+STRING_CONSTANT, INTEGER_CONSTANT = range(2)
+LISTING_CHUNK_LINES = 4096  # Listing lines joined into each write by write_listing()
+
+
+class SourceMap:
+    """Source offset range [start, end) of the statement each instruction was generated for.
+
+    Consecutive instructions of one statement share a run, so the map holds three words per
+    run: the index of its first instruction, then the range. With the offsets at which source
+    lines start, it also names lines; neither the source nor its AST is kept.
+    """
+
+    def __init__(self, firsts=(), starts=(), ends=(), line_starts=()):
+        self.firsts = array(WORD_TYPE, firsts)
+        self.starts = array(WORD_TYPE, starts)
+        self.ends = array(WORD_TYPE, ends)
+        self.line_starts = array(WORD_TYPE, line_starts)
+
+    def __len__(self):
+        return len(self.firsts)
+
+    def add(self, index, start, end):
+        """Map instructions from `index` on to [start, end), until the next run."""
+        if self.firsts and self.starts[-1] == start and self.ends[-1] == end:
+            return
+        self.firsts.append(index)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def lookup(self, index):
+        """(start, end) of instruction `index`, or None if no statement generated it."""
+        run = bisect_right(self.firsts, index) - 1
+        if run < 0 or self.starts[run] < 0:
+            return None
+        return self.starts[run], self.ends[run]
+
+    def line(self, index):
+        """Line number of instruction `index`, or None."""
+        source_range = self.lookup(index)
+        if source_range is None or not self.line_starts:
+            return None
+        return bisect_right(self.line_starts, source_range[0])
+
+    def describe(self, index):
+        source_range = self.lookup(index)
+        if source_range is None:
+            return None
+        start = source_range[0]
+        if not self.line_starts:
+            return f"offset {start}"
+        line = bisect_right(self.line_starts, start)
+        return f"line {line}, column {start - self.line_starts[line - 1] + 1}"
+
+
+class BytecodeProgram:
+    """An encoded program: the code words, its constant pool and the machine it was generated for.
+
+    `code` is an array('i'), or a memoryview of a mapped .pbc file; both index to plain ints.
+    Jumps name a label; `labels` gives the index of the instruction each label stands before.
+    `source_map` is a SourceMap when the program was assembled with source positions.
+    """
+
+    def __init__(self, code, constants, register_count, slot_types, name=None, labels=(), source_map=None):
+        self.code = code
+        self.constants = constants
+        self.register_count = register_count
+        self.slot_types = bytes(slot_types)  # INTEGER_SLOT or STRING_SLOT for each memory slot
+        self.labels = array(WORD_TYPE, labels)
+        self.name = name
+        self.source_map = source_map
+        self.mapping = None  # The mmap a loaded program's code lives in
+
+    @property
+    def slot_count(self):
+        return len(self.slot_types)
+
+    def __len__(self):
+        return len(self.code) // INSTRUCTION_WORDS
+
+    def instruction(self, index):
+        start = index * INSTRUCTION_WORDS
+        return decode(*self.code[start:start + INSTRUCTION_WORDS])
+
+    def disassemble(self):
+        """The program as assembly text, one newline-terminated line per instruction."""
+        return list(self.iter_disassembly())
+
+    def iter_disassembly(self):
+        """Lazily yield the lines of disassemble()."""
+        registers = register_bank(self.register_count)
+        constants = self.constants
+        code = self.code
+
+        def render(kind, value):
+            if kind == REGISTER:
+                return registers[value]
+            elif kind == ADDRESS:
+                return f"${value:04X}"
+            elif kind == CONSTANT:
+                constant = constants[value]
+                return f'"{constant}"' if isinstance(constant, str) else str(constant)
+            elif kind == TARGET:
+                return f"L{value}"
+            return str(value)
+
+        labels_at = {}  # Instruction index -> labels placed before it
+        for label, index in enumerate(self.labels):
+            labels_at.setdefault(index, []).append(label)
+        if self.name is not None:
+            yield f"; Program: {self.name}\n"
+        for start in range(0, len(code), INSTRUCTION_WORDS):
+            for label in labels_at.get(start // INSTRUCTION_WORDS, ()):
+                yield f"L{label}:\n"
+            opcode, first_kind, first, second_kind, second = decode(*code[start:start + INSTRUCTION_WORDS])
+            operands = [render(first_kind, first)] if first_kind != NO_OPERAND else []
+            if second_kind != NO_OPERAND:
+                operands.append(render(second_kind, second))
+            yield f"{OPCODE_NAMES[opcode]} {', '.join(operands)}\n"
+        for label in labels_at.get(len(self), ()):
+            yield f"L{label}:\n"
+
+    def to_bytes(self):
+        pool = bytearray()
+        for constant in self.constants:
+            if isinstance(constant, str):
+                data = constant.encode("utf-8")
+                pool += POOL_ENTRY.pack(STRING_CONSTANT, len(data)) + data
+            else:
+                data = str(constant).encode("ascii")
+                pool += POOL_ENTRY.pack(INTEGER_CONSTANT, len(data)) + data
+        source_map = self.source_map if self.source_map is not None else SourceMap()
+        tables = array(WORD_TYPE, self.labels)
+        for table in (source_map.firsts, source_map.starts, source_map.ends, source_map.line_starts):
+            tables += table
+        code = array(WORD_TYPE, self.code)
+        if sys.byteorder != "little":
+            tables.byteswap()
+            code.byteswap()
+        tables = tables.tobytes()
+        pool += bytes(-(HEADER.size + self.slot_count + len(tables) + len(pool)) % 4)
+        name = -1 if self.name is None else self.constants.index(self.name)
+        header = HEADER.pack(MAGIC, VERSION, self.register_count, self.slot_count, len(self), name,
+                             len(self.labels), len(source_map), len(source_map.line_starts), len(self.constants),
+                             len(pool))
+        return header + self.slot_types + tables + bytes(pool) + code.tobytes()
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        """Map a .pbc file; the code words are read in place, without copying them."""
+        with open(path, "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, register_count, slot_count, count, name, label_count, run_count, line_count,
+         constant_count, pool_size) = HEADER.unpack_from(mapping, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a MiniPascal bytecode file")
+        if version != VERSION:
+            raise ValueError(f"Unsupported bytecode version {version} in {path}, expected {VERSION}")
+
+        slot_types = mapping[HEADER.size:HEADER.size + slot_count]
+        offset = HEADER.size + slot_count
+        table_size = (label_count + 3 * run_count + line_count) * 4
+        tables = array(WORD_TYPE, mapping[offset:offset + table_size])
+        if sys.byteorder != "little":
+            tables.byteswap()
+        labels = tables[:label_count]
+        source_map = None
+        if run_count:
+            runs = label_count + run_count
+            source_map = SourceMap(tables[label_count:runs], tables[runs:runs + run_count],
+                                   tables[runs + run_count:runs + 2 * run_count], tables[runs + 2 * run_count:])
+        constants = []
+        offset += table_size
+        for _ in range(constant_count):
+            tag, length = POOL_ENTRY.unpack_from(mapping, offset)
+            offset += POOL_ENTRY.size
+            text = mapping[offset:offset + length].decode("utf-8")
+            constants.append(text if tag == STRING_CONSTANT else int(text))
+            offset += length
+
+        code_start = HEADER.size + slot_count + table_size + pool_size
+        view = memoryview(mapping)[code_start:code_start + count * INSTRUCTION_WORDS * 4]
+        if sys.byteorder == "little":
+            code = view.cast(WORD_TYPE)
+        else:
+            code = array(WORD_TYPE, view.tobytes())
+            code.byteswap()
+        program = cls(code, constants, register_count, slot_types, None if name < 0 else constants[name], labels,
+                      source_map)
+        program.mapping = mapping
+        return program
+
+
+def write_listing(program, output, chunk_lines=LISTING_CHUNK_LINES):
+    """Write the disassembly listing of `program` to `output`, chunk_lines lines per write.
+
+    `output` is a path, next to which the bytecode is also saved as .pbc, or a text file object.
+    The listing is produced as it is written, so it is never held whole in memory.
+    """
+    if isinstance(output, (str, os.PathLike)):
+        program.save(os.path.splitext(output)[0] + ".pbc")
+        with open(output, "w") as f:
+            write_listing(program, f, chunk_lines)
+        return
+    chunk = []
+    for line in program.iter_disassembly():
+        chunk.append(line)
+        if len(chunk) >= chunk_lines:
+            output.write("".join(chunk))
+            chunk.clear()
+    if chunk:
+        output.write("".join(chunk))
+
+
+def decode(word, first, second):
+    """(opcode, first kind, first value, second kind, second value) of an encoded instruction."""
+    return word & 0xFF, (word >> 8) & 0xFF, first, word >> 16, second
+
+
+def assemble(instructions, register_count, slot_types, name=None, positions=None, line_starts=()):
+    """Encode (opcode, operands) instructions from CodeGenerator into a BytecodeProgram.
+
+    String literals, and integers that do not fit in a word, go to a deduplicated constant pool.
+    Labels are numbered from 0, as CodeGenerator.new_label() hands them out.
+    `positions` gives the source (start, end) range of each instruction, or None where there is
+    none; it becomes the program's SourceMap, which names lines with the given line_starts.
+    """
+    constants = []
+    pool = {}  # (type, value) -> index, so 1 and "1" stay apart
+
+    def constant(value):
+        key = (type(value), value)
+        index = pool.get(key)
+        if index is None:
+            index = pool[key] = len(constants)
+            constants.append(value)
+        return index
+
+    if name is not None:
+        constant(name)
+    placed = {}  # Label -> index of the instruction it stands before
+    source_map = SourceMap(line_starts=line_starts) if positions is not None else None
+    previous = ()  # Position of the previous instruction; a run shares one object
+    code = array(WORD_TYPE, bytes(4 * INSTRUCTION_WORDS * len(instructions)))
+    start = 0
+    for number, (opcode, operands) in enumerate(instructions):
+        if opcode == LABEL:
+            placed[operands[0][1]] = start // INSTRUCTION_WORDS
+            continue
+        if source_map is not None and positions[number] is not previous:
+            previous = positions[number]
+            source_map.add(start // INSTRUCTION_WORDS, *(previous or (-1, -1)))
+        word = opcode
+        shift = 8
+        position = start + 1
+        for kind, value in operands:
+            if kind == CONSTANT or (kind == IMMEDIATE and not WORD_MIN <= value <= WORD_MAX):
+                kind, value = CONSTANT, constant(value)
+            word |= kind << shift
+            code[position] = value
+            shift += 8
+            position += 1
+        code[start] = word
+        start += INSTRUCTION_WORDS
+    del code[start:]  # Room left by the labels
+    labels = [placed.get(label, -1) for label in range(max(placed, default=-1) + 1)]
+    return BytecodeProgram(code, constants, register_count, slot_types, name, labels, source_map)
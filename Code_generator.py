@@ -1,150 +1,346 @@
+from functools import partial
+
 from Semantic_analyzer import *
+from Bytecode import *
+
 
 class CodeGenerator:
-    def __init__(self, ast, symbol_table, output_file="output.txt"):
+    # Opcode of each integer operator; the semantic pass has already checked operand types.
+    # A comparison is a CMP, followed by the conditional jump of JUMP_IF_TRUE or JUMP_IF_FALSE
+    OPERATIONS = {"+": ADD, "-": SUB, "*": MUL, "/": DIV, "=": CMP, "<>": CMP, "<": CMP, "<=": CMP, ">": CMP,
+                  ">=": CMP}
+    JUMP_IF_TRUE = {"=": JE, "<>": JNE, "<": JL, "<=": JLE, ">": JG, ">=": JGE}
+    JUMP_IF_FALSE = {"=": JNE, "<>": JE, "<": JGE, "<=": JG, ">": JLE, ">=": JL}
+
+    def __init__(self, ast, symbol_table, output_file=None, register_count=4):
         self.ast = ast
         self.symbol_table = symbol_table
+        # Register operands of the bank; expression results end up in the first one, AX
+        self.registers = tuple((REGISTER, number) for number in range(len(register_bank(register_count))))
+        # Memory operand of every slot, built once instead of at each variable reference
+        self.addresses = [(ADDRESS, slot) for slot in range(len(symbol_table))]
+        # Integer slots the generated code keeps unnamed values in, after the symbols' ones
+        self.temporary_count = 0
+        self.free_temporaries = []
+        # (opcode, operands) pairs, operands being (kind, value) pairs; assemble() encodes them
         self.instructions = []
-        self.output_file = output_file
+        self.program_name = None
+        self.output_file = output_file  # Path or text file object for write_to_file()
         self.current_label = 0
+        # (index of the first instruction, source range) each time the statement being generated
+        # changes; positions() expands it to one range per instruction
+        self.source_runs = []
+        self.source_range = None
 
     def new_label(self):
+        """A new label operand; (LABEL, (label,)) places it, jumps take it as their operand."""
+        label = (TARGET, self.current_label)
         self.current_label += 1
-        return f"L{self.current_label}"
+        return label
+
+    def temporary(self):
+        """Address of an integer memory slot for a value the program does not name."""
+        if self.free_temporaries:
+            return self.free_temporaries.pop()
+        self.addresses.append((ADDRESS, len(self.addresses)))
+        self.temporary_count += 1
+        return self.addresses[-1]
+
+    def release(self, address):
+        """Make a temporary() slot available again."""
+        self.free_temporaries.append(address)
 
     def format_address(self, address):
         """Format the address as `$0000`, `$0001`, etc."""
         return f"${address:04X}"
 
+    def map_source(self, source_range):
+        """Attribute the instructions generated from now on to `source_range`."""
+        self.source_range = source_range
+        if self.source_runs and self.source_runs[-1][0] == len(self.instructions):
+            self.source_runs[-1] = (len(self.instructions), source_range)
+        else:
+            self.source_runs.append((len(self.instructions), source_range))
+
+    def positions(self):
+        """Source (start, end) range of each instruction, None for those outside any statement."""
+        positions = []
+        runs = self.source_runs + [(len(self.instructions), None)]
+        for (first, source_range), (following, _) in zip(runs, runs[1:]):
+            positions.extend([source_range] * (following - first))
+        return [None] * (len(self.instructions) - len(positions)) + positions
+
     def generate_code(self, node):
-        if node.type == "ProgramName":
-            # Add a comment with the program name
-            self.instructions.append(f"; Program: {node.value}\n")
+        """Generate the instructions of `node` and of the statements nested in it.
 
-        elif node.type == "Program":
-            for child in node.children:
-                self.generate_code(child)
+        Nested statements do not recurse: pending work is kept on an explicit stack of nodes,
+        instructions, and calls (partial objects) that follow the statement above them.
+        """
+        stack = [node]
+        while stack:
+            item = stack.pop()
+            if type(item) is tuple:  # An instruction (opcode, operands)
+                self.instructions.append(item)
+            elif type(item) is partial:
+                item()
+            elif item.end is not None:
+                # A statement: what it generates maps to its source range, what follows it to the
+                # enclosing statement's again
+                stack.append(partial(self.map_source, self.source_range))
+                self.map_source((item.position, item.end))
+                self.generate_statement(item, stack)
+            else:
+                self.generate_statement(item, stack)
+
+    def generate_statement(self, node, stack):
+        """Generate the instructions of `node` itself; its nested statements, and what follows
+        them, are pushed on the `stack` of generate_code."""
+        if node.kind == PROGRAM_NAME:
+            # Shown as a comment at the top of the listing
+            self.program_name = node.value
 
-        elif node.type == "Declarations":
+        elif node.kind == PROGRAM:
+            stack.extend(reversed(node.children))
+
+        elif node.kind == DECLARATIONS:
             # Variable declarations (not needed for assembly code generation)
             pass
 
-        elif node.type == "Block":
+        elif node.kind == BLOCK:
             # Generate code for statements in the block
-            for child in node.children:
-                self.generate_code(child)
+            stack.extend(reversed(node.children))
 
-        elif node.type == "Statements":
+        elif node.kind == STATEMENTS:
             # Generate code for each statement
-            for child in node.children:
-                self.generate_code(child)
-
-        elif node.type == "Assignment":
-            # Generate code for assignment
-            var_name = node.value
-            expression_code = self.generate_expression(node.children[0])
-            self.instructions.extend(expression_code)
-            variable_address = self.format_address(self.symbol_table[var_name]["address"])
-            self.instructions.append(f"MOV {variable_address}, AX\n")
-
-        elif node.type == "Write":
+            stack.extend(reversed(node.children))
+
+        elif node.kind == ASSIGNMENT:
+            # Generate code for assignment; node.slot was resolved by the semantic pass
+            if node.value_type == "string":
+                # Strings are copied memory to memory, registers only hold integers
+                self.instructions.append((MOV, (self.addresses[node.slot], self.operand(node.children[0]))))
+            else:
+                expression_code = self.generate_expression(node.children[0])
+                self.instructions.extend(expression_code)
+                self.instructions.append((MOV, (self.addresses[node.slot], self.registers[0])))
+
+        elif node.kind == WRITE:
             # Generate code for write (output)
             expr_node = node.children[0]
-            expr_type = self.symbol_table[expr_node.value]["type"] if expr_node.type == "Variable" else self.get_node_type(expr_node)
+            expr_type = node.value_type  # Annotated by the semantic pass
 
             if expr_type == "integer":
                 # Handle integer output
                 expr_code = self.generate_expression(expr_node)
                 self.instructions.extend(expr_code)
-                self.instructions.append("OUT AX\n")
+                self.instructions.append((OUT, (self.registers[0],)))
             elif expr_type == "string":
                 # Handle string output
-                if expr_node.type == "Variable":
-                    variable_address = self.format_address(self.symbol_table[expr_node.value]["address"])
-                    self.instructions.append(f"OUT_STR {variable_address}\n")
-                elif expr_node.type == "String":
-                    self.instructions.append(f'OUT_STR "{expr_node.value}"\n')
+                if expr_node.kind == VARIABLE:
+                    self.instructions.append((OUT_STR, (self.addresses[expr_node.slot],)))
+                elif expr_node.kind == STRING_LITERAL:
+                    self.instructions.append((OUT_STR, ((CONSTANT, expr_node.value),)))
+
+        elif node.kind == IF:
+            # Condition false: jump over the then branch, to the else branch if there is one
+            condition, then_branch = node.children[:2]
+            else_label = self.new_label()
+            self.generate_condition(condition, self.JUMP_IF_FALSE, else_label)
+            if len(node.children) > 2:
+                stack.append(partial(self.generate_else, node.children[2], else_label, stack))
+            else:
+                stack.append((LABEL, (else_label,)))
+            stack.append(then_branch)
+
+        elif node.kind == WHILE:
+            # The test is placed after the body, so each iteration takes a single jump
+            condition, body = node.children
+            body_label, test_label = self.new_label(), self.new_label()
+            self.instructions.append((JMP, (test_label,)))
+            self.instructions.append((LABEL, (body_label,)))
+            stack.append(partial(self.generate_condition, condition, self.JUMP_IF_TRUE, body_label))
+            stack.append((LABEL, (test_label,)))
+            stack.append(body)
+
+        elif node.kind == FOR:
+            self.generate_for(node, stack)
+
+    def generate_else(self, else_branch, else_label, stack):
+        """Once the then branch of an if is generated: jump over the else branch, which follows."""
+        end_label = self.new_label()
+        self.instructions.append((JMP, (end_label,)))
+        self.instructions.append((LABEL, (else_label,)))
+        stack.append((LABEL, (end_label,)))
+        stack.append(else_branch)
+
+    def generate_condition(self, condition, jumps, label):
+        """Compare the operands of `condition`, then jump to `label` on the jump it maps to in `jumps`."""
+        self.instructions.extend(self.generate_expression(condition))
+        self.instructions.append((jumps[condition.value], (label,)))
+
+    def generate_for(self, node, stack):
+        """for i := start to limit: the limit is evaluated once, and i is only incremented while
+        below it, so a limit of the largest integer does not overflow. The body, and the test
+        after it, are left on the `stack` of generate_code."""
+        start, limit, body = node.children
+        variable = self.addresses[node.slot]
+        accumulator = self.registers[0]
+        self.instructions.extend(self.generate_expression(start))
+        self.instructions.append((MOV, (variable, accumulator)))
+        temporary = None
+        if limit.kind == NUMBER_LITERAL:
+            bound = self.operand(limit)
+        else:
+            self.instructions.extend(self.generate_expression(limit))
+            bound = temporary = self.temporary()
+            self.instructions.append((MOV, (bound, accumulator)))
+
+        next_label, body_label, exit_label = self.new_label(), self.new_label(), self.new_label()
+        self.instructions.append((MOV, (accumulator, variable)))
+        self.instructions.append((CMP, (accumulator, bound)))
+        self.instructions.append((JG, (exit_label,)))
+        self.instructions.append((JMP, (body_label,)))
+        self.instructions.append((LABEL, (next_label,)))  # Only reached from the JL: AX holds i
+        self.instructions.append((ADD, (accumulator, (IMMEDIATE, 1))))
+        self.instructions.append((MOV, (variable, accumulator)))
+        self.instructions.append((LABEL, (body_label,)))
+        if temporary is not None:
+            stack.append(partial(self.release, temporary))
+        stack.append((LABEL, (exit_label,)))
+        stack.append((JL, (next_label,)))
+        stack.append((CMP, (accumulator, bound)))
+        stack.append((MOV, (accumulator, variable)))
+        stack.append(body)
 
     def generate_expression(self, node):
-        """Generate assembly code for an expression."""
-        if node.type == "Number":
-            return [f"MOV AX, {node.value}\n"]
-
-        elif node.type == "String":
-            # Load string literal into a specific register or memory
-            return [f'MOV AX, "{node.value}"\n']
-
-        elif node.type == "Variable":
-            variable_address = self.format_address(self.symbol_table[node.value]["address"])
-            return [f"MOV AX, {variable_address}\n"]
-
-        elif node.type == "BinaryOperation":
-            left_code = self.generate_expression(node.children[0])
-            right_code = self.generate_expression(node.children[1])
-            operator = node.value
-
-            if operator == "+":
-                left_type = self.get_node_type(node.children[0])
-                right_type = self.get_node_type(node.children[1])
-                if left_type == "integer" and right_type == "integer":
-                    # Integer addition
-                    code = left_code
-                    code.append("PUSH AX\n")  # Save left value
-                    code.extend(right_code)
-                    code.append("POP BX\n")  # Retrieve left value
-                    code.append("ADD AX, BX\n")  # Add integers
-                    return code
-                else:
-                    raise ValueError("Type mismatch in binary operation")
-
-            elif operator == "*":
-                # Handle integer multiplication
-                code = left_code
-                code.append("PUSH AX\n")  # Save left value
-                code.extend(right_code)
-                code.append("POP BX\n")  # Retrieve left value
-                code.append("MUL AX, BX\n")  # Multiply integers
-                return code
-
-            elif operator == "-":
-                # Handle integer subtraction
-                code = left_code
-                code.append("PUSH AX\n")  # Save left value
-                code.extend(right_code)
-                code.append("POP BX\n")  # Retrieve left value
-                code.append("SUB AX, BX\n")  # Subtract integers
-                return code
-
-            elif operator == "/":
-                # Handle integer division
-                code = left_code
-                code.append("PUSH AX\n")  # Save left value
-                code.extend(right_code)
-                code.append("POP BX\n")  # Retrieve left value
-                code.append("DIV AX, BX\n")  # Divide AX by BX
-                return code
+        """Generate the instructions that leave the value of an expression in AX.
+
+        Registers are allocated Sethi-Ullman style: the operand needing more registers is
+        evaluated first, leaf right operands are used in place, and values are only spilled
+        with PUSH/POP when both operands need more registers than are left. Pending work is
+        kept on an explicit stack of (node, registers) pairs and ready instructions, so deep
+        expressions do not recurse.
+        """
+        needs = self.register_needs(node)
+        code = []
+        stack = [(node, self.registers)]
+        while stack:
+            item = stack.pop()
+            node, registers = item
+            if type(node) is int:  # An instruction (opcode, operands) scheduled after an operand
+                code.append(item)
+                continue
+
+            target = registers[0]
+            if node.kind != BINARY_OPERATION:
+                code.append((MOV, (target, self.operand(node))))
+                continue
+
+            operation = self.OPERATIONS.get(node.value)
+            if operation is None:
+                raise ValueError(f"Unsupported operator: {node.value}")
+            left, right = node.children
+            if right.kind != BINARY_OPERATION:
+                # OP target, right: the leaf is read straight from memory or the instruction
+                stack.append((operation, (target, self.operand(right))))
+                stack.append((left, registers))
+                continue
+
+            left_need, right_need = needs[id(left)], needs[id(right)]
+            available = len(registers)
+            spare = registers[1]
+            stack.append((operation, (target, spare)))
+            if left_need >= right_need and right_need < available:
+                # Left into target, then right into the remaining registers
+                stack.append((right, registers[1:]))
+                stack.append((left, registers))
+            elif right_need > left_need and left_need < available:
+                # Right first into the spare register, then left without touching it
+                stack.append((left, (target,) + registers[2:]))
+                stack.append((right, (spare, target) + registers[2:]))
             else:
-                raise ValueError(f"Unsupported operator: {operator}")
+                # Both sides need every register: park the right value on the stack
+                stack.append((POP, (spare,)))
+                stack.append((left, registers))
+                stack.append((PUSH, (target,)))
+                stack.append((right, registers))
+        return code
 
+    def register_needs(self, node):
+        """Registers each operation node needs (Sethi-Ullman numbers), keyed by id(node)."""
+        needs = {}
+        stack = [(node, False)]
+        while stack:
+            node, operands_done = stack.pop()
+            if node.kind != BINARY_OPERATION:
+                needs[id(node)] = 1
+                continue
+            left, right = node.children
+            if not operands_done:
+                stack.append((node, True))
+                stack.append((right, False))
+                stack.append((left, False))
+                continue
+            left_need = needs[id(left)]
+            if right.kind != BINARY_OPERATION:
+                needs[id(node)] = left_need  # The leaf is used in place
+            else:
+                right_need = needs[id(right)]
+                needs[id(node)] = left_need + 1 if left_need == right_need else max(left_need, right_need)
+        return needs
+
+    def operand(self, node):
+        """Operand of a leaf: an immediate, a memory address or a string constant."""
+        if node.kind == NUMBER_LITERAL:
+            return IMMEDIATE, int(node.value)
+        elif node.kind == VARIABLE:
+            return self.addresses[node.slot]
+        elif node.kind == STRING_LITERAL:
+            return CONSTANT, node.value
         else:
             raise ValueError(f"Unsupported node type for expression: {node.type}")
 
-    def get_node_type(self, node):
-        if node.type == "Number":
-            return "integer"
-        elif node.type == "String":
-            return "string"
-        elif node.type == "Variable":
-            return self.symbol_table[node.value]["type"]
-        elif node.type == "BinaryOperation":
-            left_type = self.get_node_type(node.children[0])
-            right_type = self.get_node_type(node.children[1])
-            if left_type == right_type:
-                return left_type
+    def expression_cost(self, node):
+        """Number of instructions generate_expression emits for `node`, counted without emitting
+        them: one per operation and per leaf not used in place, plus a PUSH and a POP per spill."""
+        needs = self.register_needs(node)
+        cost = 0
+        stack = [(node, len(self.registers))]
+        while stack:
+            node, available = stack.pop()
+            cost += 1
+            if node.kind != BINARY_OPERATION:
+                continue
+            left, right = node.children
+            if right.kind != BINARY_OPERATION:
+                stack.append((left, available))  # The leaf is used in place
+                continue
+            left_need, right_need = needs[id(left)], needs[id(right)]
+            if left_need >= right_need and right_need < available:
+                stack.append((left, available))
+                stack.append((right, available - 1))
+            elif right_need > left_need and left_need < available:
+                stack.append((right, available))
+                stack.append((left, available - 1))
             else:
-                raise ValueError(f"Type mismatch in binary operation: {left_type} vs {right_type}")
+                cost += 2
+                stack.append((left, available))
+                stack.append((right, available))
+        return cost
+
+    def assemble(self, positions=None, line_starts=()):
+        """Encode the instructions, as they are now, into a BytecodeProgram; with the source range
+        of each instruction (see positions()), it gets a SourceMap."""
+        # Types other than integer are kept by reference, like strings
+        slot_types = [SLOT_TYPES.get(symbol.type, STRING_SLOT) for symbol in self.symbol_table]
+        slot_types += [INTEGER_SLOT] * self.temporary_count
+        return assemble(self.instructions, len(self.registers), slot_types, self.program_name, positions,
+                        line_starts)
 
-    def write_to_file(self):
-        with open(self.output_file, "w") as f:
-            f.writelines(self.instructions)
+    def write_to_file(self, program=None):
+        """Write the disassembly listing to output_file; if it is a path, the bytecode is saved next
+        to it as .pbc."""
+        if program is None:
+            program = self.assemble()
+        write_listing(program, self.output_file)
 
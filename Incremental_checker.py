@@ -0,0 +1,408 @@
+import re
+from itertools import islice
+
+from Semantic_analyzer import *
+
+
+class Diagnostic:
+    """An error of the source text [start, end)."""
+    __slots__ = ("start", "end", "message")
+
+    def __init__(self, start, end, message):
+        self.start = start
+        self.end = end
+        self.message = message
+
+    def __repr__(self):
+        return f"Diagnostic({self.start}, {self.end}, {self.message!r})"
+
+
+class Region:
+    """A top-level statement of the program block, from its first token up to the next one's.
+
+    Only `start` moves when text before the region is edited; its token span and its AST are
+    kept relative to it. A statement that does not parse has no AST, only a message.
+    """
+    __slots__ = ("start", "first", "last", "statement", "names", "message")
+
+    def __init__(self, start, first, last, statement, message):
+        self.start = start
+        self.first = first - start  # Its first token, and the end of its last one
+        self.last = last - start
+        self.statement = statement
+        self.names = referenced_names(statement) if statement is not None else ()
+        self.message = message
+
+
+class Locations:
+    """Stands in for a LineIndex while parsing: a location in a message is written as an offset
+    from `base`, the start of the region being parsed, and only turned into a line and column
+    by render(), since edits above the region move it."""
+    MARK = re.compile("\0(-?\\d+)\0")
+
+    def __init__(self):
+        self.base = 0
+
+    def describe(self, offset):
+        return f"\0{offset - self.base}\0"
+
+    def render(self, message, base, line_index):
+        return self.MARK.sub(lambda match: line_index.describe(base + int(match.group(1))), message)
+
+
+def referenced_names(statement):
+    """Names of the variables a statement reads or assigns."""
+    names = set()
+    stack = [statement]
+    while stack:
+        node = stack.pop()
+        if node.kind in (VARIABLE, ASSIGNMENT, FOR):
+            names.add(node.value)
+        stack.extend(node.children)
+    return names
+
+
+def clear_annotations(statement):
+    """Drop what the semantic pass annotated, so it checks the statement again from scratch."""
+    stack = [statement]
+    while stack:
+        node = stack.pop()
+        node.value_type = node.slot = None
+        stack.extend(node.children)
+
+
+def joins_words(text, offset):
+    """Whether the characters on both sides of `offset` belong to one word or number."""
+    return 0 < offset < len(text) and text[offset - 1].isalnum() and text[offset].isalnum()
+
+
+def token_diagnostic(token, end, error):
+    """Diagnostic of a parse error at `token`, or at `end` for the end of the input."""
+    if token is None:
+        return Diagnostic(end, end, str(error))
+    return Diagnostic(token[2], token_end(token), str(error))
+
+
+def merge_edits(edit, position, removed, added):
+    """Combine a pending edit with the next one, as one (start, old end, new end) edit.
+
+    `edit` is in offsets of the text before any of them, or None; position, removed and added
+    are those of QTextDocument.contentsChange, in offsets of the text after it.
+    """
+    if edit is None:
+        return position, position + removed, position + added
+    start, old_end, new_end = edit
+    end = max(new_end, position + removed)
+    return min(start, position), old_end + end - new_end, end - removed + added
+
+
+class IncrementalChecker:
+    """Syntax and semantic diagnostics of a source that is being edited, updated per edit.
+
+    The program is split into its header (name and declarations, up to the 'begin' of the
+    main block), one Region per top-level statement of that block, and its 'end.'. An edit
+    inside the block re-lexes and reparses only the regions it touches, plus the one after them
+    so a removed ';' or a new 'else' is seen, and checks only the new statements. An edit of the
+    declarations re-checks the statements that use a name whose type changed. Anything else, or
+    anything that cannot be confined to those regions, checks the whole source again.
+    """
+
+    def __init__(self):
+        self.analyser = LexicalAnalyser()
+        self.text = ""
+        self.valid = False  # Whether the regions describe self.text, so it can be edited
+        self.begin = 0  # Offset of the main block's 'begin'
+        self.body_start = 0  # Just past it
+        self.trailer_start = 0  # Offset of the program's final 'end'
+        self.regions = []
+        self.failing = set()  # Regions with a message
+        self.users = {}  # name -> regions whose statement uses it
+        self.types = {}  # name -> declared type
+        self.declared = False  # Whether the header parsed; statements are only checked against it then
+        self.semantic = Semantic_analyzer(None)
+        self.locations = Locations()
+        self.header_diagnostics = []
+        # What the last update did
+        self.full = False
+        self.reparsed = 0
+        self.rechecked = 0
+
+    def diagnostics(self):
+        """Diagnostics of the current text, in source order."""
+        line_index = LineIndex(self.text)
+        render = self.locations.render
+        found = [Diagnostic(region.start + region.first, region.start + region.last,
+                            render(region.message, region.start, line_index)) for region in self.failing]
+        found.extend(Diagnostic(diagnostic.start, diagnostic.end, render(diagnostic.message, 0, line_index))
+                     for diagnostic in self.header_diagnostics)
+        found.sort(key=lambda diagnostic: diagnostic.start)
+        return found
+
+    def update(self, text, edit=None):
+        """Bring the diagnostics up to date with `text`, which differs from the previous text by
+        `edit` (see merge_edits); without an edit, the whole text is checked."""
+        self.reparsed = self.rechecked = 0
+        if edit is not None and self.valid and len(text) == len(self.text) + edit[2] - edit[1]:
+            start, old_end, _ = edit
+            if start >= self.body_start and old_end <= self.trailer_start:
+                if self.update_body(text, edit):
+                    return self.diagnostics()
+            elif old_end <= self.begin:
+                if self.update_header(text, edit):
+                    return self.diagnostics()
+        self.check(text)
+        return self.diagnostics()
+
+    def check(self, text):
+        """Check the whole text."""
+        self.full = True
+        self.text = text
+        self.valid = False
+        self.regions = []
+        self.failing = set()
+        self.users = {}
+        self.header_diagnostics = []
+        locations = self.locations
+        locations.base = 0
+        tokens = []
+        try:
+            tokens.extend(self.analyser.iter_tokens(text))
+        except ValueError as error:
+            # What follows the last token is unreadable, to the end for an unclosed string or comment
+            start = token_end(tokens[-1]) if tokens else 0
+            self.header_diagnostics.append(Diagnostic(start, len(text), str(error)))
+            return
+        parser = Parser(tokens, locations)
+        try:
+            header = parser.inspect_header()
+            _, _, self.begin = parser.expect(KEYWORD, "begin")
+            body_index = parser.position
+        except ValueError as error:
+            self.header_diagnostics.append(token_diagnostic(parser.current_token(), len(text), error))
+            # The block is taken to start at the next 'begin', and only parsed: there are no
+            # declarations to check its statements against
+            body_index = next((index + 1 for index in range(parser.position, len(tokens))
+                               if tokens[index][:2] == (KEYWORD, "begin")), None)
+            if body_index is None:
+                return
+            header = None
+            self.begin = tokens[body_index - 1][2]
+        self.body_start = self.begin + len("begin")
+        self.declared = header is not None
+        if header is not None:
+            self.declare(header, self.begin)
+        else:
+            self.types = {}
+
+        body = tokens[body_index:]
+        has_trailer = (len(body) >= 2 and body[-2][:2] == (KEYWORD, "end") and body[-1][:2] == (DELIMITER, ".")
+                       and body[-2][2] >= self.body_start)
+        if has_trailer:
+            body.pop()  # The 'end' stays, as the statement that follows the last one
+            self.trailer_start = body[-1][2]
+            count = len(body) - 1
+        else:
+            self.trailer_start = len(text)
+            count = len(body)
+            self.header_diagnostics.append(
+                Diagnostic(len(text), len(text), "Syntax Error: Expected 'end.' at the end of the program"))
+        regions = self.parse_regions(body, count, self.body_start, True, strict=False)
+        self.regions = regions
+        self.reparsed = len(regions)
+        self.add_regions(regions)
+        self.valid = has_trailer
+
+    def update_body(self, text, edit):
+        """Reparse the regions an edit of the block touches; False if the whole text needs it."""
+        start, old_end, new_end = edit
+        delta = new_end - old_end
+        regions = self.regions
+        # The regions from the one holding `start` to the one after the one holding `old_end`;
+        # an edit right before a region's first token changes that token
+        first = max(self.region_at(start), 0)
+        if first and regions[first - 1] in self.failing:
+            # Its message may name the token it failed at, which can be the first one edited
+            first -= 1
+        last = min(self.region_at(old_end) + 2, len(regions))
+        slice_start = regions[first].start if regions else self.body_start
+        followed = last < len(regions)
+        slice_end = (regions[last].start if followed else self.trailer_start) + delta
+        if joins_words(text, slice_start) or joins_words(text, slice_end):
+            return False  # What was typed joins the 'begin' or the 'end' of the block into a word
+
+        try:
+            tokens = [(kind, value, position + slice_start) for kind, value, position
+                      in self.analyser.iter_tokens(text[slice_start:slice_end])]
+            # The first token after the slice, which a statement ending in it must be followed by
+            following = next(self.analyser.iter_tokens(text[slice_end:slice_end + 256]), None)
+        except ValueError:
+            return False  # An unclosed string or comment, whose end lies outside the slice
+        if following is None or following[2] != 0:
+            return False
+        count = len(tokens)
+        tokens.append((following[0], following[1], following[2] + slice_end))
+        new_regions = self.parse_regions(tokens, count, slice_start, not followed, strict=True)
+        if new_regions is None:
+            return False  # A statement now runs past the slice
+
+        self.remove_regions(regions[first:last])
+        regions[first:last] = new_regions
+        for region in islice(regions, first + len(new_regions), None):
+            region.start += delta
+        self.trailer_start += delta
+        self.text = text
+        self.full = False
+        self.reparsed = len(new_regions)
+        self.add_regions(new_regions)
+        return True
+
+    def update_header(self, text, edit):
+        """Parse the declarations again after an edit before the main 'begin', and re-check the
+        statements using a name whose type changed; False if the whole text needs it."""
+        if not self.declared:
+            return False  # The statements were never checked against declarations
+        delta = edit[2] - edit[1]
+        begin = self.begin + delta
+        if joins_words(text, begin):
+            return False  # What was typed joins the 'begin' into another word
+        try:
+            tokens = list(self.analyser.iter_tokens(text[:begin]))
+        except ValueError:
+            return False
+        self.locations.base = 0
+        parser = Parser(tokens, self.locations)
+        try:
+            header = parser.inspect_header()
+            if parser.current_token() is not None:
+                return False  # Part of the header is not a declaration, or the 'begin' moved
+        except ValueError:
+            return False  # Where the header ends, and so where the block starts, is unknown
+        for region in self.regions:
+            region.start += delta
+        self.begin = begin
+        self.body_start += delta
+        self.trailer_start += delta
+        self.text = text
+        self.full = False
+        self.header_diagnostics = []
+        previous = self.types
+        self.declare(header, begin)
+        changed = {name for name in previous.keys() | self.types.keys()
+                   if previous.get(name) != self.types.get(name)}
+        stale = set()
+        for name in changed:
+            stale.update(self.users.get(name, ()))
+        for region in stale:
+            clear_annotations(region.statement)
+            self.check_region(region)
+        self.rechecked = len(stale)
+        return True
+
+    def region_at(self, offset):
+        """Index of the last region starting at or before `offset`, -1 if none does."""
+        regions = self.regions
+        low, high = 0, len(regions)
+        while low < high:
+            middle = (low + high) // 2
+            if regions[middle].start <= offset:
+                low = middle + 1
+            else:
+                high = middle
+        return low - 1
+
+    def declare(self, header, begin):
+        """Build the symbol table from the declarations of the header."""
+        self.semantic.symbol_table = SymbolTable()
+        for child in header.children:
+            if child.kind == DECLARATIONS:
+                try:
+                    self.semantic.evaluate(child)
+                except ValueError as error:
+                    self.header_diagnostics.append(Diagnostic(child.position or 0, begin, str(error)))
+        self.types = {symbol.name: symbol.type for symbol in self.semantic.symbol_table}
+
+    def parse_regions(self, tokens, count, start, ends_program, strict):
+        """Regions of the statements in tokens[:count], the first one starting at `start`.
+
+        tokens[count] is the token after them, before which the last statement needs a ';'
+        unless `ends_program`, that token being the program's 'end'. A statement that does not parse is reported, and
+        skipped up to the next ';' outside of any begin...end. If a statement runs past
+        tokens[count], None is returned when `strict`, else it is reported.
+        """
+        regions = []
+        index = 0
+        base = 0  # Index of the parser's first token
+        locations = self.locations
+        parser = Parser(tokens, locations)
+        while index < count:
+            first = tokens[index]
+            region_start = locations.base = start if not regions else first[2]
+            try:
+                statement = parser.inspect_statement()
+                end = base + parser.position
+                if end > count:
+                    if strict:
+                        return None
+                    raise ValueError(f"Syntax Error: Block at {locations.describe(first[2])} "
+                                     f"is not closed before the end of the program")
+                if end < count or not ends_program:
+                    parser.expect(DELIMITER, ";")
+                    end += 1
+                regions.append(Region(region_start, first[2], statement.end, statement, None))
+                index = end
+            except ValueError as error:
+                index = self.skip_statement(tokens, index, count)
+                if index is None or base + parser.position > count:
+                    # Where the statement ends is past tokens[count], unless that ends the program
+                    if strict and not (index is None and ends_program):
+                        return None
+                    index = count
+                regions.append(Region(region_start, first[2], token_end(tokens[index - 1]), None, str(error)))
+                base = index
+                parser = Parser(islice(tokens, index, None), locations)
+        return regions
+
+    def skip_statement(self, tokens, index, count):
+        """Index just past the ';' ending the statement at tokens[index], None if there is none
+        before tokens[count]."""
+        depth = 0
+        while index < count:
+            kind, value, _ = tokens[index]
+            index += 1
+            if kind == KEYWORD:
+                if value == "begin":
+                    depth += 1
+                elif value == "end" and depth:
+                    depth -= 1
+            elif kind == DELIMITER and value == ";" and not depth:
+                return index
+        return None
+
+    def add_regions(self, regions):
+        users = self.users
+        for region in regions:
+            for name in region.names:
+                users.setdefault(name, set()).add(region)
+            self.check_region(region)
+        self.rechecked += len(regions)
+
+    def remove_regions(self, regions):
+        users = self.users
+        for region in regions:
+            for name in region.names:
+                users[name].discard(region)
+            self.failing.discard(region)
+
+    def check_region(self, region):
+        """Run the semantic pass over the region's statement."""
+        if region.statement is not None and self.declared:
+            self.semantic.loop_slots.clear()
+            try:
+                self.semantic.evaluate(region.statement)
+                region.message = None
+            except (ValueError, TypeError, ZeroDivisionError) as error:
+                region.message = str(error)
+        if region.message is None:
+            self.failing.discard(region)
+        else:
+            self.failing.add(region)
@@ -1,170 +1,646 @@
+import sys
+import time
+from array import array
+from itertools import accumulate
+
 from Code_generator import *
+from Output_sinks import ListSink
+
+# Operand kinds after decoding: a register, a cell of the integer or string store, or a value
+# (immediates and constants are resolved when the program is loaded, labels to their program counter)
+IN_REGISTER, IN_INTEGERS, IN_STRINGS, IS_VALUE = range(4)
+
+
+# Instructions run between two checks of a Budget; checks are only made on taken jumps, since
+# code without jumps always ends
+CHECK_INTERVAL = 1 << 14
+
+
+class Budget:
+    """Limits on one run of a program: instructions executed, seconds elapsed, and a cancel()
+    that another thread may call. Exceeding one raises RuntimeError at the next check().
+
+    `progress`, if given, is called with the instructions executed so far at every check
+    (None when running as Python, which does not count them).
+    """
+
+    def __init__(self, max_steps=None, time_limit=None, progress=None):
+        self.max_steps = max_steps
+        self.time_limit = time_limit
+        self.progress = progress
+        self.deadline = None
+        self.cancelled = False
+
+    def start(self):
+        """Start the clock, unless it already runs."""
+        if self.deadline is None and self.time_limit is not None:
+            self.deadline = time.monotonic() + self.time_limit
+
+    def cancel(self):
+        self.cancelled = True
+
+    def check(self, steps=None):
+        if self.cancelled:
+            raise RuntimeError("Execution cancelled")
+        if self.max_steps is not None and steps is not None and steps >= self.max_steps:
+            raise RuntimeError(f"Instruction budget of {self.max_steps} exceeded")
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise RuntimeError(f"Time limit of {self.time_limit}s exceeded")
+        if self.progress is not None:
+            self.progress(steps)
+
+
+class Profile:
+    """Which instructions a run executed, and how often.
+
+    Execution only leaves a straight line at a taken jump, so the run counts how often each
+    stretch [first, end) of consecutive instructions was executed, one count per taken jump.
+    Counts per instruction, opcode and source line are derived from them once it is over.
+    """
+
+    def __init__(self):
+        self.runs = {}  # (first, end) -> times executed
+
+    def add(self, first, end):
+        if end > first:
+            key = first, end
+            self.runs[key] = self.runs.get(key, 0) + 1
+
+    def instruction_counts(self, size):
+        """Times each of the `size` instructions was executed."""
+        changes = [0] * (size + 1)
+        for (first, end), times in self.runs.items():
+            changes[first] += times
+            changes[end] -= times
+        return list(accumulate(changes[:size]))
+
+    def opcode_counts(self, program):
+        """Opcode name -> instructions with that opcode executed, most executed first."""
+        counts = {}
+        code = program.code
+        for index, times in enumerate(self.instruction_counts(len(program))):
+            if times:
+                name = OPCODE_NAMES[code[index * INSTRUCTION_WORDS] & 0xFF]
+                counts[name] = counts.get(name, 0) + times
+        return dict(sorted(counts.items(), key=lambda item: -item[1]))
+
+    def line_counts(self, program):
+        """Source line -> instructions executed for its statements, hottest first; lines are
+        those of the program's SourceMap, and instructions it places on no line are left out."""
+        source_map = program.source_map
+        counts = {}
+        if source_map is None:
+            return counts
+        for index, times in enumerate(self.instruction_counts(len(program))):
+            if times:
+                line = source_map.line(index)
+                if line is not None:
+                    counts[line] = counts.get(line, 0) + times
+        return dict(sorted(counts.items(), key=lambda item: -item[1]))
+
 
 class Interpreter:
-    def __init__(self, assembly_code, symbol_table):
-        self.assembly_code = assembly_code
-        self.symbol_table = symbol_table
-        self.memory = [None] * len(symbol_table)  # Memory represented as a list, supporting both integers and strings
-        self.registers = {"AX": None, "BX": None, "SP": []}  # Registers, allowing for mixed types
-        self.program_counter = 0  # Simulate the program coungiter
-        self.outputs = []
+    def __init__(self, program, budget=None, profile=None, sink=None):
+        # A BytecodeProgram, from CodeGenerator.assemble() or BytecodeProgram.load()
+        self.program = program
+        self.budget = budget  # Budget checked while executing, or None for no limit
+        self.profile = profile  # Profile recording what is executed, or None
+        # Output sink the values written go to (see Output_sinks); a ListSink keeps them all
+        self.sink = sink if sink is not None else ListSink()
+        self.write = self.sink.write
+        self.steps = 0  # Instructions executed so far
+        self.budget_at = sys.maxsize  # Instruction count at which the budget is checked next
+        # Typed memory: integer slots are packed in a signed 64-bit array, strings are kept by
+        # reference in a list. locations maps every slot to (store kind, index in that store)
+        self.locations = []
+        integer_count = string_count = 0
+        for slot_type in program.slot_types:
+            if slot_type == INTEGER_SLOT:
+                self.locations.append((IN_INTEGERS, integer_count))
+                integer_count += 1
+            else:
+                self.locations.append((IN_STRINGS, string_count))
+                string_count += 1
+        self.integers = array("q", bytes(8 * integer_count))  # Integer variables start at 0
+        self.strings = [None] * string_count
+        # General-purpose registers (same bank as CodeGenerator's), indexed by number; they only hold integers
+        self.registers = [0] * program.register_count
+        self.stack = []
+        self.program_counter = 0  # Simulate the program counter
+        self.comparison = 0  # Left minus right operand of the last CMP, which the conditional jumps test
+        self.handlers = {MOV: self.mov, ADD: self.add, SUB: self.sub, MUL: self.mul, DIV: self.div,
+                         PUSH: self.push, POP: self.pop, OUT: self.out, OUT_STR: self.out_str, CMP: self.cmp,
+                         JMP: self.jmp, JE: self.je, JNE: self.jne, JL: self.jl, JLE: self.jle, JG: self.jg,
+                         JGE: self.jge}
+        # Fast handler for each (opcode, destination kind, source kind); see load()
+        self.dispatch = {
+            (MOV, IN_REGISTER, IN_REGISTER): self.mov_register_register,
+            (MOV, IN_REGISTER, IN_INTEGERS): self.mov_register_memory,
+            (MOV, IN_REGISTER, IS_VALUE): self.mov_register_value,
+            (MOV, IN_INTEGERS, IN_REGISTER): self.mov_memory_register,
+            (MOV, IN_INTEGERS, IN_INTEGERS): self.mov_memory_memory,
+            (MOV, IN_INTEGERS, IS_VALUE): self.mov_memory_value,
+            (MOV, IN_STRINGS, IN_STRINGS): self.mov_string_string,
+            (MOV, IN_STRINGS, IS_VALUE): self.mov_string_value,
+            (ADD, IN_REGISTER, IN_REGISTER): self.add_register,
+            (ADD, IN_REGISTER, IN_INTEGERS): self.add_memory,
+            (ADD, IN_REGISTER, IS_VALUE): self.add_value,
+            (SUB, IN_REGISTER, IN_REGISTER): self.sub_register,
+            (SUB, IN_REGISTER, IN_INTEGERS): self.sub_memory,
+            (SUB, IN_REGISTER, IS_VALUE): self.sub_value,
+            (MUL, IN_REGISTER, IN_REGISTER): self.mul_register,
+            (MUL, IN_REGISTER, IN_INTEGERS): self.mul_memory,
+            (MUL, IN_REGISTER, IS_VALUE): self.mul_value,
+            (DIV, IN_REGISTER, IN_REGISTER): self.div_register,
+            (DIV, IN_REGISTER, IN_INTEGERS): self.div_memory,
+            (DIV, IN_REGISTER, IS_VALUE): self.div_value,
+            (PUSH, None, IN_REGISTER): self.push_register,
+            (PUSH, None, IN_INTEGERS): self.push_memory,
+            (PUSH, None, IS_VALUE): self.push_value,
+            (POP, IN_REGISTER, None): self.pop_register,
+            (OUT, None, IN_REGISTER): self.out_register,
+            (OUT, None, IN_INTEGERS): self.out_memory,
+            (OUT, None, IS_VALUE): self.out_value,
+            (OUT_STR, None, IN_STRINGS): self.out_string,
+            (OUT_STR, None, IS_VALUE): self.out_value,
+            (CMP, IN_REGISTER, IN_REGISTER): self.cmp_register,
+            (CMP, IN_REGISTER, IN_INTEGERS): self.cmp_memory,
+            (CMP, IN_REGISTER, IS_VALUE): self.cmp_value,
+            (JMP, None, IS_VALUE): self.jmp_to,
+            (JE, None, IS_VALUE): self.je_to,
+            (JNE, None, IS_VALUE): self.jne_to,
+            (JL, None, IS_VALUE): self.jl_to,
+            (JLE, None, IS_VALUE): self.jle_to,
+            (JG, None, IS_VALUE): self.jg_to,
+            (JGE, None, IS_VALUE): self.jge_to,
+        }
+        self.decoded = None  # (handler, first, second) per instruction, built by load()
+
+    @property
+    def outputs(self):
+        """Values written so far, as far as the sink keeps them."""
+        return self.sink.values
+
+    def load(self):
+        """Decode the program once into (handler, first, second) entries.
+
+        The handler is chosen by opcode and operand kinds, and immediates and constants are
+        resolved to their value, so executing an entry needs no decoding or operand checks.
+        Identical instructions share one entry, and are only decoded the first time.
+        """
+        code = self.program.code
+        entries = {}
+        decoded = []
+        for words in zip(code[0::INSTRUCTION_WORDS], code[1::INSTRUCTION_WORDS], code[2::INSTRUCTION_WORDS]):
+            entry = entries.get(words)
+            if entry is None:
+                entry = entries[words] = self.decode_entry(decode(*words))
+            decoded.append(entry)
+        self.decoded = decoded
+        return decoded
+
+    def decode_entry(self, instruction):
+        """(handler, first, second) entry of an instruction; without a fast handler, it runs through
+        execute_instruction."""
+        opcode, first_kind, first, second_kind, second = instruction
+        if opcode in (MOV, ADD, SUB, MUL, DIV, CMP):
+            dest_kind, dest = self.locate(first_kind, first)
+            source_kind, source = self.locate(second_kind, second)
+        elif opcode == POP:
+            (dest_kind, dest), source_kind, source = self.locate(first_kind, first), None, None
+        else:
+            dest_kind, dest, (source_kind, source) = None, None, self.locate(first_kind, first)
+        handler = self.dispatch.get((opcode, dest_kind, source_kind))
+        if handler is None:
+            return self.execute_entry, instruction, None
+        elif dest_kind is None:
+            return handler, source, None
+        return handler, dest, source
+
+    def locate(self, kind, operand):
+        """Decoded (kind, operand) of a bytecode operand."""
+        if kind == REGISTER:
+            return IN_REGISTER, operand
+        elif kind == ADDRESS:
+            return self.locations[operand]
+        elif kind == TARGET:
+            return IS_VALUE, self.resolve(operand)
+        return IS_VALUE, self.get_value(kind, operand)
+
+    def resolve(self, label):
+        """Program counter of a label; the decoded jumps go straight to it."""
+        labels = self.program.labels
+        if not 0 <= label < len(labels) or labels[label] < 0:
+            raise ValueError(f"Jump to undefined label L{label}")
+        return labels[label]
 
     def execute(self):
-        while self.program_counter < len(self.assembly_code):
-            instruction = self.assembly_code[self.program_counter].strip()
-            self.program_counter += 1
-            if not instruction or instruction.startswith(";"):  # Ignore comments or empty lines
-                continue
-            self.execute_instruction(instruction)
-
-    def execute_instruction(self, instruction):
-        """Execute a single instruction."""
-        parts = instruction.split()
-        command = parts[0]
-
-        if command == "MOV":
-            dest, src = parts[1].rstrip(","), parts[2]
-            self.mov(dest, src)
-
-        elif command == "ADD":
-            dest, src = parts[1].rstrip(","), parts[2]
-            self.add(dest, src)
-
-        elif command == "MUL":
-            dest, src = parts[1].rstrip(","), parts[2]
-            self.mul(dest, src)
-
-        elif command == "SUB":
-            dest, src = parts[1].rstrip(","), parts[2]
-            print (src, dest)
-            self.sub(dest, src)
-
-        elif command == "DIV":
-            dest, src = parts[1].rstrip(","), parts[2]
-            self.div(dest, src)
-
-        elif command == "PUSH":
-            src = parts[1]
-            self.push(src)
-
-        elif command == "POP":
-            dest = parts[1]
-            self.pop(dest)
-
-        elif command == "OUT":
-            src = parts[1]
-            self.out(src)
-
-        elif command == "OUT_STR":
-            src = " ".join(parts[1:])  # Handles string literals with spaces
-            self.out_str(src)
+        decoded = self.decoded if self.decoded is not None else self.load()
+        count = len(decoded)
+        program_counter = self.program_counter
+        budget = self.budget
+        if budget is not None:
+            budget.start()
+        # Instructions are only counted when a jump is taken: those since the previous one are
+        # program_counter - segment, where segment is the instruction that jump went to
+        steps = self.steps
+        segment = program_counter
+        profile = self.profile
+        self.budget_at = self.next_check(steps)
+        # A profile needs every taken jump to go through jumped()
+        check_at = steps if profile is not None else self.budget_at
+        while True:
+            try:
+                while program_counter < count:
+                    handler, first, second = decoded[program_counter]
+                    program_counter += 1
+                    # Only a jump taken returns something: the program counter to go on from
+                    target = handler(first, second)
+                    if target is not None:
+                        steps += program_counter - segment
+                        if steps >= check_at:
+                            self.steps, self.program_counter = steps, target
+                            check_at = self.jumped(segment, program_counter)
+                        program_counter = segment = target
+                break
+            except OverflowError:
+                # A value left the 64-bit range: the checked path wraps it, then carry on
+                steps += program_counter - segment
+                if profile is not None:
+                    profile.add(segment, program_counter)
+                self.program_counter = program_counter - 1
+                self.step()
+                program_counter = segment = self.program_counter
+            except (TypeError, ZeroDivisionError, IndexError):
+                # Fast handlers do not check their operands: re-run the failing instruction on the
+                # checked path, which raises the interpreter's own error
+                self.steps = steps + program_counter - segment
+                if profile is not None:
+                    profile.add(segment, program_counter)
+                self.program_counter = program_counter - 1
+                self.step()
+                raise
+        self.steps = steps + program_counter - segment
+        if profile is not None:
+            profile.add(segment, program_counter)
+        self.program_counter = program_counter
+
+    def jumped(self, segment, end):
+        """Called at a taken jump, ending the instructions [segment, end), once self.steps
+        reaches the check_at returned by the previous call: adds them to the profile, checks the
+        budget when due, and returns the next check_at."""
+        profile = self.profile
+        if profile is not None:
+            profile.add(segment, end)
+        if self.steps >= self.budget_at:
+            self.check_budget(end - 1)  # Located at the jump
+            self.budget_at = self.next_check(self.steps)
+        return self.steps if profile is not None else self.budget_at
+
+    def next_check(self, steps):
+        """Instruction count at which the budget is checked next."""
+        budget = self.budget
+        if budget is None:
+            return sys.maxsize
+        if budget.max_steps is not None:
+            return min(steps + CHECK_INTERVAL, budget.max_steps)
+        return steps + CHECK_INTERVAL
+
+    def check_budget(self, index):
+        """Budget.check(), its error naming the source line of instruction `index`."""
+        try:
+            self.budget.check(self.steps)
+        except RuntimeError as error:
+            source_map = self.program.source_map
+            location = source_map.describe(index) if source_map is not None else None
+            if location is not None:
+                error.args = (f"{error.args[0]} (at {location})",)
+            raise
+
+    def step(self):
+        """Execute the instruction at the program counter, decoding and checking its operands.
+
+        Its errors name the source line of the instruction when the program has a SourceMap.
+        """
+        index = self.program_counter
+        start = index * INSTRUCTION_WORDS
+        self.program_counter += 1
+        try:
+            self.execute_instruction(*decode(*self.program.code[start:start + INSTRUCTION_WORDS]))
+        except (ValueError, TypeError, ZeroDivisionError) as error:
+            source_map = self.program.source_map
+            location = source_map.describe(index) if source_map is not None else None
+            if location is not None and error.args:
+                error.args = (f"{error.args[0]} (at {location})",) + error.args[1:]
+            raise
 
+    def execute_entry(self, instruction, _):
+        self.execute_instruction(*instruction)
+
+    def execute_instruction(self, opcode, first_kind, first, second_kind, second):
+        """Execute a single decoded instruction."""
+        handler = self.handlers.get(opcode)
+        if handler is None:
+            raise ValueError(f"Unknown opcode: {opcode}")
+        if second_kind == NO_OPERAND:
+            handler(first_kind, first)
         else:
-            raise ValueError(f"Unknown instruction: {instruction}")
+            handler(first_kind, first, second_kind, second)
+
+    def read(self, slot):
+        """Value of a memory slot."""
+        store, index = self.locations[slot]
+        return self.integers[index] if store == IN_INTEGERS else self.strings[index]
+
+    # Fast handlers: (destination, source) or (source, None) as decoded by load(); a jump gets its
+    # program counter as source, and returns it when taken. Registers may
+    # briefly exceed 64 bits, which is harmless for ADD, SUB and MUL: the value is wrapped when it
+    # is stored (the integer array raises OverflowError), divided or written. A wrong operand
+    # surfaces as a TypeError, ZeroDivisionError or IndexError from Python itself
+
+    def mov_register_register(self, dest, src):
+        self.registers[dest] = self.registers[src]
+
+    def mov_register_memory(self, dest, src):
+        self.registers[dest] = self.integers[src]
+
+    def mov_register_value(self, dest, value):
+        self.registers[dest] = value
+
+    def mov_memory_register(self, dest, src):
+        self.integers[dest] = self.registers[src]
+
+    def mov_memory_memory(self, dest, src):
+        self.integers[dest] = self.integers[src]
+
+    def mov_memory_value(self, dest, value):
+        self.integers[dest] = value
+
+    def mov_string_string(self, dest, src):
+        self.strings[dest] = self.strings[src]
+
+    def mov_string_value(self, dest, value):
+        self.strings[dest] = value
 
-    def mov(self, dest, src):
-        value = self.get_value(src)
-        if dest in self.registers:  # If the destination is a register
+    def add_register(self, dest, src):
+        self.registers[dest] += self.registers[src]
+
+    def add_memory(self, dest, src):
+        self.registers[dest] += self.integers[src]
+
+    def add_value(self, dest, value):
+        self.registers[dest] += value
+
+    def sub_register(self, dest, src):
+        self.registers[dest] -= self.registers[src]
+
+    def sub_memory(self, dest, src):
+        self.registers[dest] -= self.integers[src]
+
+    def sub_value(self, dest, value):
+        self.registers[dest] -= value
+
+    def mul_register(self, dest, src):
+        self.registers[dest] *= self.registers[src]
+
+    def mul_memory(self, dest, src):
+        self.registers[dest] *= self.integers[src]
+
+    def mul_value(self, dest, value):
+        self.registers[dest] *= value
+
+    def div_register(self, dest, src):
+        registers = self.registers
+        if not (INTEGER_MIN <= registers[dest] <= INTEGER_MAX and INTEGER_MIN <= registers[src] <= INTEGER_MAX):
+            raise OverflowError
+        registers[dest] //= registers[src]
+
+    def div_memory(self, dest, src):
+        registers = self.registers
+        if not INTEGER_MIN <= registers[dest] <= INTEGER_MAX:
+            raise OverflowError
+        registers[dest] //= self.integers[src]
+
+    def div_value(self, dest, value):
+        registers = self.registers
+        if not INTEGER_MIN <= registers[dest] <= INTEGER_MAX:
+            raise OverflowError
+        registers[dest] //= value
+
+    def push_register(self, src, _):
+        self.stack.append(self.registers[src])
+
+    def push_memory(self, src, _):
+        self.stack.append(self.integers[src])
+
+    def push_value(self, value, _):
+        self.stack.append(value)
+
+    def pop_register(self, dest, _):
+        self.registers[dest] = self.stack.pop()
+
+    def out_register(self, src, _):
+        value = self.registers[src]
+        if not INTEGER_MIN <= value <= INTEGER_MAX:
+            raise OverflowError
+        self.write(value)
+
+    def out_memory(self, src, _):
+        self.write(self.integers[src])
+
+    def out_value(self, value, _):
+        self.write(value)
+
+    def cmp_register(self, dest, src):
+        left, right = self.registers[dest], self.registers[src]
+        if not (INTEGER_MIN <= left <= INTEGER_MAX and INTEGER_MIN <= right <= INTEGER_MAX):
+            raise OverflowError
+        self.comparison = left - right
+
+    def cmp_memory(self, dest, src):
+        left = self.registers[dest]
+        if not INTEGER_MIN <= left <= INTEGER_MAX:
+            raise OverflowError
+        self.comparison = left - self.integers[src]
+
+    def cmp_value(self, dest, value):
+        left = self.registers[dest]
+        if not INTEGER_MIN <= left <= INTEGER_MAX:
+            raise OverflowError
+        self.comparison = left - value
+
+    def jmp_to(self, target, _):
+        return target
+
+    def je_to(self, target, _):
+        if self.comparison == 0:
+            return target
+
+    def jne_to(self, target, _):
+        if self.comparison != 0:
+            return target
+
+    def jl_to(self, target, _):
+        if self.comparison < 0:
+            return target
+
+    def jle_to(self, target, _):
+        if self.comparison <= 0:
+            return target
+
+    def jg_to(self, target, _):
+        if self.comparison > 0:
+            return target
+
+    def jge_to(self, target, _):
+        if self.comparison >= 0:
+            return target
+
+    def out_string(self, src, _):
+        value = self.strings[src]
+        if type(value) is not str:
+            raise TypeError  # Reported by out_str on the checked path
+        self.write(value)
+
+    # Checked handlers: (kind, value) operands straight from the bytecode
+
+    def mov(self, dest_kind, dest, src_kind, src):
+        value = self.get_value(src_kind, src)
+        if dest_kind == REGISTER:  # If the destination is a register
+            if not isinstance(value, int):
+                raise ValueError(f"MOV to a register requires an integer, got {value}")
             self.registers[dest] = value
-        elif dest.startswith("$"):  # If the destination is a memory address
-            address = self.get_address(dest)
-            self.memory[address] = value
+        elif dest_kind == ADDRESS:  # If the destination is a memory address
+            store, index = self.locations[dest]
+            if store == IN_INTEGERS:
+                if not isinstance(value, int):
+                    raise ValueError(f"MOV to an integer cell requires an integer, got {value}")
+                self.integers[index] = wrap_integer(value)
+            else:
+                self.strings[index] = value
         else:
-            raise ValueError(f"Unknown destination: {dest}")
+            raise ValueError(f"Unknown destination: {self.describe(dest_kind, dest)}")
 
-    def add(self, dest, src):
-        value = self.get_value(src)
-        if dest in self.registers:  # Addition only works in registers
+    def add(self, dest_kind, dest, src_kind, src):
+        value = self.get_value(src_kind, src)
+        if dest_kind == REGISTER:  # Addition only works in registers
             if isinstance(self.registers[dest], int) and isinstance(value, int):
                 self.registers[dest] += value
             else:
                 raise ValueError(f"ADD requires integer operands, got {self.registers[dest]} and {value}")
         else:
-            raise ValueError(f"ADD requires a register destination, got: {dest}")
+            raise ValueError(f"ADD requires a register destination, got: {self.describe(dest_kind, dest)}")
 
-    def mul(self, dest, src):
-        value = self.get_value(src)
-        if dest in self.registers:
+    def mul(self, dest_kind, dest, src_kind, src):
+        value = self.get_value(src_kind, src)
+        if dest_kind == REGISTER:
             if isinstance(self.registers[dest], int) and isinstance(value, int):
                 self.registers[dest] *= value
             else:
                 raise ValueError(f"MUL requires integer operands, got {self.registers[dest]} and {value}")
         else:
-            raise ValueError(f"MUL requires a register destination, got: {dest}")
+            raise ValueError(f"MUL requires a register destination, got: {self.describe(dest_kind, dest)}")
 
-    def sub(self, dest, src):
-        value = self.get_value(src)
-        if dest in self.registers:  # Subtraction only works in registers
+    def sub(self, dest_kind, dest, src_kind, src):
+        value = self.get_value(src_kind, src)
+        if dest_kind == REGISTER:  # Subtraction only works in registers
             if isinstance(self.registers[dest], int) and isinstance(value, int):
-                self.registers[dest] = value- self.registers[dest]
+                self.registers[dest] -= value
             else:
                 raise ValueError(f"SUB requires integer operands, got {self.registers[dest]} and {value}")
         else:
-            raise ValueError(f"SUB requires a register destination, got: {dest}")
+            raise ValueError(f"SUB requires a register destination, got: {self.describe(dest_kind, dest)}")
 
-    def div(self, dest, src):
-        value = self.get_value(src)
-        if dest in self.registers:  # Division only works in registers
+    def div(self, dest_kind, dest, src_kind, src):
+        value = self.get_value(src_kind, src)
+        if dest_kind == REGISTER:  # Division only works in registers
             if isinstance(self.registers[dest], int) and isinstance(value, int):
-                if self.registers[dest] == 0:
+                value = wrap_integer(value)
+                if value == 0:
                     raise ZeroDivisionError("interpreteur : Division by zero is not allowed.")
-                self.registers[dest] = value //self.registers[dest]  # Perform integer division
+                self.registers[dest] = wrap_integer(self.registers[dest]) // value  # Perform integer division
             else:
                 raise ValueError(f"DIV requires integer operands, got {self.registers[dest]} and {value}")
         else:
-            raise ValueError(f"DIV requires a register destination, got: {dest}")
+            raise ValueError(f"DIV requires a register destination, got: {self.describe(dest_kind, dest)}")
 
-    def push(self, src):
-        value = self.get_value(src)
-        self.registers["SP"].append(value)
+    def push(self, src_kind, src):
+        value = self.get_value(src_kind, src)
+        self.stack.append(value)
 
-    def pop(self, dest):
-        stack = self.registers.get("SP", [])
-        if not stack:
+    def pop(self, dest_kind, dest):
+        if not self.stack:
             raise ValueError("Stack underflow")
-        value = stack.pop()
-        if dest in self.registers:
+        value = self.stack.pop()
+        if dest_kind == REGISTER:
             self.registers[dest] = value
         else:
-            raise ValueError(f"POP requires a register destination, got: {dest}")
+            raise ValueError(f"POP requires a register destination, got: {self.describe(dest_kind, dest)}")
 
-    def out(self, src):
-        value = self.get_value(src)
-        self.outputs.append(value)
+    def out(self, src_kind, src):
+        value = self.get_value(src_kind, src)
+        self.write(wrap_integer(value) if isinstance(value, int) else value)
 
-    def out_str(self, src):
+    def out_str(self, src_kind, src):
         """Implementation of the OUT_STR instruction for strings."""
-        if src.startswith('"') and src.endswith('"'):  # String literal
-            self.outputs.append(src[1:-1])
-        else:  # Variable
-            value = self.get_value(src)
-            if isinstance(value, str):
-                self.outputs.append(value)
-            else:
-                raise ValueError(f"OUT_STR expects a string, got {value}")
+        value = self.get_value(src_kind, src)
+        if isinstance(value, str):
+            self.write(value)
+        else:
+            raise ValueError(f"OUT_STR expects a string, got {value}")
 
+    def cmp(self, dest_kind, dest, src_kind, src):
+        """Compare two integers, wrapped to 64 bits, for the conditional jump that follows."""
+        left, right = self.get_value(dest_kind, dest), self.get_value(src_kind, src)
+        if not isinstance(left, int) or not isinstance(right, int):
+            raise ValueError(f"CMP requires integer operands, got {left} and {right}")
+        self.comparison = wrap_integer(left) - wrap_integer(right)
 
-    def get_value(self, operand):
-        """Get the value of a register, memory address, or constant."""
-        if operand in self.registers:  # If it's a register
-            return self.registers[operand]
-        elif operand.isdigit():  # If it's an immediate integer constant
-            return int(operand)
-        elif operand.startswith("$"):  # If it's a memory address (e.g., $0000)
-            address = self.get_address(operand)
-            return self.memory[address]
-        elif operand in self.symbol_table:  # If it's a variable (e.g., variable name)
-            address = self.symbol_table[operand]["address"]
-            return self.memory[address]
-        elif operand.startswith('"') and operand.endswith('"'):
-            return operand[1:-1]
-        else:
-            raise ValueError(f"Unknown operand: {operand}")
+    def jump(self, kind, label, taken=True):
+        if kind != TARGET:
+            raise ValueError(f"Jumps require a label, got: {self.describe(kind, label)}")
+        if taken:
+            self.program_counter = self.resolve(label)
+
+    def jmp(self, kind, label):
+        self.jump(kind, label)
+
+    def je(self, kind, label):
+        self.jump(kind, label, self.comparison == 0)
+
+    def jne(self, kind, label):
+        self.jump(kind, label, self.comparison != 0)
 
-    def get_address(self, operand):
-        """Convert a hexadecimal address (e.g., $0000) to an integer."""
-        if operand.startswith("$"):
-            return int(operand[1:], 16)  # Convert the hexadecimal address to an integer
+    def jl(self, kind, label):
+        self.jump(kind, label, self.comparison < 0)
+
+    def jle(self, kind, label):
+        self.jump(kind, label, self.comparison <= 0)
+
+    def jg(self, kind, label):
+        self.jump(kind, label, self.comparison > 0)
+
+    def jge(self, kind, label):
+        self.jump(kind, label, self.comparison >= 0)
+
+    def get_value(self, kind, operand):
+        """Get the value of a register, memory address, constant or immediate."""
+        if kind == REGISTER:
+            return self.registers[operand]
+        elif kind == IMMEDIATE:
+            return operand
+        elif kind == ADDRESS:
+            return self.read(operand)
+        elif kind == CONSTANT:  # A string literal, or an integer too wide for a code word
+            constant = self.program.constants[operand]
+            return constant if isinstance(constant, str) else wrap_integer(constant)
         else:
-            raise ValueError(f"Invalid address format: {operand}")
+            raise ValueError(f"Unknown operand: {self.describe(kind, operand)}")
 
+    def describe(self, kind, operand):
+        """Operand as it appears in the disassembly, for error messages."""
+        if kind == REGISTER:
+            return register_bank(self.program.register_count)[operand]
+        elif kind == ADDRESS:
+            return f"${operand:04X}"
+        return f"{operand} (kind {kind})"
@@ -0,0 +1,128 @@
+from PyQt5.QtCore import QAbstractItemModel, QAbstractTableModel, QModelIndex, Qt
+
+# Rows given to a view at a time; more are added by fetchMore() as it scrolls or expands
+FETCH_BATCH = 256
+
+
+class ASTModel(QAbstractItemModel):
+    """Tree model over an AST, for a QTreeView.
+
+    No item is built per node: indexes point at the ASTNodes themselves, and a node's children
+    only get rows, FETCH_BATCH at a time, once the view expands it. The parent and row of each
+    node with a row are recorded then, since ASTNodes do not know their parent.
+    """
+
+    def __init__(self, root=None, parent=None):
+        super().__init__(parent)
+        self.root = root
+        self.fetched = {}  # id(node) -> number of its children that have rows
+        self.locations = {}  # id(node) -> (parent node, or None for the root; row)
+        if root is not None:
+            self.locations[id(root)] = (None, 0)
+
+    def node(self, index):
+        return index.internalPointer() if index.isValid() else None
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        node = self.node(parent)
+        if node is None:
+            return 0 if self.root is None else 1
+        return self.fetched.get(id(node), 0)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()):
+        node = self.node(parent)
+        if node is None:
+            return self.root is not None
+        return bool(node.children)
+
+    def canFetchMore(self, parent):
+        node = self.node(parent)
+        return node is not None and self.fetched.get(id(node), 0) < len(node.children)
+
+    def fetchMore(self, parent):
+        node = self.node(parent)
+        first = self.fetched.get(id(node), 0)
+        last = min(len(node.children), first + FETCH_BATCH) - 1
+        if last < first:
+            return
+        self.beginInsertRows(parent, first, last)
+        locations = self.locations
+        for row in range(first, last + 1):
+            locations[id(node.children[row])] = (node, row)
+        self.fetched[id(node)] = last + 1
+        self.endInsertRows()
+
+    def index(self, row, column, parent=QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        node = self.node(parent)
+        return self.createIndex(row, column, self.root if node is None else node.children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        parent_node, _ = self.locations[id(index.internalPointer())]
+        if parent_node is None:
+            return QModelIndex()
+        return self.createIndex(self.locations[id(parent_node)][1], 0, parent_node)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        node = index.internalPointer()
+        label = f"{node.type}: {node.value or ''}"
+        if node.value_type is not None:  # Annotated by the semantic pass
+            label += f"  [{node.value_type}]"
+        return label
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return "Abstract Syntax Tree"
+        return None
+
+
+class SymbolTableModel(QAbstractTableModel):
+    """Name, type and address of each symbol of a SymbolTable, for a QTableView.
+
+    Cells are read from the symbols when the view paints them; rows are added FETCH_BATCH at a
+    time as the view scrolls.
+    """
+    COLUMNS = ("Name", "Type", "Address")
+
+    def __init__(self, symbol_table=None, parent=None):
+        super().__init__(parent)
+        self.symbol_table = symbol_table
+        self.fetched = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.fetched
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and self.symbol_table is not None and self.fetched < len(self.symbol_table)
+
+    def fetchMore(self, parent):
+        last = min(len(self.symbol_table), self.fetched + FETCH_BATCH) - 1
+        if last < self.fetched:
+            return
+        self.beginInsertRows(QModelIndex(), self.fetched, last)
+        self.fetched = last + 1
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        symbol = self.symbol_table[index.row()]
+        return (symbol.name, symbol.type, str(symbol.slot))[index.column()]
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.COLUMNS[section]
+        return None
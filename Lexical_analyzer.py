@@ -1,12 +1,84 @@
+import codecs
+import mmap
+import re
+from bisect import bisect_right
+
+# Token kinds
+KEYWORD, IDENTIFIER, NUMBER, STRING, OPERATOR, DELIMITER = range(6)
+TOKEN_KIND_NAMES = ("KEYWORD", "IDENTIFIER", "NUMBER", "STRING", "OPERATOR", "DELIMITER")
+
+
+# A token is a plain (kind, value, position) tuple, position being the offset of its first
+# character. Tuples holding only ints and strings are untracked by the garbage collector, so
+# millions of them stay cheap to create and to keep alive, unlike dicts or slotted objects.
+def token_end(token):
+    """Offset just past the token (string values do not include their quotes)."""
+    kind, value, position = token
+    if kind == STRING:
+        return position + len(value) + 2
+    return position + len(value)
+
+
+class LineIndex:
+    """Maps source offsets to (line, column); the line table is only built for the first diagnostic.
+
+    Without a source string, the table is fed chunk by chunk while a stream is being read.
+    """
+
+    def __init__(self, source=None):
+        self.source = source
+        self.line_starts = None if source is not None else [0]
+
+    def feed(self, chunk, offset):
+        """Record the line starts of a chunk that begins at the given source offset."""
+        self.line_starts.extend(offset + m.end() for m in re.finditer("\n", chunk))
+
+    def starts(self):
+        """Offsets at which the lines start, the first one being 0."""
+        if self.line_starts is None:
+            self.line_starts = [0] + [m.end() for m in re.finditer("\n", self.source)]
+        return self.line_starts
+
+    def line_column(self, offset):
+        line = bisect_right(self.starts(), offset)
+        return line, offset - self.line_starts[line - 1] + 1
+
+    def describe(self, offset):
+        line, column = self.line_column(offset)
+        return f"line {line}, column {column}"
+
+
 class LexicalAnalyser:
-    def __init__(self):
-        # List of Pascal keywords
-        self.KEYWORDS = ["program", "var", "integer", "string", "real", "begin", "end", "if", "then", "else",
-                         "while", "do", "for", "to", "write", "read"]
+    # List of Pascal keywords
+    KEYWORDS = frozenset(["program", "var", "integer", "string", "real", "begin", "end", "if", "then", "else",
+                          "while", "do", "for", "to", "write", "read"])
 
-        # List of operators and delimiters
-        self.OPERATORS = [":=", "+", "-", "*", "/", "=", "<", ">", "<=", ">="]
-        self.DELIMITERS = [";", ",", ".", "(", ")", ":"]
+    # List of operators and delimiters
+    OPERATORS = (":=", "+", "-", "*", "/", "=", "<>", "<", ">", "<=", ">=")
+    DELIMITERS = frozenset([";", ",", ".", "(", ")", ":"])
+
+    # One compiled master pattern: leading whitespace is skipped in the same match, then
+    # exactly one alternative fires. Operators are tried longest first.
+    TOKEN_PATTERN = re.compile(
+        r"[ \t\n\r]*(?:"
+        r"(?P<WORD>[A-Za-z][A-Za-z0-9]*)"
+        r"|(?P<NUMBER>[0-9]+)"
+        r"|(?P<STRING>\"[^\"]*\"|'[^']*')"
+        r"|(?P<OPERATOR>" + "|".join(re.escape(op) for op in sorted(OPERATORS, key=len, reverse=True)) + r")"
+        r"|(?P<DELIMITER>[" + re.escape("".join(sorted(DELIMITERS))) + r"])"
+        r"|(?P<COMMENT>\{[^}]*\})"
+        r"|(?P<END>\Z)"
+        r"|(?P<OTHER>.)"
+        r")",
+        re.DOTALL,
+    )
+
+    def __init__(self):
+        # Canonical strings, so every keyword/operator token shares one object
+        self.keyword_table = {word: word for word in self.KEYWORDS}
+        self.operator_table = {op: op for op in self.OPERATORS}
+        self.delimiter_table = {delimiter: delimiter for delimiter in self.DELIMITERS}
+        self.line_index = None  # Set for the source being tokenized
 
     def is_whitespace(self, char):
         """Check if a character is a space"""
@@ -19,84 +91,154 @@ class LexicalAnalyser:
         return char.isdigit()
 
     def analyse(self, code):
-        tokens = []
+        return list(self.iter_tokens(code))
+
+    def iter_tokens(self, source, chunk_size=1 << 16):
+        """Lazily yield the tokens of a str, a text file object, a binary (UTF-8) file or an mmap.
+
+        Sources other than str are read chunk_size characters at a time, so only a small
+        window of the text is held in memory. self.line_index places diagnostics either way.
+        """
+        if isinstance(source, str):
+            self.line_index = LineIndex(source)
+            return self.scan(iter((source,)))
+        self.line_index = LineIndex()
+        return self.scan(self.read_chunks(source, chunk_size))
+
+    def read_chunks(self, source, chunk_size):
+        """Yield text chunks from a file object or a bytes-like object such as an mmap."""
+        line_index = self.line_index
+        offset = 0
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        if isinstance(source, (mmap.mmap, bytes, bytearray, memoryview)):
+            # Slices of a memoryview do not copy, only the decoded chunk is materialised
+            view = memoryview(source)
+            pieces = (view[start:start + chunk_size] for start in range(0, len(view), chunk_size))
+        else:
+            pieces = iter(lambda: source.read(chunk_size) or None, None)
+        for data in pieces:
+            chunk = data if isinstance(data, str) else decoder.decode(data)
+            line_index.feed(chunk, offset)
+            offset += len(chunk)
+            yield chunk
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            line_index.feed(tail, offset)
+            yield tail
+
+    def scan(self, chunks):
+        match = self.TOKEN_PATTERN.match
+        keywords = self.keyword_table
+        operators = self.operator_table
+        delimiters = self.delimiter_table
+        line_index = self.line_index
+        names = {}  # Identifiers and numbers seen so far, so repeated ones share a string
+        code = ""
+        base = 0  # Offset of code[0] in the whole source
         i = 0
-        length = len(code)
+        length = 0
+        ascii_only = True
+        eof = False
 
-        while i < length:
-            char = code[i]
+        while True:
+            if i < length:
+                m = match(code, i)
+                kind = m.lastgroup
+                start = m.start(kind)
+                end = m.end()
+                if kind == "OTHER":
+                    char = code[start]
+                    if self.is_letter(char):
+                        end = self.scan_word(code, end)
+                    elif self.is_digit(char):
+                        end = self.scan_number(code, end)
+                    elif char in "\"'{":
+                        end = length  # Unclosed so far: the closing character may be in the next chunk
+                elif not ascii_only and end < length and not code[end].isascii():
+                    if kind == "WORD":
+                        end = self.scan_word(code, end)
+                    elif kind == "NUMBER":
+                        end = self.scan_number(code, end)
+            else:
+                kind = "END"
+                end = length
 
-            # Ignore whitespace
-            if self.is_whitespace(char):
-                i += 1
+            # A token touching the end of the window may continue in the next chunk
+            if end >= length and not eof:
+                pending = code[i:]
+                base += i
+                parts = [pending]
+                added = 0
+                while added <= len(pending):  # Grow geometrically so long tokens are rescanned rarely
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        eof = True
+                        break
+                    parts.append(chunk)
+                    added += len(chunk)
+                code = "".join(parts)
+                i = 0
+                length = len(code)
+                ascii_only = code.isascii()
                 continue
 
-            # Identify keywords or identifiers
-            if self.is_letter(char):
-                start = i
-                while i < length and (self.is_letter(code[i]) or self.is_digit(code[i])):
-                    i += 1
-                word = code[start:i]
-                if word in self.KEYWORDS:
-                    tokens.append({"type": "KEYWORD", "value": word, "position": i})
+            i = end
+
+            if kind == "WORD":
+                word = code[start:end]
+                keyword = keywords.get(word)
+                if keyword is not None:
+                    yield KEYWORD, keyword, base + start
                 else:
-                    tokens.append({"type": "IDENTIFIER", "value": word, "position": i})
-                continue
+                    yield IDENTIFIER, names.setdefault(word, word), base + start
 
-            # Identify numbers
-            if self.is_digit(char):
-                start = i
-                while i < length and self.is_digit(code[i]):
-                    i += 1
-                number = code[start:i]
-                tokens.append({"type": "NUMBER", "value": number, "position": i})
-                continue
+            elif kind == "OPERATOR":
+                yield OPERATOR, operators[m.group(kind)], base + start
 
-            # Identify strings
-            if char in ['"', "'"]:
-                quote_type = char
-                start = i
-                i += 1
-                while i < length and code[i] != quote_type:
-                    i += 1
-                if i < length and code[i] == quote_type:
-                    i += 1
-                    string_value = code[start + 1:i - 1]
-                    tokens.append({"type": "STRING", "value": string_value, "position": i})
-                else:
-                    raise ValueError(f"Error: Unclosed string at position {start}")
-                continue
+            elif kind == "DELIMITER":
+                yield DELIMITER, delimiters[code[start]], base + start
 
-            # Identify operators
-            if any(code[i:i + len(op)] == op for op in self.OPERATORS):
-                for op in self.OPERATORS:
-                    if code[i:i + len(op)] == op:
-                        tokens.append({"type": "OPERATOR", "value": op, "position": i})
-                        i += len(op)
-                        break
-                continue
+            elif kind == "NUMBER":
+                number = code[start:end]
+                yield NUMBER, names.setdefault(number, number), base + start
 
-            # Identify delimiters
-            if char in self.DELIMITERS:
-                tokens.append({"type": "DELIMITER", "value": char, "position": i})
-                i += 1
-                continue
+            elif kind == "STRING":
+                yield STRING, code[start + 1:end - 1], base + start
 
-            # Identify comments
-            if char == "{":
-                i += 1
-                while i < length and code[i] != "}":
-                    i += 1
-                if i < length and code[i] == "}":
-                    i += 1
+            elif kind == "OTHER":
+                char = code[start]
+                if self.is_letter(char):
+                    # Keywords are ASCII, so a non-ASCII word is always an identifier
+                    yield IDENTIFIER, code[start:end], base + start
+                elif self.is_digit(char):
+                    yield NUMBER, code[start:end], base + start
+                elif char in ['"', "'"]:
+                    raise ValueError(f"Error: Unclosed string at {line_index.describe(base + start)}")
+                elif char == "{":
+                    raise ValueError(f"Error: Unclosed comment at {line_index.describe(base + start)}")
                 else:
-                    raise ValueError(f"Error: Unclosed comment at position {i}")
-                continue
+                    # If the character is not recognized
+                    raise ValueError(
+                        f"Lexical error: Invalid character '{char}' at {line_index.describe(base + start)}")
 
-            # If the character is not recognized
-            raise ValueError(f"Lexical error: Invalid character '{char}' at position {i}")
+            elif kind == "END":
+                return
 
-        return tokens
+            # COMMENT produces no token
+
+    def scan_word(self, code, i):
+        """Extend an identifier over letters and digits, including non-ASCII ones."""
+        length = len(code)
+        while i < length and (self.is_letter(code[i]) or self.is_digit(code[i])):
+            i += 1
+        return i
+
+    def scan_number(self, code, i):
+        """Extend a number over digits, including non-ASCII ones."""
+        length = len(code)
+        while i < length and self.is_digit(code[i]):
+            i += 1
+        return i
 
 
 source_code="""program pro;
@@ -110,7 +252,8 @@ end.
 
 """
 
-analyser = LexicalAnalyser()
-tokens = analyser.analyse(source_code)
-for item in tokens:
-    print(item)
\ No newline at end of file
+if __name__ == "__main__":
+    analyser = LexicalAnalyser()
+    tokens = analyser.analyse(source_code)
+    for item in tokens:
+        print(item)
@@ -1,23 +1,91 @@
 import sys
-from Interpreter import *
+import time
+import minipascal
+from minipascal.cache import CompileCache, default_directory
 from PyQt5.QtWidgets import (
     QApplication,
     QMainWindow,
     QTextEdit,
     QVBoxLayout,
     QPushButton,
-    QTreeWidget,
-    QTreeWidgetItem,
+    QTreeView,
     QWidget,
     QHBoxLayout,
     QSplitter,
-    QTableWidget,
-    QTableWidgetItem,
+    QTableView,
     QStackedWidget,
+    QComboBox,
+    QLabel,
+    QSpinBox,
+    QCheckBox,
 )
-from PyQt5.QtGui import QIcon
-from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QIcon, QTextCharFormat, QTextCursor
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal
 
+from Incremental_checker import IncrementalChecker, merge_edits
+from Item_models import ASTModel, SymbolTableModel
+
+# Shortest interval between two progress reports of a running program, in seconds
+PROGRESS_INTERVAL = 0.1
+# Pause in typing after which the source is checked, in milliseconds
+CHECK_DELAY_MS = 300
+# Most diagnostics underlined in the editor at once
+MAX_MARKED_DIAGNOSTICS = 200
+# Last lines of a program's output kept for the Output pane; earlier ones are dropped as it runs
+MAX_OUTPUT_LINES = 10000
+
+
+class CompilerWorker(QThread):
+    """Runs CompilerInterface.compiler_backend off the UI thread; what it produces, its errors
+    and its progress come back through signals, which Qt delivers on the UI thread."""
+    progress = pyqtSignal(str)
+    succeeded = pyqtSignal(object)  # (output, symbol table, AST, Stats or None)
+    failed = pyqtSignal(str)
+
+    def __init__(self, backend, source_code, mode, budget, stats=False, parent=None):
+        super().__init__(parent)
+        self.backend = backend
+        self.source_code = source_code
+        self.mode = mode
+        self.budget = budget
+        self.stats = stats
+        self.started_at = None
+        self.reported_at = 0.0
+        budget.progress = self.report_steps
+
+    def run(self):
+        self.started_at = time.monotonic()
+        try:
+            self.succeeded.emit(self.backend(self.source_code, self.mode, self.budget, self.progress.emit,
+                                             self.stats))
+        except Exception as e:
+            self.failed.emit(str(e))
+
+    def report_steps(self, steps):
+        """Budget progress callback: at most one report every PROGRESS_INTERVAL."""
+        now = time.monotonic()
+        if now - self.reported_at < PROGRESS_INTERVAL:
+            return
+        self.reported_at = now
+        elapsed = now - self.started_at
+        if steps is None:
+            self.progress.emit(f"Running... {elapsed:.1f}s")
+        else:
+            self.progress.emit(f"Running... {steps:,} instructions, {elapsed:.1f}s")
+
+
+class CheckWorker(QThread):
+    """Brings an IncrementalChecker up to date with the editor's text off the UI thread."""
+    checked = pyqtSignal(object)  # Diagnostics
+
+    def __init__(self, checker, text, edit, parent=None):
+        super().__init__(parent)
+        self.checker = checker
+        self.text = text
+        self.edit = edit
+
+    def run(self):
+        self.checked.emit(self.checker.update(self.text, self.edit))
 
 
 class CompilerInterface(QMainWindow):
@@ -25,8 +93,18 @@ class CompilerInterface(QMainWindow):
         super().__init__()
         self.init_ui()
         self.current_output = ""
-        self.current_symbol_table = {}
+        self.current_symbol_table = None  # SymbolTable of the last run
         self.ast_root = None
+        self.current_stats = None  # minipascal.stats.Stats of the last run, if collected
+        # Unchanged sources are not recompiled, across runs and sessions
+        self.cache = CompileCache(default_directory())
+        self.worker = None  # CompilerWorker of the run in progress
+        self.budget = None  # Its Budget, which the Cancel button cancels
+        # Diagnostics while typing: edits since the last check are merged into one
+        self.checker = IncrementalChecker()
+        self.pending_edit = None
+        self.check_worker = None
+        self.diagnostics = []
 
     def init_ui(self):
         self.setWindowTitle("Pascal Compiler")
@@ -42,6 +120,13 @@ class CompilerInterface(QMainWindow):
         self.source_code_editor = QTextEdit()
         self.source_code_editor.setPlaceholderText("Write your code here...")
         self.source_code_editor.setStyleSheet("font: 12pt Courier;")
+        self.source_code_editor.document().contentsChange.connect(self.source_edited)
+        self.source_code_editor.cursorPositionChanged.connect(self.show_diagnostic_at_cursor)
+        self.check_timer = QTimer(self)
+        self.check_timer.setSingleShot(True)
+        self.check_timer.setInterval(CHECK_DELAY_MS)
+        self.check_timer.timeout.connect(self.start_check)
+        self.diagnostics_label = QLabel()
 
         # Stacked widget to toggle views
         self.display_stack = QStackedWidget()
@@ -53,16 +138,21 @@ class CompilerInterface(QMainWindow):
         self.display_stack.addWidget(self.output_display)
 
         # Symbol table display as a table
-        self.symbol_table_widget = QTableWidget()
-        self.symbol_table_widget.setColumnCount(3)  # Name, Type, Address
-        self.symbol_table_widget.setHorizontalHeaderLabels(["Name", "Type", "Address"])
+        self.symbol_table_widget = QTableView()
+        self.symbol_table_widget.setModel(SymbolTableModel())
         self.display_stack.addWidget(self.symbol_table_widget)
 
         # Tree widget for AST
-        self.tree_display = QTreeWidget()
-        self.tree_display.setHeaderLabel("Abstract Syntax Tree")
+        self.tree_display = QTreeView()
+        self.tree_display.setUniformRowHeights(True)  # Lets the view lay out rows without measuring each
+        self.tree_display.setModel(ASTModel())
         self.display_stack.addWidget(self.tree_display)
 
+        # Where the time of the last run went
+        self.stats_display = QTextEdit()
+        self.stats_display.setReadOnly(True)
+        self.stats_display.setStyleSheet("font: 10pt Courier; background-color: #f5f5f5;")
+        self.display_stack.addWidget(self.stats_display)
 
         # Menu buttons
         menu_layout = QHBoxLayout()
@@ -79,100 +169,248 @@ class CompilerInterface(QMainWindow):
         self.tree_button.setCheckable(True)
         self.tree_button.clicked.connect(self.show_tree)
 
+        self.stats_button = QPushButton("Stats")
+        self.stats_button.setCheckable(True)
+        self.stats_button.clicked.connect(self.show_stats)
+
         # Group buttons
         menu_layout.addWidget(self.output_button)
         menu_layout.addWidget(self.symbol_table_button)
         menu_layout.addWidget(self.tree_button)
+        menu_layout.addWidget(self.stats_button)
+
+        self.run_button = QPushButton("Run")
+        self.run_button.setStyleSheet("font: 12pt; padding: 10px;")
+        self.run_button.clicked.connect(self.run_program)
+
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setStyleSheet("font: 12pt; padding: 10px;")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_program)
+
+        # Limits of a run, 0 for none
+        self.time_limit_box = QSpinBox()
+        self.time_limit_box.setRange(0, 3600)
+        self.time_limit_box.setValue(10)
+        self.time_limit_box.setSuffix(" s")
+        self.time_limit_box.setSpecialValueText("No time limit")
+        self.step_limit_box = QSpinBox()
+        self.step_limit_box.setRange(0, 100000)
+        self.step_limit_box.setSuffix("M instructions")
+        self.step_limit_box.setSpecialValueText("No instruction limit")
+        # Measure the stages and profile the run, for the Stats view
+        self.stats_box = QCheckBox("Collect stats")
+        self.status_label = QLabel()
 
-        run_button = QPushButton("Run")
-        run_button.setStyleSheet("font: 12pt; padding: 10px;")
-        run_button.clicked.connect(self.run_program)
+        # Execution mode: the bytecode interpreter, or the program compiled to Python
+        self.mode_selector = QComboBox()
+        self.mode_selector.addItem("Interpreter", "vm")
+        self.mode_selector.addItem("Compiled (Python)", "python")
+        run_layout = QHBoxLayout()
+        run_layout.addWidget(self.mode_selector)
+        run_layout.addWidget(self.time_limit_box)
+        run_layout.addWidget(self.step_limit_box)
+        run_layout.addWidget(self.stats_box)
+        run_layout.addWidget(self.run_button, 1)
+        run_layout.addWidget(self.cancel_button)
 
         # Add widgets to layout
         splitter = QSplitter(Qt.Vertical)
-        splitter.addWidget(self.source_code_editor)
+        editor_widget = QWidget()
+        editor_layout = QVBoxLayout(editor_widget)
+        editor_layout.setContentsMargins(0, 0, 0, 0)
+        editor_layout.addWidget(self.source_code_editor)
+        editor_layout.addWidget(self.diagnostics_label)
+        splitter.addWidget(editor_widget)
         splitter.addWidget(self.display_stack)
         main_layout.addWidget(splitter)
         main_layout.addLayout(menu_layout)
-        main_layout.addWidget(run_button)
+        main_layout.addLayout(run_layout)
+        main_layout.addWidget(self.status_label)
 
     def run_program(self):
-        source_code = self.source_code_editor.toPlainText()
-        try:
-            output, symbol_table, ast_root = self.compiler_backend(source_code)
-            self.current_output = output
-            self.current_symbol_table = symbol_table
-            self.ast_root = ast_root
+        if self.worker is not None:
+            return
+        from Interpreter import Budget
+
+        time_limit = self.time_limit_box.value() or None
+        max_steps = self.step_limit_box.value() * 1000000 or None
+        self.budget = Budget(max_steps, time_limit)
+        self.worker = CompilerWorker(self.compiler_backend, self.source_code_editor.toPlainText(),
+                                     self.mode_selector.currentData(), self.budget, self.stats_box.isChecked(), self)
+        self.worker.progress.connect(self.status_label.setText)
+        self.worker.succeeded.connect(self.show_results)
+        self.worker.failed.connect(self.show_error)
+        self.worker.finished.connect(self.run_finished)
+        self.run_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+        self.status_label.setText("Compiling...")
+        self.worker.start()
+
+    def cancel_program(self):
+        if self.budget is not None:
+            self.budget.cancel()
+            self.status_label.setText("Cancelling...")
+
+    def show_results(self, results):
+        self.current_output, self.current_symbol_table, self.ast_root, self.current_stats = results
+        if self.stats_button.isChecked():
+            self.show_stats()
+        else:
             self.show_output()
-        except Exception as e:
-            self.output_display.setPlainText(f"Error: {str(e)}")
+
+    def show_error(self, message):
+        self.output_display.setPlainText(f"Error: {message}")
+        self.show_output_view()
+
+    def run_finished(self):
+        elapsed = time.monotonic() - self.worker.started_at
+        self.worker.deleteLater()
+        self.worker = self.budget = None
+        self.run_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+        self.status_label.setText(f"Finished in {elapsed:.2f}s")
+
+    def closeEvent(self, event):
+        if self.worker is not None:
+            self.budget.cancel()
+            self.worker.wait()
+        if self.check_worker is not None:
+            self.check_worker.wait()
+        super().closeEvent(event)
+
+    def source_edited(self, position, removed, added):
+        self.pending_edit = merge_edits(self.pending_edit, position, removed, added)
+        self.check_timer.start()  # Restarted by every edit, so checks wait for a pause
+
+    def start_check(self):
+        if self.check_worker is not None:
+            return  # check_finished() starts the next one
+        edit, self.pending_edit = self.pending_edit, None
+        self.check_worker = CheckWorker(self.checker, self.source_code_editor.toPlainText(), edit, self)
+        self.check_worker.checked.connect(self.check_done)
+        self.check_worker.finished.connect(self.check_finished)
+        self.check_worker.start()
+
+    def check_done(self, diagnostics):
+        if self.pending_edit is None:  # Else their offsets are already out of date
+            self.show_diagnostics(diagnostics)
+
+    def check_finished(self):
+        self.check_worker.deleteLater()
+        self.check_worker = None
+        if self.pending_edit is not None:
+            self.check_timer.start()
+
+    def show_diagnostics(self, diagnostics):
+        """Underline the diagnostics in the editor."""
+        self.diagnostics = diagnostics
+        document = self.source_code_editor.document()
+        last = document.characterCount() - 1
+        selections = []
+        for diagnostic in diagnostics[:MAX_MARKED_DIAGNOSTICS]:
+            selection = QTextEdit.ExtraSelection()
+            selection.format.setUnderlineStyle(QTextCharFormat.WaveUnderline)
+            selection.format.setUnderlineColor(Qt.red)
+            cursor = QTextCursor(document)
+            cursor.setPosition(min(diagnostic.start, last))
+            cursor.setPosition(min(max(diagnostic.end, diagnostic.start + 1), last), QTextCursor.KeepAnchor)
+            selection.cursor = cursor
+            selections.append(selection)
+        self.source_code_editor.setExtraSelections(selections)
+        self.show_diagnostic_at_cursor()
+
+    def show_diagnostic_at_cursor(self):
+        """The message of the diagnostic under the cursor, else how many there are."""
+        if not self.diagnostics:
+            self.diagnostics_label.setText("")
+            return
+        position = self.source_code_editor.textCursor().position()
+        for diagnostic in self.diagnostics:
+            if diagnostic.start <= position <= diagnostic.end:
+                break
+        else:
+            diagnostic = self.diagnostics[0]
+        line = self.source_code_editor.document().findBlock(diagnostic.start).blockNumber() + 1
+        count = len(self.diagnostics)
+        self.diagnostics_label.setText(f"{count} problem{'s' if count > 1 else ''}; line {line}: {diagnostic.message}")
 
     def show_output(self):
+        self.show_output_view()
+        self.output_display.setPlainText(self.current_output)
+
+    def show_output_view(self):
         self.output_button.setChecked(True)
         self.symbol_table_button.setChecked(False)
         self.tree_button.setChecked(False)
+        self.stats_button.setChecked(False)
         #self.graphical_tree_button.setChecked(False)
         self.display_stack.setCurrentWidget(self.output_display)
-        self.output_display.setPlainText(self.current_output)
 
     def show_symbol_table(self):
         self.symbol_table_button.setChecked(True)
         self.output_button.setChecked(False)
         self.tree_button.setChecked(False)
+        self.stats_button.setChecked(False)
         #self.graphical_tree_button.setChecked(False)
         self.display_stack.setCurrentWidget(self.symbol_table_widget)
         self.populate_symbol_table(self.current_symbol_table)
 
     def populate_symbol_table(self, symbol_table):
-        self.symbol_table_widget.clearContents()
-        self.symbol_table_widget.setRowCount(len(symbol_table))
-        for row, (name, details) in enumerate(symbol_table.items()):
-            var_type = details.get("type", "Unknown")
-            address = details.get("address", "N/A")
-            self.symbol_table_widget.setItem(row, 0, QTableWidgetItem(name))
-            self.symbol_table_widget.setItem(row, 1, QTableWidgetItem(var_type))
-            self.symbol_table_widget.setItem(row, 2, QTableWidgetItem(str(address)))
+        """Show `symbol_table`; the model is only replaced when it is another table."""
+        if self.symbol_table_widget.model().symbol_table is not symbol_table:
+            self.replace_model(self.symbol_table_widget, SymbolTableModel(symbol_table))
 
     def show_tree(self):
         self.tree_button.setChecked(True)
         self.output_button.setChecked(False)
         self.symbol_table_button.setChecked(False)
+        self.stats_button.setChecked(False)
         #self.graphical_tree_button.setChecked(False)
         self.display_stack.setCurrentWidget(self.tree_display)
         self.populate_tree(self.ast_root)
 
-    def populate_tree(self, node, parent_item=None):
-        if node is None:
-            return
-        item = QTreeWidgetItem([f"{node.type}: {node.value or ''}"])
-        if parent_item is None:
-            self.tree_display.clear()
-            self.tree_display.addTopLevelItem(item)
+    def populate_tree(self, node):
+        """Show the AST under `node`; the model is only replaced when it is another tree."""
+        if self.tree_display.model().root is not node:
+            self.replace_model(self.tree_display, ASTModel(node))
+
+    def show_stats(self):
+        self.stats_button.setChecked(True)
+        self.output_button.setChecked(False)
+        self.symbol_table_button.setChecked(False)
+        self.tree_button.setChecked(False)
+        self.display_stack.setCurrentWidget(self.stats_display)
+        if self.current_stats is None:
+            self.stats_display.setPlainText("Tick 'Collect stats' and run the program to see where its time goes.")
         else:
-            parent_item.addChild(item)
-        for child in node.children:
-            self.populate_tree(child, item)
+            self.stats_display.setPlainText(self.current_stats.format())
 
+    def replace_model(self, view, model):
+        previous = view.model()
+        view.setModel(model)
+        previous.deleteLater()
 
-    def compiler_backend(self, source_code):
+    def compiler_backend(self, source_code, mode="vm", budget=None, progress=None, stats=False):
+        """Compile and run `source_code`; called on the worker thread, so it touches no widget."""
         if not source_code.strip():
-            return "No source code to compile.", {}, None
-        analyser = LexicalAnalyser()
-        tokens = analyser.analyse(source_code)
-        parser = Parser(tokens)
-        ast_root = parser.inspect_program()
-        semantic_analyzer = Semantic_analyzer(ast_root)
-        semantic_analyzer.evaluate(ast_root)
-        symbol_table = semantic_analyzer.symbol_table
-        code_generator = CodeGenerator(ast_root, symbol_table)
-        code_generator.generate_code(ast_root)
-        code_generator.write_to_file()
-        assembly_code = code_generator.instructions
-        interpreter = Interpreter(assembly_code, symbol_table)
-        interpreter.execute()
-        output = interpreter.outputs
-        output_text = "\n".join(str(item) for item in output)
-        return output_text, symbol_table, ast_root
+            return "No source code to compile.", None, None, None
+        result = minipascal.compile(source_code, mode=mode, cache=self.cache, stats=stats)
+        if budget is not None:
+            budget.check()  # Cancelled while compiling
+        if progress is not None:
+            progress("Running...")
+        from Output_sinks import RingSink
+
+        # One line more than is shown, so that a full sink tells that earlier lines were dropped
+        sink = RingSink(MAX_OUTPUT_LINES + 1)
+        outputs = minipascal.execute(result, mode, budget, sink)
+        if len(outputs) > MAX_OUTPUT_LINES:
+            output = "\n".join(str(item) for item in outputs[1:])
+            output = f"(the Output pane keeps the last {MAX_OUTPUT_LINES:,} lines written)\n" + output
+        else:
+            output = result.output_text
+        return output, result.symbol_table, result.ast, result.stats
 
 
 if __name__ == "__main__":
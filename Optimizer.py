@@ -0,0 +1,143 @@
+from Syntax_analyzer import *
+from Code_generator import CodeGenerator
+from Bytecode import wrap_integer
+
+# Integer semantics of the interpreter: 64-bit two's complement, and DIV is floor division
+FOLDING = {
+    "+": lambda left, right: wrap_integer(left + right),
+    "-": lambda left, right: wrap_integer(left - right),
+    "*": lambda left, right: wrap_integer(left * right),
+    "/": lambda left, right: wrap_integer(left // right),
+}
+
+
+class Optimizer:
+    """Rewrites the checked AST between semantic analysis and code generation.
+
+    Level 0 leaves the tree alone, level 1 folds constant arithmetic, level 2 also applies the
+    identities x*1, x/1, x+0, x-0, x*0 and x-x. Identities never drop a division, so a runtime
+    division by zero is never optimised away.
+    """
+
+    def __init__(self, ast, symbol_table, level=1, register_count=4):
+        self.ast = ast
+        self.level = level
+        self.code_generator = CodeGenerator(ast, symbol_table, register_count=register_count)  # Counts instructions
+        self.folded = 0
+        self.simplified = 0
+        self.instructions_eliminated = 0
+
+    def optimize(self, node):
+        """Optimise the expressions of `node` and of the statements in it, walked with an explicit stack."""
+        if self.level <= 0:
+            return
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.kind in (PROGRAM, BLOCK, STATEMENTS):
+                stack.extend(reversed(node.children))
+            elif node.kind in (ASSIGNMENT, WRITE, IF, WHILE):
+                # The expression, or the condition followed by the statements it controls
+                self.optimize_child(node, 0)
+                stack.extend(reversed(node.children[1:]))
+            elif node.kind == FOR:
+                self.optimize_child(node, 0)
+                self.optimize_child(node, 1)
+                stack.append(node.children[2])
+
+    def optimize_child(self, node, index):
+        """Optimise the expression node.children[index], counting the instructions it saves."""
+        expression = node.children[index]
+        if expression.kind != BINARY_OPERATION:
+            return  # A leaf, which nothing rewrites
+        rewrites = self.folded + self.simplified
+        before = self.code_generator.expression_cost(expression)
+        node.children[index] = self.optimize_expression(expression)
+        if self.folded + self.simplified != rewrites:  # Else the expression is unchanged
+            self.instructions_eliminated += before - self.code_generator.expression_cost(node.children[index])
+
+    def optimize_expression(self, node):
+        """Optimised version of an expression; subtrees are rewritten bottom-up, without recursion."""
+        results = []
+        stack = [(node, False)]
+        while stack:
+            node, operands_done = stack.pop()
+            if node.kind != BINARY_OPERATION:
+                results.append(node)
+                continue
+            if not operands_done:
+                stack.append((node, True))
+                stack.append((node.children[1], False))
+                stack.append((node.children[0], False))
+                continue
+            right = results.pop()
+            left = results[-1]
+            node.children[0] = left
+            node.children[1] = right
+            results[-1] = self.simplify(node, left, right)
+        return results[0]
+
+    def simplify(self, node, left, right):
+        operator = node.value
+        if operator in COMPARISON_OPERATORS:  # Conditions keep their comparison
+            return node
+        right_constant = wrap_integer(int(right.value)) if right.kind == NUMBER_LITERAL else None
+        if operator == "/" and right_constant == 0:
+            raise ZeroDivisionError("Semantic error: Division by zero")
+
+        if left.kind == NUMBER_LITERAL and right_constant is not None:
+            self.folded += 1
+            return self.constant(FOLDING[operator](wrap_integer(int(left.value)), right_constant), node)
+
+        if self.level < 2:
+            return node
+        left_constant = wrap_integer(int(left.value)) if left.kind == NUMBER_LITERAL else None
+        if operator == "*":
+            if right_constant == 1:
+                return self.simplified_to(left)
+            if left_constant == 1:
+                return self.simplified_to(right)
+            if (right_constant == 0 and self.is_safe(left)) or (left_constant == 0 and self.is_safe(right)):
+                return self.simplified_to(self.constant(0, node))
+        elif operator == "+":
+            if right_constant == 0:
+                return self.simplified_to(left)
+            if left_constant == 0:
+                return self.simplified_to(right)
+        elif operator == "-":
+            if right_constant == 0:
+                return self.simplified_to(left)
+            if left.kind == VARIABLE and right.kind == VARIABLE and left.slot == right.slot:
+                return self.simplified_to(self.constant(0, node))
+        elif operator == "/":
+            if right_constant == 1:
+                return self.simplified_to(left)
+        return node
+
+    def simplified_to(self, node):
+        self.simplified += 1
+        return node
+
+    def constant(self, value, node):
+        folded = ASTNode(NUMBER_LITERAL, str(value), position=node.position)
+        folded.value_type = "integer"
+        return folded
+
+    def is_safe(self, node):
+        """Whether dropping an expression cannot hide a runtime error, i.e. it has no division."""
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.kind == BINARY_OPERATION:
+                if node.value == "/":
+                    return False
+                stack.extend(node.children)
+        return True
+
+    def report(self):
+        return {
+            "level": self.level,
+            "folded": self.folded,
+            "simplified": self.simplified,
+            "instructions_eliminated": self.instructions_eliminated,
+        }
@@ -0,0 +1,75 @@
+import sys
+from collections import deque
+
+# Values a StreamSink buffers before writing them out in one piece
+STREAM_CHUNK_LINES = 4096
+
+
+# Where a running program's writes go. A sink has write(value), called once per value written
+# (it is called straight from the Interpreter's handlers and the Python backend, so it is often
+# a bound builtin), flush(), called by minipascal.execute() once the run is over, and values: the
+# values it kept, or None if it keeps none.
+
+
+class ListSink:
+    """Keeps every value, in order."""
+
+    def __init__(self):
+        self.values = []
+        self.write = self.values.append
+
+    def flush(self):
+        pass
+
+
+class RingSink:
+    """Keeps the last `limit` values only, so its memory does not grow with the output."""
+
+    def __init__(self, limit):
+        if limit < 1:
+            raise ValueError(f"A RingSink keeps at least one value, got a limit of {limit}")
+        self.limit = limit
+        self.lines = deque(maxlen=limit)
+        self.write = self.lines.append
+
+    @property
+    def values(self):
+        return list(self.lines)
+
+    def flush(self):
+        pass
+
+
+class StreamSink:
+    """Writes each value on its own line to a text stream, `chunk_lines` values at a time; keeps
+    none. The stream is not closed."""
+    values = None
+
+    def __init__(self, stream=None, chunk_lines=STREAM_CHUNK_LINES):
+        self.stream = stream if stream is not None else sys.stdout
+        self.chunk_lines = chunk_lines
+        self.buffer = []
+
+    def write(self, value):
+        buffer = self.buffer
+        buffer.append(str(value))
+        if len(buffer) >= self.chunk_lines:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.buffer.append("")  # Ends the last line
+            self.stream.write("\n".join(self.buffer))
+            self.buffer.clear()
+        self.stream.flush()
+
+
+class CallbackSink:
+    """Calls `callback` with each value; keeps none."""
+    values = None
+
+    def __init__(self, callback):
+        self.write = callback
+
+    def flush(self):
+        pass
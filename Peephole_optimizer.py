@@ -0,0 +1,170 @@
+from Code_generator import *
+
+# Instructions that only read their operands, or write the register or address named first. Jumps
+# and labels are not: no rule matches across them, so every window is entered at its top
+STRAIGHT_LINE = frozenset([MOV, ADD, SUB, MUL, DIV, PUSH, POP, OUT, OUT_STR, CMP])
+WRITES_FIRST_OPERAND = frozenset([MOV, ADD, SUB, MUL, DIV, POP])
+# Operations that leave their destination unchanged with this immediate operand
+NEUTRAL_OPERANDS = {ADD: (IMMEDIATE, 0), SUB: (IMMEDIATE, 0), MUL: (IMMEDIATE, 1), DIV: (IMMEDIATE, 1)}
+
+
+def writes(instruction, operand):
+    """Whether a straight-line instruction may change `operand`."""
+    opcode, operands = instruction
+    return opcode not in STRAIGHT_LINE or (opcode in WRITES_FIRST_OPERAND and operands[0] == operand)
+
+
+class PeepholeRule:
+    """Rewrites `size` consecutive instructions into fewer ones.
+
+    rewrite() gets the window as CodeGenerator (opcode, operands) pairs and returns the replacement list,
+    or None when the rule does not apply. Replacements must be shorter than the window.
+    """
+    name = None
+    size = 1
+
+    def rewrite(self, window):
+        return None
+
+
+class SelfMove(PeepholeRule):
+    """MOV R, R does nothing."""
+    name = "self_move"
+    size = 1
+
+    def rewrite(self, window):
+        (opcode, operands), = window
+        if opcode == MOV and operands[0] == operands[1]:
+            return []
+
+
+class NeutralOperation(PeepholeRule):
+    """ADD R, 0 / SUB R, 0 / MUL R, 1 / DIV R, 1 leave R unchanged."""
+    name = "neutral_operation"
+    size = 1
+
+    def rewrite(self, window):
+        (opcode, operands), = window
+        if opcode in NEUTRAL_OPERANDS and operands[1] == NEUTRAL_OPERANDS[opcode]:
+            return []
+
+
+class StoreLoad(PeepholeRule):
+    """MOV $a, R; MOV R, $a: R still holds the stored value. MOV R, $a; MOV $a, R stores it back."""
+    name = "store_load"
+    size = 2
+
+    def rewrite(self, window):
+        first, second = window
+        if first[0] == MOV and second[0] == MOV and first[1] == second[1][::-1]:
+            return [first]
+
+
+class DeadMove(PeepholeRule):
+    """MOV X, a; MOV X, b (b not X) or MOV R, a; POP R: the first value is never read."""
+    name = "dead_move"
+    size = 2
+
+    def rewrite(self, window):
+        (opcode, operands), (next_opcode, next_operands) = window
+        if opcode != MOV or operands[0] != next_operands[0]:
+            return None
+        if (next_opcode == MOV and next_operands[1] != operands[0]) or next_opcode == POP:
+            return [window[1]]
+
+
+class PushPop(PeepholeRule):
+    """PUSH x; POP R is a move through the stack."""
+    name = "push_pop"
+    size = 2
+
+    def rewrite(self, window):
+        (opcode, operands), (next_opcode, next_operands) = window
+        if opcode == PUSH and next_opcode == POP:
+            if operands[0] == next_operands[0]:
+                return []
+            return [(MOV, (next_operands[0], operands[0]))]
+
+
+class PushOperand(PeepholeRule):
+    """MOV R, x; PUSH R; then R overwritten: push x directly."""
+    name = "push_operand"
+    size = 3
+
+    def rewrite(self, window):
+        (opcode, operands), (push, pushed), third = window
+        if opcode != MOV or push != PUSH or pushed[0] != operands[0] or operands[0][0] != REGISTER:
+            return None
+        if third[0] == MOV and third[1][0] == operands[0] and third[1][1] != operands[0]:
+            return [(PUSH, (operands[1],)), third]
+
+
+class RepeatedLoad(PeepholeRule):
+    """MOV R, x (or MOV x, R); I; MOV R, x where I changes neither R nor x: R already holds x."""
+    name = "repeated_load"
+    size = 3
+
+    def rewrite(self, window):
+        first, middle, last = window
+        if first[0] != MOV or last[0] != MOV or last[1] not in (first[1], first[1][::-1]):
+            return None
+        if writes(middle, first[1][0]) or writes(middle, first[1][1]):
+            return None
+        return [first, middle]
+
+
+DEFAULT_RULES = (SelfMove(), NeutralOperation(), StoreLoad(), DeadMove(), PushPop(), PushOperand(),
+                 RepeatedLoad())
+
+
+class PeepholeOptimizer:
+    """Window-based rewriting of a CodeGenerator instruction list, before it is assembled.
+
+    Instructions are moved one at a time onto an output list, and after each one every rule
+    is tried on the tail of that list. A rewrite puts its replacement back on the input, so
+    it can take part in further matches; since every rewrite shortens the code, this stops.
+    """
+
+    def __init__(self, rules=DEFAULT_RULES):
+        self.rules = tuple(rules)
+        self.hits = {rule.name: 0 for rule in self.rules}  # Rewrites done by each rule
+        self.removed = 0
+
+    def optimize(self, instructions, positions=None):
+        """The rewritten instructions. When `positions` gives the source range of each instruction,
+        the ranges of the rewritten ones are returned with them: a kept instruction keeps its
+        range, a new one takes that of the first instruction of its window."""
+        pending = instructions[::-1]
+        pending_positions = positions[::-1] if positions is not None else [None] * len(pending)
+        output = []
+        output_positions = []
+        rules = self.rules
+        while pending:
+            output.append(pending.pop())
+            output_positions.append(pending_positions.pop())
+            for rule in rules:
+                size = rule.size
+                if len(output) < size:
+                    continue
+                window = output[-size:]
+                replacement = rule.rewrite(window)
+                if replacement is None:
+                    continue
+                if len(replacement) >= size:
+                    raise ValueError(f"Peephole rule {rule.name} must shorten the code")
+                window_positions = output_positions[-size:]
+                del output[-size:]
+                del output_positions[-size:]
+                for instruction in reversed(replacement):
+                    pending.append(instruction)
+                    kept = next((i for i, original in enumerate(window) if original is instruction), 0)
+                    pending_positions.append(window_positions[kept])
+                self.hits[rule.name] += 1
+                self.removed += size - len(replacement)
+                break
+        if positions is not None:
+            return output, output_positions
+        return output
+
+    def report(self):
+        return {"removed": self.removed, "hits": dict(self.hits)}
@@ -0,0 +1,215 @@
+from Semantic_analyzer import *
+from Bytecode import INTEGER_MIN, wrap_integer
+
+# Python operator for each integer operator; "/" is floor division, like the interpreter's DIV
+PYTHON_OPERATORS = {"+": "+", "-": "-", "*": "*", "/": "//", "=": "==", "<>": "!=", "<": "<", "<=": "<=",
+                    ">": ">", ">=": ">="}
+# Operators that work on 64-bit operands, so their operands are wrapped first
+WRAPPED_OPERANDS = frozenset(["/", "=", "<>", "<", "<=", ">", ">="])
+
+# Python expression wrapping an integer expression to 64 bits, like the interpreter's integer cells
+WRAP_INTEGER = f"(((({{}}) + {-INTEGER_MIN}) & {(1 << 64) - 1}) - {-INTEGER_MIN})"
+
+# Deepest expression written inline; deeper subtrees are evaluated into temporaries, since
+# Python's parser rejects too many nested parentheses
+MAX_INLINE_DEPTH = 50
+
+# Deepest indent of a line below the function body: Python's tokenizer rejects a 100th level of
+# indentation, and the body is the first one. Deeper programs are left to the Interpreter
+MAX_INDENT = 98
+
+# Loop iterations between two calls of the function's `check`; see source()
+CHECK_ITERATIONS = 1 << 12
+
+# Code objects by generated source, shared by every PythonBackend; the oldest is dropped when full
+code_cache = {}
+CODE_CACHE_SIZE = 64
+
+
+class PythonBackend:
+    """Translates the checked AST into a Python function, the alternative to CodeGenerator.
+
+    Each Pascal variable becomes a local `v<slot>` of the function, so it is read and written
+    as a fast local, and write() calls the `write` callable the function is given. Loops call
+    its optional `check` every CHECK_ITERATIONS iterations, so a Budget can stop the program. Integers
+    are wrapped to 64 bits where the interpreter wraps them: when stored, written or divided. Running it
+    has the same observable behaviour as the Interpreter, except for how errors are reported:
+    a TypeError or ZeroDivisionError means the program must be rerun on the Interpreter to
+    get its diagnostic (see minipascal.run).
+    """
+
+    def __init__(self, ast, symbol_table):
+        self.ast = ast
+        self.symbol_table = symbol_table
+        self.lines = []
+        self.indent = 0  # Nesting level of the lines being appended, below the function body
+        self.program_name = "program"
+
+    def emit(self, line):
+        if self.indent > MAX_INDENT:
+            # Raised before the source, whose size grows with the square of the nesting, is built
+            raise SyntaxError("too many levels of indentation")
+        self.lines.append("    " * self.indent + line)
+
+    def emit_check(self):
+        """Count down a loop iteration, calling check() when the count reaches zero. Without a
+        check, the count starts negative and never does."""
+        self.emit("ticks -= 1")
+        self.emit(f"if not ticks: check(); ticks = {CHECK_ITERATIONS}")
+
+    def generate_code(self, node):
+        """Append the statements of `node` to self.lines.
+
+        The explicit stack also holds the (line, indent) pairs to emit between the statements of
+        an if or a loop, and bare indents to return to after them.
+        """
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if type(node) is int:  # Back out of a nested suite
+                self.indent = node
+                continue
+            if type(node) is tuple:  # A suite header such as "else:"
+                line, self.indent = node
+                self.emit(line)
+                self.indent += 1
+                self.emit("pass")  # The suite may have no statement
+                continue
+
+            if node.kind == PROGRAM_NAME:
+                self.program_name = node.value
+
+            elif node.kind in (PROGRAM, BLOCK, STATEMENTS):
+                stack.extend(reversed(node.children))
+
+            elif node.kind == DECLARATIONS:
+                # The locals are declared by source()
+                pass
+
+            elif node.kind == ASSIGNMENT:
+                expression = self.generate_expression(node.children[0], node.value_type == "integer")
+                self.emit(f"v{node.slot} = {expression}")
+
+            elif node.kind == WRITE:
+                expr_node = node.children[0]
+                expression = self.generate_expression(expr_node, node.value_type == "integer")
+                if node.value_type == "string" and expr_node.kind == VARIABLE:
+                    # OUT_STR only writes strings: an unassigned variable is an error
+                    self.emit(f"if v{expr_node.slot}.__class__ is not str: raise TypeError")
+                self.emit(f"write({expression})")
+
+            elif node.kind == IF:
+                indent = self.indent
+                self.emit(f"if {self.generate_expression(node.children[0])}:")
+                self.indent += 1
+                self.emit("pass")  # The branch may have no statement
+                stack.append(indent)
+                if len(node.children) > 2:
+                    stack.append(node.children[2])
+                    stack.append(("else:", indent))
+                stack.append(node.children[1])
+
+            elif node.kind == WHILE:
+                indent = self.indent
+                condition = node.children[0]
+                first_line = len(self.lines)
+                expression = self.generate_expression(condition)
+                if len(self.lines) == first_line:
+                    self.emit(f"while {expression}:")
+                    self.indent += 1
+                else:
+                    # The condition needs temporaries, which must be computed on every iteration
+                    del self.lines[first_line:]
+                    self.emit("while True:")
+                    self.indent += 1
+                    self.emit(f"if not {self.generate_expression(condition)}: break")
+                self.emit_check()
+                stack.append(indent)
+                stack.append(node.children[1])
+
+            elif node.kind == FOR:
+                # The loop variable may not be assigned in the body, so range() can count it; it is
+                # set first, so it holds the start value even when the body never runs
+                indent = self.indent
+                start, limit, body = node.children
+                variable = f"v{node.slot}"
+                self.emit(f"{variable} = {self.generate_expression(start, True)}")
+                self.emit(f"for {variable} in range({variable}, {self.generate_expression(limit, True)} + 1):")
+                self.indent += 1
+                self.emit_check()
+                stack.append(indent)
+                stack.append(body)
+
+    def generate_expression(self, node, wrap=False):
+        """Python expression for `node`; statements computing its deep subtrees come first.
+
+        Built bottom-up on an explicit stack. A subtree reaching MAX_INLINE_DEPTH is assigned to a
+        temporary t0, t1, ...; the numbering restarts with each expression. With `wrap`, the
+        integer result is wrapped to 64 bits.
+        """
+        results = []  # (expression, depth, whether its value is known to fit in 64 bits)
+        temporaries = 0
+        stack = [(node, False)]
+        while stack:
+            node, operands_done = stack.pop()
+            kind = node.kind
+            if kind == NUMBER_LITERAL:
+                results.append((str(wrap_integer(int(node.value))), 0, True))
+            elif kind == STRING_LITERAL:
+                results.append((repr(node.value), 0, True))
+            elif kind == VARIABLE:
+                results.append((f"v{node.slot}", 0, True))
+            elif kind == BINARY_OPERATION:
+                if not operands_done:
+                    stack.append((node, True))
+                    stack.append((node.children[1], False))
+                    stack.append((node.children[0], False))
+                    continue
+                right, right_depth, right_fits = results.pop()
+                left, left_depth, left_fits = results[-1]
+                if node.value in WRAPPED_OPERANDS:
+                    left = left if left_fits else WRAP_INTEGER.format(left)
+                    right = right if right_fits else WRAP_INTEGER.format(right)
+                expression = f"({left} {PYTHON_OPERATORS[node.value]} {right})"
+                depth = max(left_depth, right_depth) + 1
+                if depth >= MAX_INLINE_DEPTH:
+                    temporary = f"t{temporaries}"
+                    temporaries += 1
+                    self.emit(f"{temporary} = {expression}")
+                    expression, depth = temporary, 0
+                results[-1] = (expression, depth, False)
+            else:
+                raise ValueError(f"Unsupported node type for expression: {node.type}")
+        expression, _, fits = results[0]
+        return WRAP_INTEGER.format(expression) if wrap and not fits else expression
+
+    def source(self):
+        """Python source of the whole program, as a function of `write` and optionally `check`."""
+        header = [f"def run_{self.program_name}(write, check=None):",
+                  f"    ticks = -1 if check is None else {CHECK_ITERATIONS}"]
+        # Like the interpreter's stores, integers start at 0 and strings unassigned
+        integers = [f"v{slot}" for slot, symbol in enumerate(self.symbol_table) if symbol.type == "integer"]
+        strings = [f"v{slot}" for slot, symbol in enumerate(self.symbol_table) if symbol.type != "integer"]
+        if integers:
+            header.append("    " + " = ".join(integers) + " = 0")
+        if strings:
+            header.append("    " + " = ".join(strings) + " = None")
+        body = [f"    {line}\n" for line in self.lines] or ["    pass\n"]
+        return "\n".join(header) + "\n" + "".join(body)
+
+    def compile(self):
+        """Code object of the module defining the program function; identical sources share one."""
+        source = self.source()
+        code = code_cache.get(source)
+        if code is None:
+            if len(code_cache) >= CODE_CACHE_SIZE:
+                del code_cache[next(iter(code_cache))]
+            code = code_cache[source] = compile(source, f"<minipascal {self.program_name}>", "exec")
+        return code
+
+
+def load_function(code):
+    """The program function defined by a code object from PythonBackend.compile()."""
+    namespace = {}
+    exec(code, namespace)
+    return next(value for name, value in namespace.items() if name.startswith("run_"))
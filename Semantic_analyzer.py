@@ -1,142 +1,172 @@
 from Syntax_analyzer import *
+from Symbol_table import SymbolTable
 
 class Semantic_analyzer:
     def __init__(self, ast):
         self.ast = ast
-        self.symbol_table = {}
+        self.symbol_table = SymbolTable()
+        self.loop_slots = set()  # Slots of the enclosing for-loop variables, which may not be assigned
 
     def evaluate(self, node):
-        if node.type == "ProgramName":
-            pass
-
-        elif node.type == "Program":
-            for child in node.children:
-                self.evaluate(child)
-
-        elif node.type == "Block":
-            for child in node.children:
-                self.evaluate(child)
-
-        elif node.type == "Statements":
-            for child in node.children:
-                self.evaluate(child)
-
-        elif node.type == "Declarations":
-            adr = 0
-            for declaration in node.children:
-                var_type = None
-                var_list = []
-
-                for child in declaration.children:
-                    if child.type == "Variable":
-                        var_list.append(child.value)
-                    elif child.type == "Type":
-                        var_type = child.value
-                        for variable in var_list:
-                            self.symbol_table[variable] = {
-                                "type": var_type,
-                                "address": adr,
-                                # "value": None
-                            }
-                            adr += 1
-                        var_list = []
-                        var_type = None
-                    elif var_type is None:
-                        raise ValueError(f"Type not declared for variable {var_list}")
-
-        elif node.type == "Assignment":
-            var_name = node.value
-            if var_name not in self.symbol_table:
-                raise ValueError(f"Variable {var_name} is not declared")
-
-            expected_type = self.symbol_table[var_name]["type"]
-            assigned_node = node.children[0]
-            assigned_type = self.get_node_type(assigned_node)
-
-            # Type check
-            if expected_type != assigned_type:
-                raise TypeError(
-                    f"Type error: Cannot assign {assigned_type} to {expected_type} variable {var_name}"
-                )
-            for child in node.children:
-                self.evaluate(child)
-
-        elif node.type == "BinaryOperation":
-            left_type = self.get_node_type(node.children[0])
-            right_type = self.get_node_type(node.children[1])
-            operator = node.value
-
-            # Type check
-            if operator in ("+", "-","*","/"):
-                if left_type != "integer" or right_type != "integer":
+        """Checks `node` and everything in it; returns the type of an expression.
+
+        Nested statements are walked from an explicit stack instead of recursively. It also holds,
+        as an int, the slot of each for-loop variable, released once the body of its loop is checked.
+        """
+        if node.kind in (BINARY_OPERATION, NUMBER_LITERAL, STRING_LITERAL, VARIABLE):
+            return self.get_node_type(node)
+
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if type(node) is int:
+                self.loop_slots.discard(node)  # The body of its for-loop is checked
+
+            elif node.kind == PROGRAM_NAME:
+                pass
+
+            elif node.kind in (PROGRAM, BLOCK, STATEMENTS):
+                stack.extend(reversed(node.children))
+
+            elif node.kind == DECLARATIONS:
+                # A name declared twice is an error, raised by SymbolTable.declare
+                for declaration in node.children:
+                    var_type = None
+                    var_list = []
+
+                    for child in declaration.children:
+                        if child.kind == VARIABLE:
+                            var_list.append(child.value)
+                        elif child.kind == TYPE:
+                            var_type = child.value
+                            for variable in var_list:
+                                self.symbol_table.declare(variable, var_type)
+                            var_list = []
+                            var_type = None
+                        elif var_type is None:
+                            raise ValueError(f"Type not declared for variable {var_list}")
+
+            elif node.kind == ASSIGNMENT:
+                var_name = node.value
+                symbol = self.symbol_table.resolve(var_name)
+                if symbol is None:
+                    raise ValueError(f"Variable {var_name} is not declared")
+
+                if symbol.slot in self.loop_slots:
+                    raise ValueError(f"Cannot assign to for-loop variable {var_name}")
+                expected_type = symbol.type
+                node.value_type = expected_type
+                node.slot = symbol.slot
+                assigned_node = node.children[0]
+                assigned_type = self.get_node_type(assigned_node)
+
+                # Type check
+                if expected_type != assigned_type:
                     raise TypeError(
-                        f"Type error: Cannot apply operator {operator} to non-integer operands"
+                        f"Type error: Cannot assign {assigned_type} to {expected_type} variable {var_name}"
                     )
-                if operator == "/":
-                    if node.children[1].type =="Number"and int(node.children[1].value) == 0:
-                        raise ZeroDivisionError("Semantic error: Division by zero")
 
-            elif operator == "+":
-                # Allow string concatenation
-                if left_type == "string" and right_type == "string":
-                    return "string"
-                else:
+            elif node.kind == WRITE:
+                # Ensure the argument type is either integer or string
+                expr_type = self.get_node_type(node.children[0])
+                if expr_type not in ("integer", "string"):
                     raise TypeError(
-                        f"Type error: Operator '+' requires both operands to be strings or integers"
+                        f"Type error: write() only supports integer or string arguments, got {expr_type}"
                     )
-            for child in node.children:
-                self.evaluate(child)
-
-        elif node.type == "Number":
-            return "integer"
-
-        elif node.type == "String":
-            return "string"
-
-        elif node.type == "Variable":
-            if node.value not in self.symbol_table:
-                raise ValueError(f"Variable {node.value} is not declared")
-            return self.symbol_table[node.value]["type"]
+                node.value_type = expr_type
+
+            elif node.kind in (IF, WHILE):
+                self.check_condition(node.children[0])
+                stack.extend(reversed(node.children[1:]))
+
+            elif node.kind == FOR:
+                var_name = node.value
+                symbol = self.symbol_table.resolve(var_name)
+                if symbol is None:
+                    raise ValueError(f"Variable {var_name} is not declared")
+                if symbol.type != "integer":
+                    raise TypeError(f"Type error: for-loop variable {var_name} must be an integer, got {symbol.type}")
+                if symbol.slot in self.loop_slots:
+                    raise ValueError(f"Cannot assign to for-loop variable {var_name}")
+                node.value_type = symbol.type
+                node.slot = symbol.slot
+                start, limit, body = node.children
+                for bound in (start, limit):
+                    bound_type = self.get_node_type(bound)
+                    if bound_type != "integer":
+                        raise TypeError(f"Type error: for-loop bounds must be integers, got {bound_type}")
+                self.loop_slots.add(symbol.slot)
+                stack.append(symbol.slot)
+                stack.append(body)
 
-        elif node.type == "Write":
-            # Ensure the argument type is either integer or string
-            expr_type = self.get_node_type(node.children[0])
-            if expr_type not in ("integer", "string"):
-                raise TypeError(
-                    f"Type error: write() only supports integer or string arguments, got {expr_type}"
-                )
+            else:
+                raise ValueError(f"Unknown node type: {node.type}")
 
-        else:
-            raise ValueError(f"Unknown node type: {node.type}")
+    def check_condition(self, node):
+        """A condition must be a comparison of integers."""
+        condition_type = self.get_node_type(node)
+        if condition_type != "boolean":
+            raise TypeError(f"Type error: Condition must be a comparison, got {condition_type}")
 
     def get_node_type(self, node):
-        if node.type == "Number":
-            return "integer"
-        elif node.type == "String":
-            return "string"
-        elif node.type == "Variable":
-            if node.value not in self.symbol_table:
-                raise ValueError(f"Variable {node.value} is not declared")
-            return self.symbol_table[node.value]["type"]
-        elif node.type == "BinaryOperation":
-            left_type = self.get_node_type(node.children[0])
-            right_type = self.get_node_type(node.children[1])
-
-            if left_type == "integer" and right_type == "integer":
-                return "integer"
-            elif left_type == "string" and right_type == "string":
-                return "string"
+        """Type of an expression, checking every operator in it on the way.
+
+        Each node is visited once, bottom-up, and annotated with its value_type (and variables
+        with their slot); an already annotated subtree is not walked again. The tree is walked
+        with an explicit stack, so deep expressions do not recurse.
+        """
+        if node.value_type is not None:
+            return node.value_type
+        types = []
+        stack = [(node, False)]
+        while stack:
+            node, operands_done = stack.pop()
+            kind = node.kind
+            if node.value_type is not None:
+                types.append(node.value_type)
+                continue
+            if kind == NUMBER_LITERAL:
+                node.value_type = "integer"
+                types.append("integer")
+            elif kind == STRING_LITERAL:
+                node.value_type = "string"
+                types.append("string")
+            elif kind == VARIABLE:
+                symbol = self.symbol_table.resolve(node.value)
+                if symbol is None:
+                    raise ValueError(f"Variable {node.value} is not declared")
+                node.value_type = symbol.type
+                node.slot = symbol.slot
+                types.append(node.value_type)
+            elif kind == BINARY_OPERATION:
+                if not operands_done:
+                    stack.append((node, True))
+                    stack.append((node.children[1], False))
+                    stack.append((node.children[0], False))
+                    continue
+                right_type = types.pop()
+                left_type = types[-1]
+                operator = node.value
+
+                # Type check
+                if left_type != "integer" or right_type != "integer":
+                    raise TypeError(
+                        f"Type error: Cannot apply operator {operator} to non-integer operands"
+                    )
+                if operator == "/":
+                    if node.children[1].kind == NUMBER_LITERAL and int(node.children[1].value) == 0:
+                        raise ZeroDivisionError("Semantic error: Division by zero")
+                # A comparison is a boolean, which only a condition accepts
+                node.value_type = "boolean" if operator in COMPARISON_OPERATORS else "integer"
+                types[-1] = node.value_type
             else:
-                raise TypeError(
-                    f"Type error in binary operation with types {left_type} and {right_type}"
-                )
-        else:
-            raise ValueError(f"Unsupported node type for type checking: {node.type}")
-
-
-parser = Parser(tokens)
-ast_root = parser.inspect_program()
-semantic_analyzer = Semantic_analyzer(ast_root)
-semantic_analyzer.evaluate(ast_root)
-symbol_table = semantic_analyzer.symbol_table
-print(symbol_table)
\ No newline at end of file
+                raise ValueError(f"Unsupported node type for type checking: {node.type}")
+        return types[0]
+
+if __name__ == "__main__":
+    parser = Parser(LexicalAnalyser().analyse(source_code))
+    ast_root = parser.inspect_program()
+    semantic_analyzer = Semantic_analyzer(ast_root)
+    semantic_analyzer.evaluate(ast_root)
+    symbol_table = semantic_analyzer.symbol_table
+    print(symbol_table.as_dict())
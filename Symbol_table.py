@@ -0,0 +1,72 @@
+import sys
+
+
+class Symbol:
+    __slots__ = ("name", "type", "slot", "depth")
+
+    def __init__(self, name, type, slot, depth):
+        self.name = name
+        self.type = type
+        self.slot = slot  # Index of the variable's memory cell, fixed once declared
+        self.depth = depth  # Nesting level of the declaring scope, 0 for the program
+
+    def __repr__(self):
+        return f"Symbol({self.name!r}, {self.type!r}, slot={self.slot}, depth={self.depth})"
+
+
+class SymbolTable:
+    """Declared names in nested scopes, each bound to an integer memory slot.
+
+    Names are interned and resolved once by the semantic pass; later stages only carry slots.
+    Slots are never reused, so leaving a scope keeps its variables addressable.
+    """
+
+    def __init__(self):
+        self.scopes = [{}]
+        self.symbols = []  # Indexed by slot
+
+    def enter_scope(self):
+        self.scopes.append({})
+
+    def exit_scope(self):
+        if len(self.scopes) == 1:
+            raise ValueError("Cannot leave the program scope")
+        self.scopes.pop()
+
+    def declare(self, name, type):
+        """Bind `name` to a new slot in the innermost scope. Declaring a name twice in one scope,
+        as in `var a: integer; a: string;`, raises ValueError: the program is rejected, where the
+        first semantic pass let the second declaration replace the first."""
+        name = sys.intern(name)
+        scope = self.scopes[-1]
+        if name in scope:
+            raise ValueError(f"Variable {name} is already declared")
+        symbol = Symbol(name, type, len(self.symbols), len(self.scopes) - 1)
+        scope[name] = symbol
+        self.symbols.append(symbol)
+        return symbol
+
+    def resolve(self, name):
+        """The innermost visible symbol called `name`, or None."""
+        for scope in reversed(self.scopes):
+            symbol = scope.get(name)
+            if symbol is not None:
+                return symbol
+        return None
+
+    def __contains__(self, name):
+        return self.resolve(name) is not None
+
+    def __getitem__(self, slot):
+        return self.symbols[slot]
+
+    def __iter__(self):
+        return iter(self.symbols)
+
+    def __len__(self):
+        """Number of slots, i.e. the memory cells a program needs."""
+        return len(self.symbols)
+
+    def as_dict(self):
+        """Flat name -> {"type", "address"} view, as shown in the GUI symbol table."""
+        return {symbol.name: {"type": symbol.type, "address": symbol.slot} for symbol in self.symbols}
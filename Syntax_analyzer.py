@@ -1,170 +1,345 @@
+from collections import deque
+
 from Lexical_analyzer import *
 
+# AST node kinds
+(PROGRAM, PROGRAM_NAME, DECLARATIONS, VAR_DECLARATION, VARIABLE, TYPE, BLOCK, STATEMENTS, ASSIGNMENT, WRITE,
+ BINARY_OPERATION, NUMBER_LITERAL, STRING_LITERAL, IF, WHILE, FOR) = range(16)
+NODE_KIND_NAMES = ("Program", "ProgramName", "Declarations", "VarDeclaration", "Variable", "Type", "Block",
+                   "Statements", "Assignment", "Write", "BinaryOperation", "Number", "String", "If", "While", "For")
+
+# Binding strength of the binary operators
+BINARY_PRECEDENCE = {"+": 1, "-": 1, "*": 2, "/": 2}
+# Operators of the comparison a condition is made of; it is a BinaryOperation of type boolean
+COMPARISON_OPERATORS = frozenset(["=", "<>", "<", ">", "<=", ">="])
+
+NO_CHILDREN = ()  # Shared by every leaf, so leaves carry no list of their own
+
+
 class ASTNode:
-    def __init__(self, type, value=None, children=None, position=None):
-        self.type = type
+    __slots__ = ("kind", "value", "children", "position", "end", "value_type", "slot")
+
+    def __init__(self, kind, value=None, children=None, position=None):
+        self.kind = kind
         self.value = value
-        self.children = children if children is not None else []
+        self.children = children if children is not None else NO_CHILDREN
         self.position = position
+        self.end = None  # Set on statements: source offset just past their last token
+        # Filled in once by the semantic pass: the resolved type of an expression or assignment,
+        # and the symbol slot of a variable or assignment target
+        self.value_type = None
+        self.slot = None
+
+    @property
+    def type(self):
+        return NODE_KIND_NAMES[self.kind]
 
     def add_child(self, child):
-        self.children.append(child)
+        if self.children is NO_CHILDREN:
+            self.children = [child]
+        else:
+            self.children.append(child)
 
     def display(self, level=0):
-        indent = "  " * level
-        position_info = f" (position: {self.position})" if self.position is not None else ""
-        print(f"{indent}{self.type}: {self.value}{position_info}")
-        for child in self.children:
-            child.display(level + 1)
+        stack = [(self, level)]
+        while stack:
+            node, level = stack.pop()
+            indent = "  " * level
+            position_info = f" (position: {node.position})" if node.position is not None else ""
+            print(f"{indent}{node.type}: {node.value}{position_info}")
+            stack.extend((child, level + 1) for child in reversed(node.children))
 
 
 class Parser:
-    def __init__(self, tokens):
-        self.tokens = tokens
-        self.position = 0
+    def __init__(self, tokens, line_index=None):
+        # Any iterable of tokens; a generator such as LexicalAnalyser.iter_tokens is pulled lazily
+        self.tokens = iter(tokens)
+        self.lookahead = deque()
+        self.position = 0  # Number of tokens consumed so far
+        self.previous = None  # Last token consumed
+        self.line_index = line_index  # Only used to place diagnostics
 
     def current_token(self):
-        if self.position < len(self.tokens):
-            return self.tokens[self.position]
-        return None
+        return self.peek(0)
+
+    def peek(self, offset):
+        """Token `offset` places after the current one, or None past the end of input."""
+        lookahead = self.lookahead
+        while len(lookahead) <= offset:
+            token = next(self.tokens, None)
+            if token is None:
+                return None
+            lookahead.append(token)
+        return lookahead[offset]
+
+    def check(self, kind, value=None):
+        """Whether the current token has the given kind (and value, if one is given)."""
+        token = self.current_token()
+        return token is not None and token[0] == kind and (value is None or token[1] == value)
 
-    def consume(self, expected_type):
+    def consume(self, expected_kind):
         token = self.current_token()
-        if token and token["type"] == expected_type:
+        if token and token[0] == expected_kind:
+            self.lookahead.popleft()
             self.position += 1
+            self.previous = token
             return token
-        raise ValueError(f"Syntax Error: Expected {expected_type}, got {token}")
+        raise ValueError(f"Syntax Error: Expected {TOKEN_KIND_NAMES[expected_kind]}, got {self.describe(token)}")
 
-    def inspect_program(self):
-        program_node = ASTNode("Program")
-        token = self.consume("KEYWORD")  # 'program'
-        program_node.value = token["value"]
-        program_node.position = token["position"]
-        name_token = self.consume("IDENTIFIER")
-        program_node.add_child(ASTNode("ProgramName", name_token["value"], position=name_token["position"]))
-        self.consume("DELIMITER")  # ';'
-
-        if self.current_token() and self.current_token()["value"] == "var":
-            program_node.add_child(self.inspect_vars())
+    def describe(self, token):
+        """Render a token for an error message, with its line and column when the source is known."""
+        if token is None:
+            return "end of input"
+        kind, value, position = token
+        if self.line_index is None:
+            return f"{TOKEN_KIND_NAMES[kind]} '{value}' at position {position}"
+        return f"{TOKEN_KIND_NAMES[kind]} '{value}' at {self.line_index.describe(position)}"
 
+    def inspect_program(self):
+        program_node = self.inspect_header()
         program_node.add_child(self.inspect_block())
-        self.consume("DELIMITER")  # '.'
+        self.consume(DELIMITER)  # '.'
+        return program_node
+
+    def inspect_header(self):
+        """The Program node with its name and declarations, up to the 'begin' of its block."""
+        program_node = ASTNode(PROGRAM)
+        _, program_node.value, program_node.position = self.consume(KEYWORD)  # 'program'
+        _, name, position = self.consume(IDENTIFIER)
+        program_node.add_child(ASTNode(PROGRAM_NAME, name, position=position))
+        self.consume(DELIMITER)  # ';'
+
+        if self.check(KEYWORD, "var"):
+            program_node.add_child(self.inspect_vars())
         return program_node
 
     def inspect_vars(self):
-        vars_node = ASTNode("Declarations")
-        self.consume("KEYWORD")  # 'var'
-
-        while self.current_token() and self.current_token()["type"] == "IDENTIFIER":
-            var_decl_node = ASTNode("VarDeclaration")
-            while self.current_token() and self.current_token()["type"] == "IDENTIFIER":
-                var_token = self.consume("IDENTIFIER")
-                var_decl_node.add_child(ASTNode("Variable", var_token["value"], position=var_token["position"]))
-                if self.current_token() and self.current_token()["value"] == ",":
-                    self.consume("DELIMITER")
+        vars_node = ASTNode(DECLARATIONS)
+        self.consume(KEYWORD)  # 'var'
+
+        while self.check(IDENTIFIER):
+            var_decl_node = ASTNode(VAR_DECLARATION)
+            while self.check(IDENTIFIER):
+                _, name, position = self.consume(IDENTIFIER)
+                var_decl_node.add_child(ASTNode(VARIABLE, name, position=position))
+                if self.check(DELIMITER, ","):
+                    self.consume(DELIMITER)
                 else:
                     break
-            self.consume("DELIMITER")  # ':'
-            type_token = self.consume("KEYWORD")
-            var_decl_node.add_child(ASTNode("Type", type_token["value"], position=type_token["position"]))
-            self.consume("DELIMITER")  # ';'
+            self.consume(DELIMITER)  # ':'
+            _, type_name, position = self.consume(KEYWORD)
+            var_decl_node.add_child(ASTNode(TYPE, type_name, position=position))
+            self.consume(DELIMITER)  # ';'
             vars_node.add_child(var_decl_node)
 
         return vars_node
 
     def inspect_block(self):
-        block_node = ASTNode("Block")
-        self.consume("KEYWORD")  # 'begin'
-        block_node.add_child(self.inspect_statements())
-        self.consume("KEYWORD")  # 'end'
-        return block_node
-
-    def inspect_statements(self):
-        statements_node = ASTNode("Statements")
-        while self.current_token() and not (
-                self.current_token()["type"] == "KEYWORD" and self.current_token()["value"] == "end"):
-            statements_node.add_child(self.inspect_statement())
-        return statements_node
+        """The program's block; unlike a compound statement, it has no end offset."""
+        block_node = ASTNode(BLOCK, None, [ASTNode(STATEMENTS)])
+        _, _, block_node.position = self.consume(KEYWORD)  # 'begin'
+        if self.block_ends():
+            return block_node
+        return self.inspect_nested([block_node], False)
+
+    def block_ends(self):
+        """Whether the statements of a block are over, after its 'begin' or after a statement and
+        its ';'; if so, its 'end' is consumed."""
+        if self.current_token() and not self.check(KEYWORD, "end"):
+            return False
+        self.consume(KEYWORD)  # 'end'
+        return True
 
     def inspect_statement(self):
-        token = self.current_token()
-
-        if token["type"] == "IDENTIFIER":  # Handle assignment
-            var_token = self.consume("IDENTIFIER")
-            self.consume("OPERATOR")  # ':='
+        """A statement node, spanning source offsets [position, end)."""
+        return self.inspect_nested([], True)
+
+    def inspect_nested(self, open_nodes, statement):
+        """Parses statements into the compound statements of open_nodes, innermost last, until all
+        of them are complete, and returns the outermost; with none open, parses one statement.
+        The outermost gets an end offset if it is a statement.
+
+        Compound statements wait on this stack for their next statement instead of recursing,
+        so nesting depth is only bounded by memory.
+        """
+        while True:
+            node = self.inspect_statement_head(open_nodes)
+            if node is None:
+                continue  # A compound statement was opened: parse its first statement
+            self.mark_end(node)
+
+            # Complete the open statements the node ends, innermost first
+            while open_nodes:
+                parent = open_nodes[-1]
+                if parent.kind == BLOCK:
+                    # Statements are separated by ';', which is optional before 'end'
+                    parent.children[0].add_child(node)
+                    if self.check(DELIMITER, ";"):
+                        self.consume(DELIMITER)
+                    elif not self.check(KEYWORD, "end"):
+                        raise ValueError(f"Syntax Error: Expected ';', got {self.describe(self.current_token())}")
+                    if not self.block_ends():
+                        break
+                elif parent.kind == IF:
+                    # An else goes with the nearest if
+                    parent.add_child(node)
+                    if len(parent.children) == 2 and self.check(KEYWORD, "else"):
+                        self.consume(KEYWORD)
+                        break
+                else:  # The body of a while or for
+                    parent.add_child(node)
+                open_nodes.pop()
+                node = parent
+                if open_nodes or statement:
+                    self.mark_end(node)
+            else:
+                return node
+
+    def mark_end(self, node):
+        """End the statement `node` after the last token consumed."""
+        kind, value, position = self.previous
+        node.end = position + len(value) + (2 if kind == STRING else 0)  # A string token drops its quotes
+
+    def inspect_statement_head(self, open_nodes):
+        """Parses a simple statement or an empty block and returns it; of any other compound
+        statement, parses up to its first statement and pushes it on open_nodes, returning None."""
+        if self.check(IDENTIFIER):  # Handle assignment
+            _, name, position = self.consume(IDENTIFIER)
+            self.expect(OPERATOR, ":=")
             expr_node = self.inspect_expression()
-            self.consume("DELIMITER")  # ';'
-            return ASTNode("Assignment", var_token["value"], [expr_node], position=var_token["position"])
+            return ASTNode(ASSIGNMENT, name, [expr_node], position=position)
 
-        elif token["type"] == "KEYWORD" and token["value"] == "write":  # Handle write()
+        if self.check(KEYWORD, "write"):  # Handle write()
             return self.inspect_write()
 
+        if self.check(KEYWORD, "if"):  # if <condition> then <statement> [else <statement>]
+            _, _, position = self.consume(KEYWORD)
+            condition = self.inspect_condition()
+            self.expect(KEYWORD, "then")
+            open_nodes.append(ASTNode(IF, None, [condition], position=position))
+
+        elif self.check(KEYWORD, "while"):  # while <condition> do <statement>
+            _, _, position = self.consume(KEYWORD)
+            condition = self.inspect_condition()
+            self.expect(KEYWORD, "do")
+            open_nodes.append(ASTNode(WHILE, None, [condition], position=position))
+
+        elif self.check(KEYWORD, "for"):  # for <variable> := <expression> to <expression> do <statement>
+            _, _, position = self.consume(KEYWORD)
+            _, name, _ = self.consume(IDENTIFIER)
+            self.expect(OPERATOR, ":=")
+            start = self.inspect_expression()
+            self.expect(KEYWORD, "to")
+            limit = self.inspect_expression()
+            self.expect(KEYWORD, "do")
+            open_nodes.append(ASTNode(FOR, name, [start, limit], position=position))
+
+        elif self.check(KEYWORD, "begin"):  # Compound statement
+            block_node = ASTNode(BLOCK, None, [ASTNode(STATEMENTS)])
+            _, _, block_node.position = self.consume(KEYWORD)
+            if self.block_ends():
+                return block_node
+            open_nodes.append(block_node)
+
         else:
-            raise ValueError(f"Syntax Error: Unexpected statement at {token}")
+            raise ValueError(f"Syntax Error: Unexpected statement at {self.describe(self.current_token())}")
+        return None
+
+    def expect(self, kind, value):
+        """Consume the current token, which must be the given keyword, operator or delimiter."""
+        if not self.check(kind, value):
+            raise ValueError(f"Syntax Error: Expected '{value}', got {self.describe(self.current_token())}")
+        return self.consume(kind)
 
     def inspect_write(self):
-        write_token = self.consume("KEYWORD")  # 'write'
-        self.consume("DELIMITER")  # '('
+        _, _, position = self.consume(KEYWORD)  # 'write'
+        self.consume(DELIMITER)  # '('
         expr_node = self.inspect_expression()  # Parse the expression inside `write()`
-        self.consume("DELIMITER")  # ')'
-        self.consume("DELIMITER")  # ';'
-        return ASTNode("Write", None, [expr_node], position=write_token["position"])
-
-    def inspect_expression(self):
-        left = self.inspect_term()
-
-        while self.current_token() and self.current_token()["type"] == "OPERATOR" and self.current_token()["value"] in (
-                "+", "-"):
-            operator_token = self.consume("OPERATOR")
-            right = self.inspect_term()
-            left = ASTNode("BinaryOperation", operator_token["value"], [left, right],
-                           position=operator_token["position"])
+        self.consume(DELIMITER)  # ')'
+        return ASTNode(WRITE, None, [expr_node], position=position)
 
-        return left
-
-    def inspect_term(self):
-        """inspects a term with multiplication and division."""
-        left = self.inspect_factor()
+    def inspect_condition(self):
+        """A comparison of two expressions."""
+        left = self.inspect_expression()
+        token = self.current_token()
+        if token is None or token[0] != OPERATOR or token[1] not in COMPARISON_OPERATORS:
+            raise ValueError(f"Syntax Error: Expected a comparison operator, got {self.describe(token)}")
+        _, operator, position = self.consume(OPERATOR)
+        right = self.inspect_expression()
+        return ASTNode(BINARY_OPERATION, operator, [left, right], position=position)
 
-        while self.current_token() and self.current_token()["type"] == "OPERATOR" and self.current_token()["value"] in (
-                "*", "/"):
-            operator_token = self.consume("OPERATOR")
-            right = self.inspect_factor()
-            left = ASTNode("BinaryOperation", operator_token["value"], [left, right],
-                           position=operator_token["position"])
+    def inspect_expression(self):
+        """Parses an expression by precedence climbing over explicit stacks.
+
+        Neither parentheses nor operator chains recurse, so nesting depth is only bounded by memory.
+        """
+        operands = []
+        operators = []  # (precedence, operator, position), or None for an open parenthesis
+        open_parentheses = 0
+
+        while True:
+            # An operand: any number of '(' followed by a factor
+            while self.check(DELIMITER, "("):
+                self.consume(DELIMITER)
+                operators.append(None)
+                open_parentheses += 1
+            operands.append(self.inspect_factor())
+
+            # Then closing parentheses, until a binary operator or the end of the expression
+            while True:
+                token = self.current_token()
+                if token is not None and token[0] == OPERATOR and token[1] in BINARY_PRECEDENCE:
+                    precedence = BINARY_PRECEDENCE[token[1]]
+                    while operators and operators[-1] is not None and operators[-1][0] >= precedence:
+                        self.reduce(operands, operators.pop())
+                    _, operator, position = self.consume(OPERATOR)
+                    operators.append((precedence, operator, position))
+                    break
 
-        return left
+                if open_parentheses and token is not None and token[0] == DELIMITER and token[1] == ")":
+                    while operators[-1] is not None:
+                        self.reduce(operands, operators.pop())
+                    operators.pop()
+                    open_parentheses -= 1
+                    self.consume(DELIMITER)  # ')'
+                    continue
+
+                if open_parentheses:
+                    raise ValueError(f"Syntax Error: Expected ')', got {self.describe(token)}")
+                while operators:
+                    self.reduce(operands, operators.pop())
+                return operands[0]
+
+    def reduce(self, operands, operator_entry):
+        """Replace the two topmost operands by a BinaryOperation node."""
+        _, operator, position = operator_entry
+        right = operands.pop()
+        operands[-1] = ASTNode(BINARY_OPERATION, operator, [operands[-1], right], position=position)
 
     def inspect_factor(self):
-        """Parses a single factor: a number, a variable, a grouped expression, or a string."""
-        token = self.current_token()
-
-        if token["type"] == "NUMBER":
-            number_token = self.consume("NUMBER")
-            return ASTNode("Number", number_token["value"], position=number_token["position"])
+        """Parses a single factor: a number, a variable or a string."""
+        if self.check(NUMBER):
+            _, number, position = self.consume(NUMBER)
+            return ASTNode(NUMBER_LITERAL, number, position=position)
 
-        elif token["type"] == "STRING":
-            string_token = self.consume("STRING")
-            return ASTNode("String", string_token["value"], position=string_token["position"])
+        elif self.check(STRING):
+            _, string, position = self.consume(STRING)
+            return ASTNode(STRING_LITERAL, string, position=position)
 
-        elif token["type"] == "IDENTIFIER":
-            var_token = self.consume("IDENTIFIER")
-            return ASTNode("Variable", var_token["value"], position=var_token["position"])
-
-        elif token["type"] == "DELIMITER" and token["value"] == "(":
-            self.consume("DELIMITER")  # '('
-            expr = self.inspect_expression()
-            self.consume("DELIMITER")  # ')'
-            return expr
+        elif self.check(IDENTIFIER):
+            _, name, position = self.consume(IDENTIFIER)
+            return ASTNode(VARIABLE, name, position=position)
 
         else:
-            raise ValueError(f"Invalid factor: {token}")
+            raise ValueError(f"Invalid factor: {self.describe(self.current_token())}")
+
 
-# Perform lexical analysis
-analyser = LexicalAnalyser()
-tokens = analyser.analyse(source_code)
+if __name__ == "__main__":
+    # Perform lexical analysis
+    analyser = LexicalAnalyser()
+    tokens = analyser.analyse(source_code)
 
-# Parse and generate the AST
-parser = Parser(tokens)
-ast = parser.inspect_program()
-ast.display()
\ No newline at end of file
+    # Parse and generate the AST
+    parser = Parser(tokens, LineIndex(source_code))
+    ast = parser.inspect_program()
+    ast.display()
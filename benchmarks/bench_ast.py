@@ -0,0 +1,78 @@
+"""Peak memory and traversal time of ASTs with millions of nodes: the old dict-backed node
+class against the slotted, integer-tagged ASTNode.
+
+Usage: python benchmarks/bench_ast.py [statements]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from Syntax_analyzer import (ASSIGNMENT, BINARY_OPERATION, NUMBER_LITERAL, STATEMENTS, VARIABLE, ASTNode,
+                             NODE_KIND_NAMES)
+
+KINDS = (STATEMENTS, ASSIGNMENT, BINARY_OPERATION, NUMBER_LITERAL, VARIABLE)
+
+
+class LegacyASTNode:
+    """The ASTNode this benchmark replaced: a __dict__ per node, a string type, a list per leaf."""
+
+    def __init__(self, type, value=None, children=None, position=None):
+        self.type = type
+        self.value = value
+        self.children = children if children is not None else []
+        self.position = position
+
+
+def build(node_class, kinds, statements):
+    """`statements` assignments of the shape x := a + b * 3, six nodes each."""
+    statements_kind, assignment, binary, number, variable = kinds
+    body = []
+    for n in range(statements):
+        product = node_class(binary, "*", [node_class(variable, "b", position=n), node_class(number, "3", position=n)])
+        total = node_class(binary, "+", [node_class(variable, "a", position=n), product], position=n)
+        body.append(node_class(assignment, "x", [total], position=n))
+    return node_class(statements_kind, None, body)
+
+
+def traverse(root, binary, tag):
+    """Iterative walk that touches every node and counts the binary operations."""
+    count = 0
+    stack = [root]
+    pop = stack.pop
+    extend = stack.extend
+    while stack:
+        node = pop()
+        if getattr(node, tag) == binary:
+            count += 1
+        extend(node.children)
+    return count
+
+
+def measure(node_class, kinds, tag, statements):
+    tracemalloc.start()
+    root = build(node_class, kinds, statements)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    started = time.perf_counter()
+    traverse(root, kinds[2], tag)
+    return peak, time.perf_counter() - started
+
+
+def main():
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 350000
+    nodes = statements * 6 + 1
+    cases = (
+        ("dict-backed, str types", LegacyASTNode, "type", tuple(NODE_KIND_NAMES[kind] for kind in KINDS)),
+        ("slotted, int kinds", ASTNode, "kind", KINDS),
+    )
+    print(f"{nodes} nodes")
+    for label, node_class, tag, kinds in cases:
+        peak, elapsed = measure(node_class, kinds, tag, statements)
+        print(f"{label:24} peak {peak / 2 ** 20:7.1f} MiB ({peak / nodes:5.1f} B/node), traversal {elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
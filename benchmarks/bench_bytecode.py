@@ -0,0 +1,130 @@
+"""Size, load time and execution speed of .pbc bytecode against the text assembly it replaced.
+
+LegacyInterpreter is the text interpreter as it was: every step strips, splits and re-parses
+its instruction line. It runs the disassembly listing, the VM runs the mapped .pbc file.
+Usage: python benchmarks/bench_bytecode.py [statements]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import minipascal
+from bench_registers import expression_program
+from Bytecode import BytecodeProgram
+from Interpreter import Interpreter
+
+
+class LegacyInterpreter:
+    """The text interpreter's execution path, without its error branches."""
+
+    def __init__(self, assembly_code, register_count):
+        self.assembly_code = assembly_code
+        self.memory = [None] * 64
+        self.registers = dict.fromkeys(["AX", "BX", "CX", "DX"] + [f"R{n}" for n in range(4, register_count)])
+        self.registers["SP"] = []
+        self.program_counter = 0
+        self.outputs = []
+
+    def execute(self):
+        while self.program_counter < len(self.assembly_code):
+            instruction = self.assembly_code[self.program_counter].strip()
+            self.program_counter += 1
+            if not instruction or instruction.startswith(";"):
+                continue
+            self.execute_instruction(instruction)
+
+    def execute_instruction(self, instruction):
+        parts = instruction.split()
+        command = parts[0]
+        if command == "MOV":
+            self.mov(parts[1].rstrip(","), parts[2])
+        elif command == "ADD":
+            self.arithmetic(parts[1].rstrip(","), parts[2], lambda left, right: left + right)
+        elif command == "MUL":
+            self.arithmetic(parts[1].rstrip(","), parts[2], lambda left, right: left * right)
+        elif command == "SUB":
+            self.arithmetic(parts[1].rstrip(","), parts[2], lambda left, right: left - right)
+        elif command == "DIV":
+            self.arithmetic(parts[1].rstrip(","), parts[2], lambda left, right: left // right)
+        elif command == "PUSH":
+            self.registers["SP"].append(self.get_value(parts[1]))
+        elif command == "POP":
+            self.registers[parts[1]] = self.registers["SP"].pop()
+        elif command == "OUT":
+            self.outputs.append(self.get_value(parts[1]))
+        elif command == "OUT_STR":
+            self.outputs.append(self.get_value(" ".join(parts[1:])))
+
+    def mov(self, dest, src):
+        value = self.get_value(src)
+        if dest in self.registers:
+            self.registers[dest] = value
+        elif dest.startswith("$"):
+            self.memory[int(dest[1:], 16)] = value
+
+    def arithmetic(self, dest, src, operation):
+        value = self.get_value(src)
+        if dest in self.registers and isinstance(self.registers[dest], int) and isinstance(value, int):
+            self.registers[dest] = operation(self.registers[dest], value)
+
+    def get_value(self, operand):
+        if operand in self.registers:
+            return self.registers[operand]
+        elif operand.lstrip("-").isdigit():
+            return int(operand)
+        elif operand.startswith("$"):
+            return self.memory[int(operand[1:], 16)]
+        return operand[1:-1]
+
+
+def best_of(function, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        value = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, value
+
+
+def main():
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    source = expression_program(statements, 6)
+    with tempfile.TemporaryDirectory() as directory:
+        listing_path = os.path.join(directory, "output.txt")
+        result = minipascal.compile(source, output_file=listing_path)
+        listing = result.listing
+        count = len(result.program)
+        listing_size = os.path.getsize(listing_path)
+        bytecode_size = os.path.getsize(os.path.join(directory, "output.pbc"))
+
+        def run_text():
+            interpreter = LegacyInterpreter(listing, result.register_count)
+            interpreter.execute()
+            return interpreter.outputs
+
+        def load_and_run():
+            program = BytecodeProgram.load(os.path.join(directory, "output.pbc"))
+            interpreter = Interpreter(program)
+            interpreter.execute()
+            outputs = interpreter.outputs
+            del program, interpreter
+            return outputs
+
+        load_time, _ = best_of(lambda: BytecodeProgram.load(os.path.join(directory, "output.pbc")))
+        text_time, text_outputs = best_of(run_text)
+        vm_time, vm_outputs = best_of(load_and_run)
+    if text_outputs != vm_outputs:
+        raise SystemExit("outputs differ")
+
+    print(f"{count} instructions, listing {listing_size} bytes, .pbc {bytecode_size} bytes, load {load_time * 1e3:.2f}ms")
+    print(f"{'text interpreter':18} {text_time:.3f}s  {count / text_time:12,.0f} instructions/s")
+    print(f"{'bytecode VM':18} {vm_time:.3f}s  {count / vm_time:12,.0f} instructions/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Compile time without a cache, on a memory hit and on a disk hit (a new process's cache).
+
+Every cached result must run to the same outputs, with the same listing, as a fresh compilation.
+Usage: python benchmarks/bench_cache.py [statements]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import minipascal
+from Interpreter import Interpreter
+from minipascal.cache import CompileCache
+
+
+def make_source(statements):
+    body = ["a := 1; b := 2; s := \"text\";"]
+    for i in range(statements):
+        body.append(f"a := (a * {i % 7 + 2} + b) / 3 - {i}; b := b + a * 2;")
+        if i % 100 == 0:
+            body.append(f"for i := 1 to {i % 5 + 1} do begin b := b + i; write(b) end; write(s);")
+    # Nesting deeper than the recursion limit, which the disk level must store without recursing
+    body.append("write(" + "(" * 3000 + "a" + " + 1)" * 3000 + ");")
+    body.append("write(a); write(b)")
+    return "program bench; var a, b, i: integer; s: string; begin\n" + "\n".join(body) + "\nend."
+
+
+def timed(function, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        value = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, value
+
+
+def main():
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    source = make_source(statements)
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{statements} statements, {len(source)} characters")
+        print(f"{'mode':6} {'no cache ms':>12} {'memory hit ms':>14} {'disk hit ms':>12}")
+        for mode in minipascal.EXECUTION_MODES:
+            cold, fresh = timed(lambda: minipascal.compile(source, mode=mode))
+            cache = CompileCache(directory)
+            minipascal.compile(source, mode=mode, cache=cache)  # Miss: stored on both levels
+            memory, from_memory = timed(lambda: minipascal.compile(source, mode=mode, cache=cache))
+
+            def from_new_process():
+                return minipascal.compile(source, mode=mode, cache=CompileCache(directory))
+
+            disk, from_disk = timed(from_new_process)
+            expected = minipascal.run(source, mode=mode).outputs
+            for result in (from_memory, from_disk):
+                if result.listing != fresh.listing:
+                    raise SystemExit(f"cached listing differs in {mode} mode")
+                if (result.python_code is None) != (fresh.python_code is None):
+                    raise SystemExit(f"cached Python code differs in {mode} mode")
+                interpreter = Interpreter(result.program)
+                interpreter.execute()
+                if interpreter.outputs != expected:
+                    raise SystemExit(f"cached program writes different values in {mode} mode")
+            if minipascal.run(source, mode=mode, cache=cache).outputs != expected:
+                raise SystemExit(f"run() from the cache writes different values in {mode} mode")
+            print(f"{mode:6} {cold * 1e3:12.1f} {memory * 1e3:14.3f} {disk * 1e3:12.1f}")
+            print(f"       {cache.report()}")
+
+
+if __name__ == "__main__":
+    main()
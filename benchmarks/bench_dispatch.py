@@ -0,0 +1,72 @@
+"""Instructions per second of the pre-decoded dispatch loop against the decode-every-step loop.
+
+The step loop is what Interpreter.execute did before: decode the code words of every
+instruction, look up its handler by opcode and resolve each operand by kind. The dispatch
+loop is timed apart from load(), which decodes the program once; the last column includes it.
+Usage: python benchmarks/bench_dispatch.py [statements]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import minipascal
+from bench_registers import expression_program
+from check_peephole import random_program
+from Interpreter import Interpreter
+
+
+def corpus(statements):
+    rng = random.Random(3)
+    mixed = [random_program(rng) for _ in range(200)]
+    return [
+        ("expressions, 2 registers", [expression_program(statements, 6)], 2),
+        ("expressions, 8 registers", [expression_program(statements, 6)], 8),
+        ("200 mixed programs", mixed, 4),
+    ]
+
+
+def step_loop(interpreter):
+    count = len(interpreter.program)
+    while interpreter.program_counter < count:
+        interpreter.step()
+
+
+def timed(programs, run):
+    """Seconds spent in load() and in `run`, and the outputs."""
+    loading = running = 0
+    outputs = []
+    for program in programs:
+        interpreter = Interpreter(program)
+        started = time.perf_counter()
+        if run is Interpreter.execute:
+            interpreter.load()
+        loaded = time.perf_counter()
+        run(interpreter)
+        loading += loaded - started
+        running += time.perf_counter() - loaded
+        outputs.append(interpreter.outputs)
+    return loading, running, outputs
+
+
+def main():
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"{'corpus':26} {'instructions':>12} {'step loop/s':>12} {'dispatch/s':>12} {'load':>8} "
+          f"{'speedup':>8} {'with load':>9}")
+    for name, sources, register_count in corpus(statements):
+        programs = [minipascal.compile(source, register_count=register_count).program for source in sources]
+        count = sum(len(program) for program in programs)
+        step_time = min(timed(programs, step_loop)[1] for _ in range(3))
+        load_time, dispatch_time = min(timed(programs, Interpreter.execute)[:2] for _ in range(3))
+        if timed(programs, step_loop)[2] != timed(programs, Interpreter.execute)[2]:
+            raise SystemExit(f"outputs differ on {name}")
+        print(f"{name:26} {count:12} {count / step_time:12,.0f} {count / dispatch_time:12,.0f} "
+              f"{load_time * 1e3:6.1f}ms {step_time / dispatch_time:7.2f}x "
+              f"{step_time / (load_time + dispatch_time):8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Import time of the headless API and of the GUI module, each in a fresh interpreter.
+
+Usage: python benchmarks/bench_import.py [runs]
+"""
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+CASES = (
+    ("interpreter startup", "pass"),
+    ("import minipascal", "import minipascal"),
+    ("minipascal.run()", "import minipascal; minipascal.run('program p; begin write(1); end.')"),
+    ("import Main_window (GUI)", "import Main_window"),
+)
+
+
+def time_snippet(snippet, runs):
+    best = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-c", snippet], cwd=ROOT, capture_output=True, text=True)
+        elapsed = time.perf_counter() - started
+        if completed.returncode != 0:
+            return None, completed.stderr.strip().splitlines()[-1]
+        best = elapsed if best is None else min(best, elapsed)
+    return best, completed.stdout
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    baseline = None
+    for label, snippet in CASES:
+        elapsed, output = time_snippet(snippet, runs)
+        if elapsed is None:
+            print(f"{label:26} skipped: {output}")
+            continue
+        baseline = elapsed if baseline is None else baseline
+        noise = f", printed {len(output.splitlines())} lines" if output else ""
+        print(f"{label:26} {elapsed * 1000:7.1f} ms (+{(elapsed - baseline) * 1000:6.1f} ms over startup{noise})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Edit-to-diagnostic latency of the IncrementalChecker on a large source, against checking the
+whole source again, for typical edits: typing in a statement, breaking and mending a ';',
+pasting a block, editing after a statement that fails, changing a declaration, and breaking the
+header.
+
+After every edit, the diagnostics must be those of a full check of the edited text. The budget
+is for the edits checked incrementally; those falling back to a full check are marked.
+Usage: python benchmarks/bench_incremental.py [lines] [budget ms]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from Incremental_checker import IncrementalChecker, merge_edits
+
+
+def make_source(lines):
+    body = []
+    for i in range(lines):
+        kind = i % 5
+        if kind == 0:
+            body.append(f"a := (a * {i % 7 + 2} + b) / 3 - {i};")
+        elif kind == 1:
+            body.append(f"if a < {i} then b := b + 1 else b := b - 1;")
+        elif kind == 2:
+            body.append(f"for i := 1 to {i % 5 + 1} do begin b := b + i; write(b) end;")
+        elif kind == 3:
+            body.append("write(s);" if i % 1000 != 3 else "t := s;")
+        else:
+            body.append(f"while b > {i} do b := b - 1;")
+    return "program bench; var a, b, i: integer; s, t: string;\nbegin\n" + "\n".join(body) + "\nwrite(a)\nend."
+
+
+def edits(source):
+    """(name, position, removed, inserted) of each edit, applied in turn."""
+    middle = source.index(f"- {len(source) // 100};") if f"- {len(source) // 100};" in source else len(source) // 2
+    middle = source.index("a := ", middle)
+    yield "type a digit", middle + 5, 0, "1"
+    yield "type a digit", middle + 6, 0, "2"
+    yield "delete it", middle + 6, 1, ""
+    yield "delete it", middle + 5, 1, ""
+    semicolon = source.index(";", middle)
+    yield "delete ';'", semicolon, 1, ""
+    yield "type ';'", semicolon, 0, ";"
+    line_end = source.index("\n", middle)
+    yield "type a statement", line_end, 0, "\nb := a + \"x\";"
+    yield "paste 100 lines", line_end, 0, "\n" + "\n".join(f"b := b + {i};" for i in range(100))
+    # The message of a failing statement names the first token of the next one, which is edited
+    write = source.rindex("write(s);", 0, middle)
+    following = source.index("while", write) + len("whil")
+    yield "break a write", write, 9, "write(s ;"
+    yield "split next word", following, 0, "\n"
+    yield "join it again", following, 1, ""
+    yield "mend the write", write, 9, "write(s);"
+    yield "retype a type", source.index("s, t: string"), 12, "s, t: integer"
+    yield "undo it", source.index("s, t: string"), 13, "s, t: string"
+    # A header that does not parse is checked in full, the same however it came to be broken
+    colon = source.index(": integer")
+    declarations = source.index("var ") + len("var ")
+    yield "break the header", colon, 1, ""
+    yield "type 'begin' in it", declarations, 0, "begin "
+    yield "undo it", declarations, 6, ""
+    yield "mend the header", colon, 0, ":"
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    budget = float(sys.argv[2]) if len(sys.argv) > 2 else 50.0
+    source = make_source(lines)
+    checker = IncrementalChecker()
+    started = time.perf_counter()
+    checker.update(source)
+    full = time.perf_counter() - started
+    print(f"{lines} lines, {len(source)} characters, {len(checker.regions)} statements: "
+          f"full check {full * 1e3:.0f} ms, {len(checker.diagnostics())} diagnostics")
+    print(f"{'edit':18} {'ms':>8} {'reparsed':>9} {'rechecked':>10} {'diagnostics':>12}")
+    worst = 0.0
+    text = source
+    for name, position, removed, inserted in edits(source):
+        text = text[:position] + inserted + text[position + removed:]
+        started = time.perf_counter()
+        diagnostics = checker.update(text, merge_edits(None, position, removed, len(inserted)))
+        elapsed = time.perf_counter() - started
+        if not checker.full:
+            worst = max(worst, elapsed)
+        print(f"{name:18} {elapsed * 1e3:8.2f} {checker.reparsed:9} {checker.rechecked:10} {len(diagnostics):12}"
+              + ("  (full)" if checker.full else ""))
+        expected = IncrementalChecker().update(text)
+        if [(d.start, d.end, d.message) for d in diagnostics] != [(d.start, d.end, d.message) for d in expected]:
+            raise SystemExit(f"diagnostics after '{name}' differ from a full check")
+    print(f"worst incremental edit {worst * 1e3:.2f} ms, {'within' if worst * 1e3 <= budget else 'OVER'} the {budget:g} ms budget")
+    if worst * 1e3 > budget:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
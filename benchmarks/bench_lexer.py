@@ -0,0 +1,122 @@
+"""Throughput of LexicalAnalyser.analyse against the original char-by-char loop.
+
+Usage: python benchmarks/bench_lexer.py [statements]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from Lexical_analyzer import TOKEN_KIND_NAMES, LexicalAnalyser
+
+
+def legacy_analyse(code):
+    """The char-by-char loop LexicalAnalyser.analyse used before the master pattern."""
+    keywords = ["program", "var", "integer", "string", "real", "begin", "end", "if", "then", "else",
+                "while", "do", "for", "to", "write", "read"]
+    operators = [":=", "+", "-", "*", "/", "=", "<", ">", "<=", ">="]
+    delimiters = [";", ",", ".", "(", ")", ":"]
+    tokens = []
+    i = 0
+    length = len(code)
+    while i < length:
+        char = code[i]
+        if char in " \t\n\r":
+            i += 1
+            continue
+        if char.isalpha():
+            start = i
+            while i < length and (code[i].isalpha() or code[i].isdigit()):
+                i += 1
+            word = code[start:i]
+            if word in keywords:
+                tokens.append({"type": "KEYWORD", "value": word, "position": i})
+            else:
+                tokens.append({"type": "IDENTIFIER", "value": word, "position": i})
+            continue
+        if char.isdigit():
+            start = i
+            while i < length and code[i].isdigit():
+                i += 1
+            tokens.append({"type": "NUMBER", "value": code[start:i], "position": i})
+            continue
+        if char in ['"', "'"]:
+            quote_type = char
+            start = i
+            i += 1
+            while i < length and code[i] != quote_type:
+                i += 1
+            if i < length and code[i] == quote_type:
+                i += 1
+                tokens.append({"type": "STRING", "value": code[start + 1:i - 1], "position": i})
+            else:
+                raise ValueError(f"Error: Unclosed string at position {start}")
+            continue
+        if any(code[i:i + len(op)] == op for op in operators):
+            for op in operators:
+                if code[i:i + len(op)] == op:
+                    tokens.append({"type": "OPERATOR", "value": op, "position": i})
+                    i += len(op)
+                    break
+            continue
+        if char in delimiters:
+            tokens.append({"type": "DELIMITER", "value": char, "position": i})
+            i += 1
+            continue
+        if char == "{":
+            i += 1
+            while i < length and code[i] != "}":
+                i += 1
+            if i < length and code[i] == "}":
+                i += 1
+            else:
+                raise ValueError(f"Error: Unclosed comment at position {i}")
+            continue
+        raise ValueError(f"Lexical error: Invalid character '{char}' at position {i}")
+    return tokens
+
+
+def generate_source(statements):
+    lines = ["program bench;", "var a, b, c: integer;", "    s: string;", "begin"]
+    for n in range(statements):
+        lines.append(f"    a := (b + {n}) * c - {n % 7} / 3; {{ step {n} }}")
+        if n % 5 == 0:
+            lines.append(f"    s := 'line {n}';")
+            lines.append("    write(a);")
+    lines.append("end.")
+    return "\n".join(lines) + "\n"
+
+
+def best_of(function, argument, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(argument)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    source = generate_source(statements)
+    analyser = LexicalAnalyser()
+
+    # Positions now mark the start of every token, so compare kinds and values
+    legacy_stream = [(token["type"], token["value"]) for token in legacy_analyse(source)]
+    if legacy_stream != [(TOKEN_KIND_NAMES[kind], value) for kind, value, _ in analyser.analyse(source)]:
+        raise SystemExit("token streams differ")
+
+    size_mb = len(source) / 1e6
+    token_count = len(analyser.analyse(source))
+    legacy = best_of(legacy_analyse, source)
+    current = best_of(analyser.analyse, source)
+    print(f"source: {size_mb:.1f} MB, {source.count(chr(10))} lines, {token_count} tokens")
+    print(f"legacy loop:    {legacy:.3f}s  {size_mb / legacy:6.2f} MB/s  {token_count / legacy:12.0f} tokens/s")
+    print(f"master pattern: {current:.3f}s  {size_mb / current:6.2f} MB/s  {token_count / current:12.0f} tokens/s")
+    print(f"speedup: {legacy / current:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
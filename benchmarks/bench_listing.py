@@ -0,0 +1,61 @@
+"""Peak memory and time of writing a listing: the whole disassembly joined at once, against
+write_listing()'s chunked stream; and the size of the source map next to the code it describes.
+
+Usage: python benchmarks/bench_listing.py [statements]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import minipascal
+from Bytecode import write_listing
+from bench_cache import make_source
+
+
+def write_whole(program, path):
+    with open(path, "w") as f:
+        f.writelines(program.disassemble())
+
+
+def write_streamed(program, path):
+    with open(path, "w") as f:
+        write_listing(program, f)
+
+
+def measure(write, program, path):
+    """Run time, then peak memory in a second run, since tracing slows allocations down."""
+    started = time.perf_counter()
+    write(program, path)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    write(program, path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    program = minipascal.compile(make_source(statements)).program
+    source_map = program.source_map
+    map_bytes = sum(table.itemsize * len(table) for table in
+                    (source_map.firsts, source_map.starts, source_map.ends, source_map.line_starts))
+    print(f"{len(program)} instructions ({len(program.code) * 4} code bytes), source map: {len(source_map)} runs, "
+          f"{len(source_map.line_starts)} lines, {map_bytes} bytes")
+    with tempfile.TemporaryDirectory() as directory:
+        whole_path, streamed_path = os.path.join(directory, "whole.txt"), os.path.join(directory, "streamed.txt")
+        for name, write, path in (("whole", write_whole, whole_path), ("streamed", write_streamed, streamed_path)):
+            elapsed, peak = measure(write, program, path)
+            print(f"{name:9} {elapsed * 1e3:8.1f} ms  peak {peak / 1e6:7.2f} MB")
+        with open(whole_path) as whole, open(streamed_path) as streamed:
+            if whole.read() != streamed.read():
+                raise SystemExit("streamed listing differs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Per-iteration cost of loops, against the same work unrolled into straight-line code.
+
+Each workload runs `iterations` times a small body, once as a for or while loop and once
+unrolled the way programs had to be written before control flow. The loop overhead is the
+difference in run time per iteration: the counter update, the CMP and the jump. The unrolled
+program pays instead to be compiled and loaded, which is shown apart. Both forms, in both
+execution modes, must write the same values.
+Usage: python benchmarks/bench_loops.py [iterations]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import minipascal
+from Interpreter import Interpreter
+from Python_backend import load_function
+
+HEADER = "program loops; var i, j, s, t: integer; begin s := 0; t := 1;\n"
+
+
+def workloads(iterations):
+    unrolled = []
+    for i in range(1, iterations + 1):
+        unrolled.append(f"i := {i}; s := s + i * t; t := t * 7 / 8 + i;")
+    yield ("for", HEADER + f"for i := 1 to {iterations} do begin s := s + i * t; t := t * 7 / 8 + i end;\n"
+           "write(s); write(t) end.", HEADER + "\n".join(unrolled) + "\nwrite(s); write(t) end.")
+
+    unrolled = []
+    for i in range(iterations):
+        unrolled.append("s := s + i * t; t := t * 7 / 8 + i; i := i + 1;")
+    yield ("while", HEADER + f"i := 0; while i < {iterations} do begin s := s + i * t; t := t * 7 / 8 + i; "
+           "i := i + 1 end;\nwrite(s); write(t) end.",
+           HEADER + "i := 0;\n" + "\n".join(unrolled) + "\nwrite(s); write(t) end.")
+
+    # Nested loops of 10 iterations each around the same body
+    inner = 10
+    outer = iterations // inner
+    unrolled = []
+    for i in range(1, outer + 1):
+        for j in range(1, inner + 1):
+            unrolled.append(f"i := {i}; j := {j}; s := s + i * j;")
+    yield ("nested for", HEADER + f"for i := 1 to {outer} do for j := 1 to {inner} do s := s + i * j;\n"
+           "write(s) end.", HEADER + "\n".join(unrolled) + "\nwrite(s) end.")
+
+
+def measure(source, mode):
+    """Instructions, compile time, load time and run time of `source`, and what it writes.
+
+    Loading is decoding the bytecode, or defining the Python function; the run excludes it.
+    """
+    started = time.perf_counter()
+    result = minipascal.compile(source, mode=mode)
+    compile_time = time.perf_counter() - started
+    runs = []
+    for _ in range(5):
+        started = time.perf_counter()
+        if mode == "python":
+            outputs = []
+            function = load_function(result.python_code)
+        else:
+            interpreter = Interpreter(result.program)
+            interpreter.load()
+        loaded = time.perf_counter()
+        if mode == "python":
+            function(outputs.append)
+        else:
+            interpreter.execute()
+            outputs = interpreter.outputs
+        runs.append((time.perf_counter() - loaded, loaded - started))
+    run_time, load_time = min(runs)
+    return len(result.program), compile_time, load_time, run_time, outputs
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    for _, loop_source, _ in workloads(iterations):
+        measure(loop_source, "vm")  # Warm up
+    print(f"{iterations} iterations; loop / unrolled")
+    print(f"{'workload':11} {'mode':6} {'instructions':>15} {'compile ms':>16} {'load ms':>14} "
+          f"{'run ns/iteration':>17} {'loop overhead':>14}")
+    for name, loop_source, unrolled_source in workloads(iterations):
+        outputs = set()
+        for mode in minipascal.EXECUTION_MODES:
+            loop_size, loop_compile, loop_load, loop_time, loop_outputs = measure(loop_source, mode)
+            unrolled_size, unrolled_compile, unrolled_load, unrolled_time, unrolled_outputs = \
+                measure(unrolled_source, mode)
+            outputs.update((repr(loop_outputs), repr(unrolled_outputs)))
+            print(f"{name:11} {mode:6} {loop_size:6} / {unrolled_size:<6} "
+                  f"{loop_compile * 1e3:5.1f} / {unrolled_compile * 1e3:<8.1f} "
+                  f"{loop_load * 1e3:4.2f} / {unrolled_load * 1e3:<6.1f} "
+                  f"{loop_time / iterations * 1e9:6.0f} / {unrolled_time / iterations * 1e9:<6.0f} "
+                  f"{(loop_time - unrolled_time) / iterations * 1e9:9.0f} ns")
+        if len(outputs) != 1:
+            raise SystemExit(f"outputs differ on {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Memory and run time of the Interpreter's typed integer store against a list of int objects.
+
+The program declares many integer variables holding values beyond the small-int cache, as a
+large program would. ListInterpreter keeps the integers in a plain list, as the VM's memory
+was before; both run the same bytecode and must give identical outputs.
+Usage: python benchmarks/bench_memory.py [variables]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import minipascal
+from Interpreter import Interpreter
+
+
+class ListInterpreter(Interpreter):
+    def __init__(self, program):
+        super().__init__(program)
+        self.integers = list(self.integers)
+
+
+def memory_program(variables):
+    names = [f"v{i}" for i in range(variables)]
+    lines = [f"program memory; var {', '.join(names)}: integer; begin"]
+    lines.append(f"{names[0]} := 1000003;")
+    for previous, name in zip(names, names[1:]):
+        lines.append(f"{name} := {previous} + 1000003;")
+    for _ in range(3):
+        for index, name in enumerate(names[2:], 2):
+            lines.append(f"{name} := {name} + {names[index - 1]} / 7 - {names[index - 2]} / 5 + 1000003;")
+    lines.append(f"write({names[-1]});")
+    lines.append("end.")
+    return "\n".join(lines)
+
+
+def store_bytes(interpreter):
+    """Bytes held by the integer store, counting each distinct int object once."""
+    integers = interpreter.integers
+    if isinstance(integers, list):
+        return sys.getsizeof(integers) + sum(sys.getsizeof(value) for value in {id(v): v for v in integers}.values())
+    return sys.getsizeof(integers)
+
+
+def run(interpreter_class, program, repeat=5):
+    best = None
+    for _ in range(repeat):
+        interpreter = interpreter_class(program)
+        interpreter.load()
+        started = time.perf_counter()
+        interpreter.execute()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, store_bytes(interpreter), interpreter.outputs
+
+
+def main():
+    variables = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    program = minipascal.compile(memory_program(variables)).program
+    print(f"{variables} integer variables, {len(program)} instructions")
+    results = {}
+    for name, interpreter_class in (("list of ints", ListInterpreter), ("array('q')", Interpreter)):
+        elapsed, size, outputs = results[name] = run(interpreter_class, program)
+        print(f"{name:14} store {size:10,} bytes   {len(program) / elapsed:12,.0f} instructions/s")
+    if len({repr(outputs) for _, _, outputs in results.values()}) != 1:
+        raise SystemExit("outputs differ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Run time of the "python" execution mode against the bytecode Interpreter.
+
+Both run the same optimised program; the code object is built once, like a cached one, and
+its build time is reported separately. Outputs must be identical.
+Usage: python benchmarks/bench_python_backend.py [statements]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import minipascal
+import Python_backend
+from bench_registers import expression_program
+from Interpreter import Interpreter
+from Python_backend import load_function
+
+
+def best_of(function, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        value = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, value
+
+
+def run_vm(program):
+    interpreter = Interpreter(program)
+    interpreter.execute()
+    return interpreter.outputs
+
+
+def run_python(code):
+    outputs = []
+    load_function(code)(outputs.append)
+    return outputs
+
+
+def main():
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    for depth in (3, 6):
+        source = expression_program(statements, depth)
+        Python_backend.code_cache.clear()
+        started = time.perf_counter()
+        result = minipascal.compile(source, mode="python")
+        compile_time = time.perf_counter() - started
+        vm_time, vm_outputs = best_of(lambda: run_vm(result.program))
+        python_time, python_outputs = best_of(lambda: run_python(result.python_code))
+        if vm_outputs != python_outputs:
+            raise SystemExit(f"outputs differ at depth {depth}")
+        print(f"depth {depth}: {len(result.program)} instructions, compile {compile_time:.3f}s, "
+              f"vm {vm_time * 1e3:.1f}ms, python {python_time * 1e3:.1f}ms ({vm_time / python_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
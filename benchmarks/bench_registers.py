@@ -0,0 +1,76 @@
+"""Executed instructions and run time of expression-heavy programs for several register banks.
+
+The first row is the PUSH/POP scheme the code generator used before register allocation
+(one MOV per leaf, then PUSH, POP and the operation for every operator).
+Usage: python benchmarks/bench_registers.py [statements] [depth]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import minipascal
+from Bytecode import PUSH
+from Syntax_analyzer import BINARY_OPERATION, STATEMENTS
+
+
+def random_expression(depth, rng):
+    if depth == 0 or rng.random() < 0.15:
+        return rng.choice(["a", "b", "c", "d", str(rng.randint(1, 9))])
+    return f"({random_expression(depth - 1, rng)} {rng.choice('+-*')} {random_expression(depth - 1, rng)})"
+
+
+def expression_program(statements, depth, seed=7):
+    rng = random.Random(seed)
+    body = ["a := 3;", "b := 5;", "c := 7;", "d := 2;"]
+    for n in range(statements):
+        # Only e is assigned, so values stay bounded however long the program is
+        body.append(f"e := {random_expression(depth, rng)} / 97 + {n % 5};")
+        if n % 100 == 99:
+            body.append("write(e);")
+    return "program exprs; var a, b, c, d, e: integer; begin\n" + "\n".join(body) + "\nend."
+
+
+def stack_scheme_count(ast):
+    """Instructions the PUSH/POP code generator emitted for the same (unoptimised) program."""
+    count = 0
+    for statement in next(node for node in ast.children[-1].children if node.kind == STATEMENTS).children:
+        count += 1  # MOV $addr, AX or OUT AX
+        stack = [statement.children[0]]
+        while stack:
+            node = stack.pop()
+            if node.kind == BINARY_OPERATION:
+                count += 3
+                stack.extend(node.children)
+            else:
+                count += 1
+    return count
+
+
+def main():
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+    source = expression_program(statements, depth)
+
+    baseline = stack_scheme_count(minipascal.compile(source, opt_level=0).ast)
+    print(f"{'PUSH/POP scheme':18} {baseline:9} instructions")
+    expected = None
+    for register_count in (2, 3, 4, 8):
+        result = minipascal.compile(source, opt_level=0, register_count=register_count)
+        executed = len(result.instructions)
+        spills = sum(1 for opcode, _ in result.instructions if opcode == PUSH)
+        started = time.perf_counter()
+        outputs = minipascal.run(source, opt_level=0, register_count=register_count).outputs
+        elapsed = time.perf_counter() - started
+        if expected is None:
+            expected = outputs
+        elif outputs != expected:
+            raise SystemExit(f"outputs differ with {register_count} registers")
+        print(f"{register_count:2} registers       {executed:9} instructions ({executed / baseline:5.1%}), "
+              f"{spills:6} spills, run {elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Scaling of type annotation and code generation on long expression chains.
+
+Each size doubles the chain; with single-pass annotation the time per node stays flat.
+Usage: python benchmarks/bench_semantic.py [smallest_chain] [doublings]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from Lexical_analyzer import LexicalAnalyser
+from Syntax_analyzer import Parser
+from Semantic_analyzer import Semantic_analyzer
+from Code_generator import CodeGenerator
+
+
+def chain_program(length):
+    operators = "+-*"
+    terms = ["x"]
+    for n in range(1, length):
+        terms.append(operators[n % 3])
+        terms.append("(y + 1)" if n % 4 == 0 else str(n % 9 + 1))
+    return f"program chain; var x, y: integer; begin x := 1; y := 2; x := {' '.join(terms)}; write(x); end."
+
+
+def main():
+    length = int(sys.argv[1]) if len(sys.argv) > 1 else 25000
+    doublings = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    print(f"{'operators':>10} {'semantic':>10} {'us/op':>7} {'codegen':>10} {'us/op':>7}")
+    for _ in range(doublings):
+        ast = Parser(LexicalAnalyser().iter_tokens(chain_program(length))).inspect_program()
+        started = time.perf_counter()
+        semantic_analyzer = Semantic_analyzer(ast)
+        semantic_analyzer.evaluate(ast)
+        checked = time.perf_counter()
+        CodeGenerator(ast, semantic_analyzer.symbol_table).generate_code(ast)
+        generated = time.perf_counter()
+        semantic, codegen = checked - started, generated - checked
+        print(f"{length:10} {semantic:9.3f}s {semantic / length * 1e6:7.2f} {codegen:9.3f}s {codegen / length * 1e6:7.2f}")
+        length *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Peak memory and time of a run per output sink, for programs writing more and more values.
+
+A ListSink keeps every value, so its peak grows with the output; the others must stay flat.
+Usage: python benchmarks/bench_sinks.py [largest number of values]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import minipascal
+from Output_sinks import CallbackSink, ListSink, RingSink, StreamSink
+
+RING_LIMIT = 1000
+
+
+def make_source(count):
+    return ("program writes; var i: integer; s: string; begin s := \"line\";\n"
+            f"for i := 1 to {count} do begin write(i); write(s) end end.")
+
+
+def make_sinks(devnull):
+    counted = [0]
+
+    def count(value):
+        counted[0] += 1
+
+    return {"list": ListSink(), f"ring {RING_LIMIT}": RingSink(RING_LIMIT), "stream": StreamSink(devnull),
+            "callback": CallbackSink(count)}
+
+
+def measure(result, mode, sink, traced):
+    if traced:
+        tracemalloc.start()
+    started = time.perf_counter()
+    minipascal.execute(result, mode, None, sink)
+    elapsed = time.perf_counter() - started
+    peak = None
+    if traced:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    counts = [largest // 100, largest // 10, largest]
+    with open(os.devnull, "w") as devnull:
+        for mode in minipascal.EXECUTION_MODES:
+            print(f"{mode}: peak MiB / ms for {', '.join(f'{2 * count:,}' for count in counts)} values written")
+            results = {count: minipascal.compile(make_source(count), mode=mode) for count in counts}
+            for name in make_sinks(devnull):
+                row = []
+                for count in counts:
+                    # Timed without tracemalloc, which slows every allocation down
+                    _, peak = measure(results[count], mode, make_sinks(devnull)[name], True)
+                    elapsed = min(measure(results[count], mode, make_sinks(devnull)[name], False)[0]
+                                  for _ in range(3))
+                    row.append(f"{peak / 2 ** 20:8.2f} {elapsed * 1e3:8.1f}")
+                print(f"  {name:10}" + "   ".join(row))
+
+    # Every sink sees the values the list keeps
+    result = minipascal.compile(make_source(5000))
+    expected = minipascal.execute(result)
+    expected_text = result.output_text + "\n"
+    ring = RingSink(10)
+    minipascal.execute(result, sink=ring)
+    collected = []
+    minipascal.execute(result, sink=CallbackSink(collected.append))
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sink_check.tmp")
+    try:
+        with open(path, "w") as f:
+            minipascal.execute(result, sink=StreamSink(f, chunk_lines=7))
+        with open(path) as f:
+            streamed = f.read()
+    finally:
+        os.remove(path)
+    if ring.values != expected[-10:] or collected != expected or streamed != expected_text:
+        raise SystemExit("a sink disagrees with ListSink")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Cost of the instrumentation: compile and run without stats, with stats, and the Interpreter
+alone with and without a Profile, on a loop-heavy program where every iteration takes jumps.
+
+The profiled run must count exactly the instructions single-stepping executes.
+Usage: python benchmarks/bench_stats.py [outer iterations]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import minipascal
+from Interpreter import Interpreter, Profile
+
+
+def make_source(iterations):
+    return ("program loops; var i, j, s: integer; begin s := 0;\n"
+            f"for i := 1 to {iterations} do begin\n"
+            "  j := 0;\n"
+            "  while j < 500 do begin s := s + i * j - (s / 7); j := j + 1 end\n"
+            "end;\n"
+            "write(s) end.")
+
+
+def best_of(first, second, repeat=7):
+    """Best times of two functions, run alternately so both see the same machine state."""
+    best = [None, None]
+    for _ in range(repeat):
+        for index, function in enumerate((first, second)):
+            started = time.perf_counter()
+            function()
+            elapsed = time.perf_counter() - started
+            best[index] = elapsed if best[index] is None else min(best[index], elapsed)
+    return best
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    source = make_source(iterations)
+    plain, measured = best_of(lambda: minipascal.run(source), lambda: minipascal.run(source, stats=True))
+    program = minipascal.compile(source).program
+    interpreter_plain, interpreter_profiled = best_of(lambda: Interpreter(program).execute(),
+                                                      lambda: Interpreter(program, profile=Profile()).execute())
+
+    profile = Profile()
+    profiled = Interpreter(program, profile=profile)
+    profiled.execute()
+    stepped = Interpreter(program)
+    counts = [0] * len(program)
+    while stepped.program_counter < len(program):
+        counts[stepped.program_counter] += 1
+        stepped.step()
+    if profile.instruction_counts(len(program)) != counts or profiled.steps != sum(counts):
+        raise SystemExit("profiled counts differ from single-stepping")
+
+    print(f"{profiled.steps:,} instructions")
+    print(f"run()           {plain * 1e3:8.1f} ms   with stats {measured * 1e3:8.1f} ms  ({measured / plain:.2f}x)")
+    print(f"Interpreter     {interpreter_plain * 1e3:8.1f} ms   profiled   {interpreter_profiled * 1e3:8.1f} ms  "
+          f"({interpreter_profiled / interpreter_plain:.2f}x)")
+    print(minipascal.run(source, stats=True).stats.format(5))
+
+
+if __name__ == "__main__":
+    main()
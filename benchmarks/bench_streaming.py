@@ -0,0 +1,58 @@
+"""Peak memory of parsing a program file: full token list against mmap + iter_tokens streaming.
+
+Usage: python benchmarks/bench_streaming.py [statements]
+"""
+import mmap
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from Lexical_analyzer import LexicalAnalyser
+from Syntax_analyzer import Parser
+from bench_lexer import generate_source
+
+
+def parse_in_memory(path):
+    with open(path) as f:
+        source = f.read()
+    tokens = LexicalAnalyser().analyse(source)
+    return Parser(tokens).inspect_program()
+
+
+def parse_streaming(path):
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        analyser = LexicalAnalyser()
+        return Parser(analyser.iter_tokens(mapped), analyser.line_index).inspect_program()
+
+
+def measure(function, path):
+    tracemalloc.start()
+    started = time.perf_counter()
+    ast = function(path)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return ast, elapsed, peak
+
+
+def main():
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    with tempfile.NamedTemporaryFile("w", suffix=".pas", delete=False) as f:
+        f.write(generate_source(statements))
+        path = f.name
+    try:
+        print(f"source: {os.path.getsize(path) / 2 ** 20:.1f} MiB")
+        for label, function in (("str + token list", parse_in_memory), ("mmap + iter_tokens", parse_streaming)):
+            _, elapsed, peak = measure(function, path)
+            print(f"{label:20} {elapsed:6.2f}s  peak {peak / 2 ** 20:7.1f} MiB (AST included)")
+    finally:
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""Time every stage of the pipeline on synthetic programs, each scaled along one axis.
+
+    python benchmarks/bench_suite.py --save-baseline baseline.json
+    python benchmarks/bench_suite.py --baseline baseline.json
+
+A stage is flagged as a regression when it takes more than (1 + threshold) times its baseline
+time and at least MIN_REGRESSION_SECONDS more, even after the cases that regressed are run again;
+the script then exits with status 1. Baselines are only comparable on the same machine, Python
+and --scale, so none is kept in the repository.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from generate_programs import generate
+from Lexical_analyzer import LexicalAnalyser
+from Syntax_analyzer import Parser
+from Semantic_analyzer import Semantic_analyzer
+from Optimizer import Optimizer
+from Code_generator import CodeGenerator
+from Peephole_optimizer import PeepholeOptimizer
+from Interpreter import Interpreter
+
+STAGES = ("lex", "parse", "semantic", "optimize", "codegen", "assemble", "run")
+# Differences smaller than this are noise on any machine, whatever their ratio
+MIN_REGRESSION_SECONDS = 0.001
+REGISTER_COUNT = 4
+
+# Axes of the program every case starts from; statements and string volume grow with --scale
+BASE_AXES = {"variables": 20, "statements": 1000, "depth": 2, "width": 3, "string_volume": 0, "loops": 0,
+             "loop_count": 100, "loop_body": 4}
+# Each case changes one axis of the base program
+CASES = {
+    "base": {},
+    "variables": {"variables": 2000},
+    "statements": {"statements": 5000},
+    "depth": {"depth": 4},
+    "width": {"width": 6},
+    "strings": {"string_volume": 32000},  # Literals of STRING_LITERAL_LENGTH in half the statements
+    "loops": {"loops": 100},
+}
+SCALED_AXES = ("statements", "string_volume", "loops")
+
+
+def case_axes(name, scale):
+    axes = dict(BASE_AXES, **CASES[name])
+    for axis in SCALED_AXES:
+        axes[axis] = int(axes[axis] * scale)
+    return axes
+
+
+def time_stages(source):
+    """Seconds each stage takes on `source`, run through a fresh pipeline."""
+    seconds = {}
+    started = time.perf_counter()
+
+    def lap(stage):
+        nonlocal started
+        now = time.perf_counter()
+        seconds[stage] = now - started
+        started = now
+
+    analyser = LexicalAnalyser()
+    tokens = analyser.analyse(source)
+    lap("lex")
+    ast = Parser(tokens, analyser.line_index).inspect_program()
+    lap("parse")
+    semantic_analyzer = Semantic_analyzer(ast)
+    semantic_analyzer.evaluate(ast)
+    lap("semantic")
+    Optimizer(ast, semantic_analyzer.symbol_table, 1, REGISTER_COUNT).optimize(ast)
+    lap("optimize")
+    code_generator = CodeGenerator(ast, semantic_analyzer.symbol_table, None, REGISTER_COUNT)
+    code_generator.generate_code(ast)
+    lap("codegen")
+    instructions, positions = PeepholeOptimizer().optimize(code_generator.instructions, code_generator.positions())
+    code_generator.instructions = instructions
+    program = code_generator.assemble(positions, analyser.line_index.starts())
+    lap("assemble")
+    Interpreter(program).execute()
+    lap("run")
+    return seconds
+
+
+def run_cases(names, scale, repeat, seed):
+    """Best time of each stage of each case over `repeat` runs; the cases are run in turn, so
+    that a slow spell of the machine does not fall on one case only."""
+    sources = {name: generate(seed, **case_axes(name, scale)) for name in names}
+    best = {name: {} for name in names}
+    for _ in range(repeat):
+        for name in names:
+            gc.collect()  # Garbage of the previous run is not collected during this one
+            for stage, seconds in time_stages(sources[name]).items():
+                best[name][stage] = min(best[name].get(stage, seconds), seconds)
+    return best
+
+
+def compare(results, baseline, threshold):
+    """(case, stage, seconds, baseline seconds) of every stage that regressed."""
+    regressions = []
+    for name, stages in results.items():
+        for stage, seconds in stages.items():
+            before = baseline["cases"].get(name, {}).get(stage)
+            if before is None:
+                continue
+            if seconds > before * (1 + threshold) and seconds - before >= MIN_REGRESSION_SECONDS:
+                regressions.append((name, stage, seconds, before))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies statements, string volume and loops")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of each case; the best time is kept")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the results to PATH")
+    parser.add_argument("--baseline", metavar="PATH", help="compare the results with those saved in PATH")
+    parser.add_argument("--threshold", type=float, default=0.15, help="slowdown tolerated, as a fraction")
+    arguments = parser.parse_args()
+
+    baseline = None
+    if arguments.baseline is not None:
+        with open(arguments.baseline) as f:
+            baseline = json.load(f)
+        if baseline["scale"] != arguments.scale or baseline["seed"] != arguments.seed:
+            raise SystemExit(f"{arguments.baseline} was recorded with --scale {baseline['scale']} "
+                             f"--seed {baseline['seed']}")
+
+    results = run_cases(arguments.cases, arguments.scale, arguments.repeat, arguments.seed)
+    print(f"{'case':12}" + "".join(f"{stage:>10}" for stage in STAGES) + f"{'total':>10}   (ms)")
+    for name, stages in results.items():
+        print(f"{name:12}" + "".join(f"{stages[stage] * 1e3:10.1f}" for stage in STAGES)
+              + f"{sum(stages.values()) * 1e3:10.1f}")
+
+    if arguments.save_baseline is not None:
+        with open(arguments.save_baseline, "w") as f:
+            json.dump({"python": platform.python_version(), "scale": arguments.scale, "seed": arguments.seed,
+                       "cases": results}, f, indent=1)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, arguments.threshold)
+        if regressions:
+            # Confirm them: a slowdown that is only noise rarely survives as many more runs
+            names = sorted({name for name, _, _, _ in regressions}, key=arguments.cases.index)
+            for name, stages in run_cases(names, arguments.scale, arguments.repeat, arguments.seed).items():
+                for stage, seconds in stages.items():
+                    results[name][stage] = min(results[name][stage], seconds)
+            regressions = compare(results, baseline, arguments.threshold)
+        for name, stage, seconds, before in regressions:
+            print(f"regression: {name} {stage} {before * 1e3:.1f} ms -> {seconds * 1e3:.1f} ms "
+                  f"({seconds / before:.2f}x)")
+        if regressions:
+            raise SystemExit(1)
+        print(f"no stage slower than {1 + arguments.threshold:.2f}x its baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""Peak memory per 1M tokens: the old dict tokens against (kind, value, position) tuples.
+
+Usage: python benchmarks/bench_tokens.py [statements]
+"""
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from Lexical_analyzer import LexicalAnalyser
+from bench_lexer import generate_source, legacy_analyse
+
+
+def peak_bytes(function, argument):
+    tracemalloc.start()
+    tokens = function(argument)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return len(tokens), peak
+
+
+def main():
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 70000
+    source = generate_source(statements)
+    for label, function in (("dict tokens", legacy_analyse), ("token tuples", LexicalAnalyser().analyse)):
+        count, peak = peak_bytes(function, source)
+        per_million = peak * 1e6 / count / 2 ** 20
+        print(f"{label:14} {count} tokens, peak {peak / 2 ** 20:7.1f} MiB, {per_million:7.1f} MiB per 1M tokens")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Time and memory to show the Tree and Symbol Table views of a large program: one widget item
+per node or symbol, as the views were built before, against the lazy models of Item_models.
+
+Each view is shown, expanded down to the statements for the tree, then shown again with the
+same artifact, then scrolled to the bottom.
+Memory is the growth of the resident set. Needs PyQt5; runs offscreen.
+Usage: python benchmarks/bench_views.py [statements] [variables]
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from PyQt5.QtWidgets import QApplication, QTableView, QTableWidget, QTableWidgetItem, QTreeView, QTreeWidget, \
+    QTreeWidgetItem
+
+import minipascal
+from Item_models import ASTModel, SymbolTableModel
+
+
+def resident_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def make_source(statements, variables):
+    names = [f"v{i}" for i in range(variables)]
+    body = [f"{names[i % variables]} := ({names[(i * 7) % variables]} + {i}) * 3 - {names[(i * 3) % variables]};"
+            for i in range(statements)]
+    return f"program views; var {', '.join(names)}: integer; begin\n" + "\n".join(body) + "\nend."
+
+
+def populate_items(tree, node):
+    """The former CompilerInterface.populate_tree: every node becomes a QTreeWidgetItem."""
+    tree.clear()
+    stack = [(node, None)]
+    while stack:
+        node, parent_item = stack.pop()
+        label = f"{node.type}: {node.value or ''}"
+        if node.value_type is not None:
+            label += f"  [{node.value_type}]"
+        item = QTreeWidgetItem([label])
+        if parent_item is None:
+            tree.addTopLevelItem(item)
+        else:
+            parent_item.addChild(item)
+        stack.extend((child, item) for child in reversed(node.children))
+
+
+def fill_table(table, symbol_table):
+    """The former populate_symbol_table: three QTableWidgetItems per symbol."""
+    symbols = symbol_table.as_dict()
+    table.clearContents()
+    table.setRowCount(len(symbols))
+    for row, (name, details) in enumerate(symbols.items()):
+        table.setItem(row, 0, QTableWidgetItem(name))
+        table.setItem(row, 1, QTableWidgetItem(details["type"]))
+        table.setItem(row, 2, QTableWidgetItem(str(details["address"])))
+
+
+def measure(app, view, show):
+    """Seconds to show, to show again, and to scroll to the bottom; resident memory growth."""
+    view.resize(800, 600)
+    view.show()
+    before = resident_bytes()
+    times = []
+    for step in (show, show, view.scrollToBottom):
+        started = time.perf_counter()
+        step()
+        app.processEvents()
+        times.append(time.perf_counter() - started)
+    return times, resident_bytes() - before
+
+
+def main():
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    variables = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    app = QApplication(sys.argv)
+    result = minipascal.compile(make_source(statements, variables))
+    print(f"{statements} statements, {variables} variables")
+
+    def show_tree_model():
+        if tree_view.model() is None or tree_view.model().root is not result.ast:
+            tree_view.setModel(ASTModel(result.ast))
+        tree_view.expandToDepth(2)
+
+    def show_table_model():
+        if table_view.model() is None or table_view.model().symbol_table is not result.symbol_table:
+            table_view.setModel(SymbolTableModel(result.symbol_table))
+
+    tree_widget, tree_view = QTreeWidget(), QTreeView()
+    tree_view.setUniformRowHeights(True)
+    table_widget, table_view = QTableWidget(), QTableView()
+    table_widget.setColumnCount(3)
+    cases = (("tree, items", tree_widget, lambda: (populate_items(tree_widget, result.ast), tree_widget.expandToDepth(2))),
+             ("tree, model", tree_view, show_tree_model),
+             ("table, items", table_widget, lambda: fill_table(table_widget, result.symbol_table)),
+             ("table, model", table_view, show_table_model))
+    print(f"{'view':13} {'show ms':>9} {'again ms':>9} {'scroll ms':>9} {'memory MB':>10}")
+    for name, view, show in cases:
+        (first, again, scroll), memory = measure(app, view, show)
+        print(f"{name:13} {first * 1e3:9.1f} {again * 1e3:9.1f} {scroll * 1e3:9.1f} {memory / 1e6:10.1f}")
+        view.hide()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Equivalence check of the peephole pass: random programs are run by the Interpreter before and
+after PeepholeOptimizer, and their outputs must match. So must those of programs nesting
+DEEP_NESTING statements, which also run in "python" mode. Also prints the per-rule hit counters.
+
+Usage: python benchmarks/check_peephole.py [programs] [seed]
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import minipascal
+from Bytecode import assemble
+from Interpreter import Interpreter
+from Peephole_optimizer import PeepholeOptimizer
+
+VARIABLES = "abcd"
+# Deeper than Python's recursion limit, which parsing and compiling statements must not hit
+DEEP_NESTING = 2000
+
+
+def random_expression(depth, rng):
+    if depth == 0 or rng.random() < 0.3:
+        return rng.choice(list(VARIABLES) + ["0", "1", str(rng.randint(2, 9))])
+    operator = rng.choice("+-*/")
+    right = random_expression(depth - 1, rng)
+    if operator == "/":
+        right = f"({right} * {right} + 1)"  # Never zero
+    return f"({random_expression(depth - 1, rng)} {operator} {right})"
+
+
+def random_condition(rng):
+    operator = rng.choice(["=", "<>", "<", "<=", ">", ">="])
+    return f"{random_expression(rng.randint(0, 2), rng)} {operator} {random_expression(rng.randint(0, 2), rng)}"
+
+
+def random_statements(rng, count, depth=0):
+    """Statements at nesting `depth`; loops at depth k count with i<k> or w<k> up to a small bound
+    (possibly n<k>), which nothing else assigns, so they always end."""
+    body = []
+    for _ in range(count):
+        choice = rng.random()
+        if choice < 0.35:
+            body.append(f"{rng.choice(VARIABLES)} := {random_expression(rng.randint(0, 5), rng)}")
+        elif choice < 0.45:
+            body.append(f"{rng.choice(VARIABLES)} := {rng.choice(VARIABLES)}")
+        elif choice < 0.75:
+            body.append(f"write({random_expression(rng.randint(0, 3), rng)})")
+        elif choice < 0.8 or depth == 3:
+            body.append(rng.choice(["write(s)", 'write("a, b")']))
+        elif choice < 0.88:
+            statement = f"if {random_condition(rng)} then {random_block(rng, depth + 1)}"
+            if rng.random() < 0.5:
+                statement += f" else {random_block(rng, depth + 1)}"
+            body.append(statement)
+        elif choice < 0.94:
+            limit = str(rng.randint(0, 3))
+            if rng.random() < 0.5:  # A limit held in memory
+                body.append(f"n{depth} := {limit}")
+                limit = f"n{depth}"
+            body.append(f"for i{depth} := {rng.randint(0, 3)} to {limit} do {random_block(rng, depth + 1)}")
+        else:
+            counter = f"w{depth}"
+            body.append(f"{counter} := {rng.randint(0, 3)}")
+            body.append(f"while {counter} < {rng.randint(1, 4)} do begin {random_block(rng, depth + 1)}; "
+                        f"{counter} := {counter} + 1 end")
+    return body
+
+
+def random_block(rng, depth):
+    statements = random_statements(rng, rng.randint(1, 3), depth)
+    if len(statements) == 1 and rng.random() < 0.5:
+        return statements[0]
+    return "begin " + "; ".join(statements) + " end"
+
+
+def random_program(rng):
+    body = [f"{name} := {rng.randint(0, 9)};" for name in VARIABLES]
+    body.append('s := "x, y";')
+    body.extend(statement + ";" for statement in random_statements(rng, rng.randint(1, 25)))
+    return ("program check; var a, b, c, d, i0, i1, i2, n0, n1, n2, w0, w1, w2: integer; s: string; begin\n"
+            + "\n".join(body) + "\nend.")
+
+
+def deep_programs(rng):
+    """An else-if chain of DEEP_NESTING arms, and as many ifs, whiles and blocks inside each other."""
+    arms = " else ".join(f"if a = {arm} then write({arm})" for arm in range(DEEP_NESTING))
+    yield f"program chain; var a: integer; begin a := {rng.randrange(DEEP_NESTING)}; {arms}; write(a) end."
+    heads = [rng.choice(["if a < b then ", "while a < b do ", "begin "]) for _ in range(DEEP_NESTING)]
+    yield ("program nested; var a, b: integer; begin a := 0; b := 3; " + "".join(heads) + "a := a + 1"
+           + " end" * heads.count("begin ") + "; write(a) end.")
+
+
+def execute(instructions, result):
+    program = assemble(instructions, result.register_count, result.program.slot_types)
+    interpreter = Interpreter(program)
+    interpreter.execute()
+    return interpreter.outputs
+
+
+def main():
+    programs = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    rng = random.Random(int(sys.argv[2]) if len(sys.argv) > 2 else 1)
+    peephole = PeepholeOptimizer()
+    before = after = 0
+    for number in range(programs):
+        source = random_program(rng)
+        result = minipascal.compile(source, opt_level=0, register_count=rng.choice((2, 3, 4)))
+        optimized = peephole.optimize(result.instructions)
+        if execute(optimized, result) != execute(result.instructions, result):
+            raise SystemExit(f"program {number} differs after the peephole pass:\n{source}")
+        before += len(result.instructions)
+        after += len(optimized)
+    print(f"{programs} programs equivalent, {before} -> {after} instructions ({after / before:.1%})")
+    for name, hits in peephole.report()["hits"].items():
+        print(f"  {name:18} {hits}")
+    for source in deep_programs(rng):
+        result = minipascal.compile(source, opt_level=0)
+        outputs = execute(result.instructions, result)
+        if execute(peephole.optimize(result.instructions), result) != outputs:
+            raise SystemExit(f"{source[:40]}... differs after the peephole pass")
+        if minipascal.run(source, mode="python").outputs != outputs:
+            raise SystemExit(f"{source[:40]}... differs in python mode")
+    print(f"statements nested {DEEP_NESTING} deep equivalent")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Synthetic MiniPascal programs, scaled along independent axes.
+
+    python benchmarks/generate_programs.py --statements 20000 --depth 3 > big.pas
+    python benchmarks/generate_programs.py --count 100 --directory corpus/
+
+Every program is valid and runs to completion. Integer assignments divide their expression by
+the sum of its terms' weights, so values stay within the largest literal or loop bound and the
+Interpreter never takes its overflow path; divisors are literals or (v * v + 1), never zero.
+"""
+import argparse
+import os
+import random
+import sys
+
+# Integer variables declared per line
+DECLARATIONS_PER_LINE = 20
+# Characters in one string literal at most; the string volume is split into literals this long
+STRING_LITERAL_LENGTH = 64
+# Variables written at the end of the program, so the work done is observable
+WRITTEN_AT_END = 8
+STRING_ALPHABET = "abcdefghijklmnopqrstuvwxyz ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789,.!?"
+
+
+class ProgramGenerator:
+    """Builds one program; every axis is a constructor argument.
+
+    variables     integer variables declared, on top of the loop counters
+    statements    statements of the program, including those in loop bodies
+    depth, width  every expression is `width` terms combined `depth` levels deep, so it has
+                  width ** depth leaves
+    string_volume characters of string literals in the program
+    loops         for and while loops, alternately, each with `loop_body` of the statements
+    loop_count    iterations of each loop
+    """
+
+    def __init__(self, variables=20, statements=1000, depth=2, width=3, string_volume=0, loops=0,
+                 loop_count=100, loop_body=4, seed=0):
+        if variables < 1 or statements < 0 or depth < 0 or width < 1:
+            raise ValueError("variables and width must be at least 1, statements and depth at least 0")
+        if loops * loop_body > statements:
+            raise ValueError(f"{loops} loops of {loop_body} statements need at least {loops * loop_body} statements")
+        self.variables = [f"v{index}" for index in range(variables)]
+        self.statements = statements
+        self.depth = depth
+        self.width = width
+        self.string_volume = string_volume
+        self.loops = loops
+        self.loop_count = loop_count
+        self.loop_body = loop_body
+        self.random = random.Random(seed)
+
+    def generate(self):
+        string_count = -(-self.string_volume // STRING_LITERAL_LENGTH)  # Literals holding the volume
+        string_variables = ["s0", "s1"] if string_count else []
+        counters = [f"l{index}" for index in range(self.loops)]
+        lines = ["program synthetic;", "var"]
+        names = self.variables + counters
+        for start in range(0, len(names), DECLARATIONS_PER_LINE):
+            lines.append("  " + ", ".join(names[start:start + DECLARATIONS_PER_LINE]) + ": integer;")
+        if string_variables:
+            lines.append("  " + ", ".join(string_variables) + ": string;")
+        lines.append("begin")
+        lines.extend(f"{variable} := \"\";" for variable in string_variables)  # Written at the end
+
+        # Which of the top-level statements are loops, and which assign strings
+        simple = self.statements - self.loops * self.loop_body
+        slots = simple + self.loops
+        loop_slots = set(self.random.sample(range(slots), self.loops)) if self.loops else set()
+        string_slots = set(self.random.sample([slot for slot in range(slots) if slot not in loop_slots],
+                                              min(string_count, simple)))
+        literal_lengths = self.split_volume(self.string_volume, len(string_slots))
+        loop = 0
+        for slot in range(slots):
+            if slot in loop_slots:
+                lines.append(self.loop_statement(counters[loop], loop % 2 == 1))
+                loop += 1
+            elif slot in string_slots:
+                variable = self.random.choice(string_variables)
+                lines.append(f"{variable} := \"{self.string_literal(literal_lengths.pop())}\";")
+            else:
+                lines.append(self.simple_statement())
+        for variable in self.variables[:WRITTEN_AT_END]:
+            lines.append(f"write({variable});")
+        lines.extend(f"write({variable});" for variable in string_variables)
+        lines.append("end.")
+        return "\n".join(lines) + "\n"
+
+    def split_volume(self, volume, count):
+        """Lengths of `count` literals adding up to `volume`."""
+        if not count:
+            return []
+        base, extra = divmod(volume, count)
+        return [base + (index < extra) for index in range(count)]
+
+    def string_literal(self, length):
+        return "".join(self.random.choice(STRING_ALPHABET) for _ in range(length))
+
+    def simple_statement(self, counter=None):
+        """An assignment, mostly; else an if or a write of a variable."""
+        choice = self.random.random()
+        if choice < 0.8:
+            return self.assignment(counter)
+        elif choice < 0.95:
+            condition = f"{self.expression(counter)[0]} {self.random.choice(('<', '>', '<=', '>=', '=', '<>'))} " \
+                        f"{self.operand(counter)[0]}"
+            return f"if {condition} then {self.assignment(counter)[:-1]} else {self.assignment(counter)}"
+        return f"write({self.random.choice(self.variables)});"
+
+    def assignment(self, counter=None):
+        expression, weight = self.expression(counter)
+        if weight > 1:
+            expression = f"{expression} / {weight}"
+        return f"{self.random.choice(self.variables)} := {expression};"
+
+    def loop_statement(self, counter, as_while):
+        """A loop over `counter`, whose body assigns only the program's variables."""
+        body = " ".join(self.simple_statement(counter) for _ in range(self.loop_body))
+        if as_while:
+            return (f"{counter} := 0; while {counter} < {self.loop_count} do begin {body} "
+                    f"{counter} := {counter} + 1 end;")
+        return f"for {counter} := 1 to {self.loop_count} do begin {body} end;"
+
+    def expression(self, counter=None):
+        """(source, weight): `width` terms combined `depth` levels deep, whose value is at most
+        `weight` times the largest value of a variable or literal."""
+        return self.combine(self.depth, counter)
+
+    def combine(self, depth, counter):
+        if depth == 0:
+            return self.operand(counter)
+        terms = [self.combine(depth - 1, counter) for _ in range(self.width)]
+        source = terms[0][0]
+        for term, _ in terms[1:]:
+            source += f" {self.random.choice('+-')} {term}"
+        weight = sum(term_weight for _, term_weight in terms)
+        return (f"({source})" if self.width > 1 else source), weight
+
+    def operand(self, counter=None):
+        """(source, weight) of a leaf: a variable, a literal, a small multiple or a quotient."""
+        choice = self.random.random()
+        variable = counter if counter is not None and choice < 0.2 else self.random.choice(self.variables)
+        if choice < 0.5:
+            return variable, 1
+        elif choice < 0.7:
+            return str(self.random.randint(0, 9)), 1
+        elif choice < 0.85:
+            factor = self.random.randint(2, 5)
+            return f"({variable} * {factor})", factor
+        divisor = self.random.choice(self.variables)
+        return f"({variable} / ({divisor} * {divisor} + 1))", 1
+
+
+def generate(seed=0, **axes):
+    """Source of a program; see ProgramGenerator for the axes."""
+    return ProgramGenerator(seed=seed, **axes).generate()
+
+
+def add_axis_arguments(parser):
+    parser.add_argument("--variables", type=int, default=20)
+    parser.add_argument("--statements", type=int, default=1000)
+    parser.add_argument("--depth", type=int, default=2, help="levels of nesting of each expression")
+    parser.add_argument("--width", type=int, default=3, help="terms combined at each level")
+    parser.add_argument("--string-volume", type=int, default=0, help="characters of string literals")
+    parser.add_argument("--loops", type=int, default=0)
+    parser.add_argument("--loop-count", type=int, default=100, help="iterations of each loop")
+    parser.add_argument("--loop-body", type=int, default=4, help="statements in each loop")
+
+
+def axes_of(arguments):
+    return {"variables": arguments.variables, "statements": arguments.statements, "depth": arguments.depth,
+            "width": arguments.width, "string_volume": arguments.string_volume, "loops": arguments.loops,
+            "loop_count": arguments.loop_count, "loop_body": arguments.loop_body}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    add_axis_arguments(parser)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--count", type=int, default=1, help="programs to generate, with seeds seed, seed+1, ...")
+    parser.add_argument("--directory", help="write synthetic<seed>.pas files there instead of to stdout")
+    arguments = parser.parse_args()
+    axes = axes_of(arguments)
+    if arguments.directory is None:
+        for seed in range(arguments.seed, arguments.seed + arguments.count):
+            sys.stdout.write(generate(seed, **axes))
+        return
+    os.makedirs(arguments.directory, exist_ok=True)
+    for seed in range(arguments.seed, arguments.seed + arguments.count):
+        with open(os.path.join(arguments.directory, f"synthetic{seed}.pas"), "w") as f:
+            f.write(generate(seed, **axes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Headless entry point to the MiniPascal compiler.
+
+    import minipascal
+    result = minipascal.run(source)
+    print(result.output_text)
+
+`python -m minipascal` compiles and runs files in batch, see minipascal.cli.
+With stats=True, result.stats tells where the time went, see minipascal.stats.
+With sink=, the values written go to an output sink instead of a list, see Output_sinks.
+Importing the package does no work: each stage module is only imported the
+first time compile() or run() needs it, and PyQt5 is never imported.
+"""
+
+# Execution modes of run(): the bytecode Interpreter, or the AST compiled to a Python function
+EXECUTION_MODES = ("vm", "python")
+
+
+class Result:
+    """Artifacts of one compilation, plus the program outputs once it has been run (as far as the
+    output sink of the run kept them)."""
+
+    def __init__(self, ast, symbol_table, instructions, program, optimization=None):
+        self.ast = ast
+        self.symbol_table = symbol_table
+        self.instructions = instructions  # CodeGenerator's (opcode, operands) pairs
+        self.program = program  # The assembled BytecodeProgram
+        # Code object from PythonBackend, in "python" mode; None if Python rejected the generated source
+        self.python_code = None
+        # Optimizer.report(): level, folds, instructions eliminated, plus the peephole rule hits
+        self.optimization = optimization
+        self.outputs = None
+        self.stats = None  # minipascal.stats.Stats, when compiled with stats=True
+
+    @property
+    def register_count(self):
+        return self.program.register_count
+
+    @property
+    def source_map(self):
+        """SourceMap of the program: the source range and line of each instruction."""
+        return self.program.source_map
+
+    @property
+    def listing(self):
+        """Disassembly of the program, as a list of lines."""
+        return self.program.disassemble()
+
+    @property
+    def output_text(self):
+        return "\n".join(str(item) for item in self.outputs or ())
+
+
+def compile(source, output_file=None, opt_level=1, register_count=4, mode="vm", cache=None, stats=False):
+    """Lex, parse, check and assemble `source`. Nothing is written unless output_file is given: a
+    path, to write the listing to and save the bytecode next to as .pbc, or a text file object to
+    stream the listing to.
+
+    opt_level is passed to Optimizer: 0 disables it, 1 folds constants, 2 adds algebraic identities.
+    From level 1 on, the generated instructions also go through PeepholeOptimizer.
+    register_count is the size of the register bank the code generator allocates from.
+    In "python" mode, the optimised AST is also compiled to a Python code object, unless it nests
+    blocks deeper than Python allows.
+    cache is a minipascal.cache.CompileCache: a hit skips every stage, a miss stores the result.
+    With stats, each stage is measured into result.stats (a minipascal.stats.Stats); the tokens
+    are then all read before parsing starts, so that lexing and parsing are measured apart, and
+    the cache is not looked up, so that every stage runs, though the result is still stored.
+    """
+    if mode not in EXECUTION_MODES:
+        raise ValueError(f"Unknown execution mode {mode!r}, expected one of {', '.join(EXECUTION_MODES)}")
+    from minipascal.stats import Stats, measure
+
+    measurements = Stats() if stats else None
+    if cache is not None:
+        with measure(measurements, "cache"):
+            key = cache.key(source, opt_level, register_count, mode)
+            # Stats are about the stages, which a hit would skip: it is only stored then
+            result = cache.get(key) if measurements is None else None
+        if result is not None:
+            if output_file is not None:
+                from Bytecode import write_listing
+
+                with measure(measurements, "write"):
+                    write_listing(result.program, output_file)
+            result.stats = measurements
+            return result
+    from Lexical_analyzer import LexicalAnalyser
+    from Syntax_analyzer import Parser
+    from Semantic_analyzer import Semantic_analyzer
+    from Optimizer import Optimizer
+    from Code_generator import CodeGenerator
+    from Peephole_optimizer import PeepholeOptimizer
+
+    analyser = LexicalAnalyser()
+    tokens = analyser.iter_tokens(source)
+    if measurements is not None:
+        with measure(measurements, "lex"):
+            tokens = list(tokens)
+    with measure(measurements, "parse"):
+        parser = Parser(tokens, analyser.line_index)
+        ast_root = parser.inspect_program()
+    with measure(measurements, "semantic"):
+        semantic_analyzer = Semantic_analyzer(ast_root)
+        semantic_analyzer.evaluate(ast_root)
+        symbol_table = semantic_analyzer.symbol_table
+    with measure(measurements, "optimize"):
+        optimizer = Optimizer(ast_root, symbol_table, opt_level, register_count)
+        optimizer.optimize(ast_root)
+    with measure(measurements, "codegen"):
+        code_generator = CodeGenerator(ast_root, symbol_table, output_file, register_count)
+        code_generator.generate_code(ast_root)
+        positions = code_generator.positions()
+    report = optimizer.report()
+    if opt_level >= 1:
+        with measure(measurements, "peephole"):
+            peephole = PeepholeOptimizer()
+            code_generator.instructions, positions = peephole.optimize(code_generator.instructions, positions)
+        report["peephole"] = peephole.report()
+    with measure(measurements, "assemble"):
+        program = code_generator.assemble(positions, analyser.line_index.starts())
+    if output_file is not None:
+        with measure(measurements, "write"):
+            code_generator.write_to_file(program)
+    result = Result(ast_root, symbol_table, code_generator.instructions, program, report)
+    if mode == "python":
+        from Python_backend import PythonBackend
+
+        with measure(measurements, "python"):
+            backend = PythonBackend(ast_root, symbol_table)
+            try:
+                backend.generate_code(ast_root)
+                result.python_code = backend.compile()
+            except SyntaxError:
+                pass  # Too many nested loops or levels of indentation: run() uses the Interpreter
+    if cache is not None:
+        with measure(measurements, "cache store"):
+            cache.put(key, result)
+    result.stats = measurements
+    return result
+
+
+def run(source, output_file=None, opt_level=1, register_count=4, mode="vm", cache=None, budget=None, stats=False,
+        sink=None):
+    """Compile `source` and execute it in the given mode; the values it writes end up in result.outputs,
+    or in `sink`."""
+    result = compile(source, output_file, opt_level, register_count, mode, cache, stats)
+    execute(result, mode, budget, sink)
+    return result
+
+
+def execute(result, mode="vm", budget=None, sink=None):
+    """Run a compiled Result in the given mode, writing its values to `sink`; the values the sink
+    keeps are stored in result.outputs and returned (None for a sink that keeps none).
+
+    sink is an Output_sinks sink, a ListSink by default; it is flushed once the run is over,
+    even if it fails. budget is an Interpreter.Budget limiting the run, which then raises
+    RuntimeError. Python code does not count instructions: with a max_steps, the program runs
+    on the Interpreter. If the result has stats, the run is measured into them as the "run"
+    stage; on the Interpreter, what it executed is profiled too.
+    """
+    from minipascal.stats import measure
+    from Output_sinks import ListSink
+
+    own_sink = sink is None
+    if own_sink:
+        sink = ListSink()
+    try:
+        with measure(result.stats, "run"):
+            run_sink = sink
+            if mode == "python" and result.python_code is not None and (budget is None or budget.max_steps is None):
+                from Python_backend import load_function
+
+                check = None
+                if budget is not None:
+                    budget.start()
+                    check = budget.check
+                try:
+                    load_function(result.python_code)(sink.write, check)
+                    result.outputs = sink.values
+                    return result.outputs
+                except (TypeError, ZeroDivisionError):
+                    # Rerun on the Interpreter, which fails the same way with its own message. A sink
+                    # given by the caller already has the values written up to there: the rerun
+                    # writes them elsewhere
+                    run_sink = ListSink()
+                    if own_sink:
+                        sink = run_sink
+            from Interpreter import Interpreter, Profile
+
+            profile = Profile() if result.stats is not None else None
+            interpreter = Interpreter(result.program, budget, profile, run_sink)
+            try:
+                interpreter.execute()
+            finally:
+                if profile is not None:
+                    result.stats.record_profile(profile, result.program, interpreter.steps)
+            result.outputs = sink.values
+            return result.outputs
+    finally:
+        sink.flush()
@@ -0,0 +1,5 @@
+import sys
+
+from minipascal.cli import main
+
+sys.exit(main())
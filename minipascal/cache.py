@@ -0,0 +1,251 @@
+"""Two-level cache of compilation results, keyed by a hash of the source.
+
+    cache = CompileCache(directory=default_directory())
+    result = minipascal.compile(source, cache=cache)
+
+The first level is an in-process LRU bounded by the estimated size of its entries. The second,
+optional, is a directory of artifacts: the bytecode as a .pbc file, which is mapped back on a
+hit, and the AST, symbol table, instruction list and optimisation report pickled next to it.
+Keys cover the source, the compiler (a hash of its stage modules), the Python version, the
+optimisation level, the register count and the execution mode, so a stale entry is never
+hit; it is only left behind until purge().
+"""
+import hashlib
+import importlib.util
+import marshal
+import os
+import pickle
+import sys
+from collections import OrderedDict
+
+# Modules whose code decides what compile() produces, or how it is stored here
+STAGE_MODULES = ("Lexical_analyzer", "Syntax_analyzer", "Semantic_analyzer", "Symbol_table", "Optimizer",
+                 "Code_generator", "Peephole_optimizer", "Bytecode", "Python_backend", "minipascal",
+                 "minipascal.cache")
+BYTECODE_SUFFIX = ".pbc"
+ARTIFACTS_SUFFIX = ".artifacts"
+
+# Rough in-memory footprint of the parts of a result, used to bound the LRU
+NODE_SIZE = 150  # An ASTNode, its children list and its value
+INSTRUCTION_SIZE = 150  # An (opcode, operands) tuple with its operand pairs
+DEFAULT_MAX_BYTES = 64 << 20
+
+compiler_version = None  # Computed on first use by version()
+
+
+def version():
+    """Hash of the compiler stage sources, this module's included, so that editing any of them
+    (the artifact format, say) changes every key."""
+    global compiler_version
+    if compiler_version is None:
+        digest = hashlib.sha256()
+        for name in STAGE_MODULES:
+            with open(importlib.util.find_spec(name).origin, "rb") as f:
+                digest.update(f.read())
+        compiler_version = digest.hexdigest()[:16]
+    return compiler_version
+
+
+def default_directory():
+    """$MINIPASCAL_CACHE_DIR, or minipascal/ under the user cache directory."""
+    directory = os.environ.get("MINIPASCAL_CACHE_DIR")
+    if directory:
+        return directory
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "minipascal")
+
+
+def flatten_ast(root):
+    """The AST as a preorder list of (kind, value, position, end, value_type, slot, child count)
+    tuples.
+
+    Pickling the nodes themselves would recurse once per level of nesting.
+    """
+    records = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        records.append((node.kind, node.value, node.position, node.end, node.value_type, node.slot,
+                        len(node.children)))
+        stack.extend(reversed(node.children))
+    return records
+
+
+def rebuild_ast(records):
+    from Syntax_analyzer import ASTNode
+
+    root = None
+    parents = []  # [node, children still to attach]
+    for kind, value, position, end, value_type, slot, child_count in records:
+        node = ASTNode(kind, value, [] if child_count else None, position)
+        node.end = end
+        node.value_type = value_type
+        node.slot = slot
+        if parents:
+            parent = parents[-1]
+            parent[0].children.append(node)
+            parent[1] -= 1
+            if not parent[1]:
+                parents.pop()
+        else:
+            root = node
+        if child_count:
+            parents.append([node, child_count])
+    return root
+
+
+def estimate_size(result):
+    """Approximate bytes held by a cached result."""
+    program = result.program
+    size = len(program.code) * 4 + sum(len(str(constant)) for constant in program.constants)
+    size += len(result.instructions) * INSTRUCTION_SIZE
+    nodes = 0
+    stack = [result.ast]
+    while stack:
+        node = stack.pop()
+        nodes += 1
+        stack.extend(node.children)
+    return size + nodes * NODE_SIZE
+
+
+class CompileCache:
+    """LRU of compilation results in memory, backed by an artifact directory when one is given.
+
+    get() and put() take a key from key(); minipascal.compile() does both when given a cache.
+    Hits hand out a new Result sharing the cached artifacts, which nothing downstream modifies.
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (result, size), least recently used first
+        self.size = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def key(self, source, opt_level=1, register_count=4, mode="vm"):
+        digest = hashlib.sha256(f"{version()}\0{sys.implementation.cache_tag}\0{opt_level}\0{register_count}"
+                                f"\0{mode}\0".encode("ascii"))
+        digest.update(source.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """A fresh Result for `key`, or None on a miss."""
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.memory_hits += 1
+            return self.copy(entry[0])
+        result = self.read(key) if self.directory is not None else None
+        if result is None:
+            self.misses += 1
+            return None
+        self.disk_hits += 1
+        self.remember(key, result)
+        return self.copy(result)
+
+    def put(self, key, result):
+        self.remember(key, result)
+        if self.directory is not None:
+            self.write(key, result)
+
+    def invalidate(self, key):
+        """Drop the entry for `key` from both levels."""
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+        if self.directory is not None:
+            for path in self.paths(key):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def purge(self, disk=True):
+        """Empty the memory level and, unless disk is False, the artifact directory."""
+        self.entries.clear()
+        self.size = 0
+        if disk and self.directory is not None:
+            for name in os.listdir(self.directory):
+                if name.endswith((BYTECODE_SUFFIX, ARTIFACTS_SUFFIX)):
+                    os.remove(os.path.join(self.directory, name))
+
+    def report(self):
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "bytes": self.size,
+        }
+
+    def remember(self, key, result):
+        size = estimate_size(result)
+        if size > self.max_bytes:
+            return
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.size -= previous[1]
+        self.entries[key] = (result, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.size -= evicted_size
+            self.evictions += 1
+
+    def copy(self, result):
+        from minipascal import Result
+
+        copy = Result(result.ast, result.symbol_table, result.instructions, result.program, result.optimization)
+        copy.python_code = result.python_code
+        return copy
+
+    def paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + BYTECODE_SUFFIX, base + ARTIFACTS_SUFFIX
+
+    def write(self, key, result):
+        """Store the artifacts of `result`; each file is renamed into place once complete."""
+        bytecode_path, artifacts_path = self.paths(key)
+        artifacts = {
+            "ast": flatten_ast(result.ast),
+            "symbol_table": result.symbol_table,
+            "instructions": result.instructions,
+            "optimization": result.optimization,
+            "python_code": None if result.python_code is None else marshal.dumps(result.python_code),
+        }
+        # The artifacts go last: they are what read() looks for
+        for path, data in ((bytecode_path, result.program.to_bytes()),
+                           (artifacts_path, pickle.dumps(artifacts, pickle.HIGHEST_PROTOCOL))):
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as f:
+                f.write(data)
+            os.replace(temporary, path)
+
+    def read(self, key):
+        """The Result stored for `key`, or None; an unreadable entry is removed."""
+        from minipascal import Result
+        from Bytecode import BytecodeProgram
+
+        bytecode_path, artifacts_path = self.paths(key)
+        try:
+            with open(artifacts_path, "rb") as f:
+                artifacts = pickle.load(f)
+            program = BytecodeProgram.load(bytecode_path)
+            python_code = artifacts["python_code"]
+            result = Result(rebuild_ast(artifacts["ast"]), artifacts["symbol_table"], artifacts["instructions"],
+                            program, artifacts["optimization"])
+            result.python_code = None if python_code is None else marshal.loads(python_code)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Truncated or otherwise damaged files fail in many ways (struct.error, unpickling
+            # errors, a record of the wrong shape): the entry is dropped and compiled again
+            self.invalidate(key)
+            return None
+        return result
@@ -0,0 +1,178 @@
+"""Headless batch driver: compile and run MiniPascal files, one JSON line of results per file.
+
+    python -m minipascal [options] FILE|DIRECTORY|GLOB ...
+
+Directories are searched recursively for .pas files. Files are split into chunks that a pool of
+worker processes compiles and runs; with a single worker, everything runs in this process.
+Results are written as soon as a chunk is done, or in input order with --ordered.
+--scaling runs the whole batch once per worker count instead, and reports the throughput.
+--stats adds to each result the time and allocations of every stage, and the instructions the
+run executed per opcode and on its hottest lines.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import minipascal
+
+SOURCE_SUFFIX = ".pas"
+STATS_TOP_LINES = 10  # Hottest source lines listed in the stats of a result
+
+worker_cache = None  # CompileCache of this process, set by start_worker() when --cache-dir is given
+
+
+def expand_inputs(inputs):
+    """Paths of the files named by `inputs`, in order and without duplicates."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            found = sorted(glob.glob(os.path.join(item, "**", "*" + SOURCE_SUFFIX), recursive=True))
+        elif glob.has_magic(item):
+            found = sorted(glob.glob(item, recursive=True))
+        else:
+            found = [item]
+        paths.extend(found)
+    return list(dict.fromkeys(paths))
+
+
+def start_worker(cache_directory):
+    global worker_cache
+    if cache_directory is not None:
+        from minipascal.cache import CompileCache
+
+        worker_cache = CompileCache(cache_directory)
+
+
+def process_file(path, options):
+    """Compile and run one file; its result as a JSON-ready dict."""
+    result = {"file": path, "ok": False}
+    started = time.perf_counter()
+    compiled = None
+    try:
+        with open(path, encoding="utf-8") as f:
+            source = f.read()
+        compiled = minipascal.compile(source, opt_level=options["opt_level"],
+                                      register_count=options["register_count"], mode=options["mode"],
+                                      cache=worker_cache, stats=options["stats"])
+        compiled_at = time.perf_counter()
+        result["compile_ms"] = round((compiled_at - started) * 1e3, 3)
+        budget = None
+        if options["max_steps"] is not None or options["time_limit"] is not None:
+            from Interpreter import Budget
+
+            budget = Budget(options["max_steps"], options["time_limit"])
+        sink = None
+        if options["tail_outputs"] is not None:
+            from Output_sinks import RingSink
+
+            sink = RingSink(options["tail_outputs"])
+        outputs = minipascal.execute(compiled, options["mode"], budget, sink)
+        result["run_ms"] = round((time.perf_counter() - compiled_at) * 1e3, 3)
+        result["outputs"] = outputs
+        result["ok"] = True
+    except Exception as error:
+        result["error"] = f"{type(error).__name__}: {error}"
+    if compiled is not None and compiled.stats is not None:
+        result["stats"] = compiled.stats.as_dict(STATS_TOP_LINES)
+    result["total_ms"] = round((time.perf_counter() - started) * 1e3, 3)
+    return result
+
+
+def process_chunk(paths, options):
+    return [process_file(path, options) for path in paths]
+
+
+def run_batch(paths, options, workers, chunk_size, ordered=False):
+    """Yield the result of every file; in input order if `ordered`, else as chunks complete."""
+    chunks = [paths[start:start + chunk_size] for start in range(0, len(paths), chunk_size)]
+    if workers > 1 and len(chunks) > 1:
+        try:
+            executor = ProcessPoolExecutor(workers, initializer=start_worker,
+                                           initargs=(options["cache_directory"],))
+        except (OSError, NotImplementedError) as error:
+            print(f"minipascal: no process pool ({error}), running in this process", file=sys.stderr)
+        else:
+            with executor:
+                futures = [executor.submit(process_chunk, chunk, options) for chunk in chunks]
+                for future in (futures if ordered else as_completed(futures)):
+                    yield from future.result()
+            return
+    start_worker(options["cache_directory"])
+    for chunk in chunks:
+        yield from process_chunk(chunk, options)
+
+
+def worker_counts(maximum):
+    """1, 2, 4, ... up to `maximum`, which is always included."""
+    counts = []
+    count = 1
+    while count < maximum:
+        counts.append(count)
+        count *= 2
+    return counts + [maximum]
+
+
+def parse_arguments(arguments):
+    parser = argparse.ArgumentParser(prog="minipascal", description=__doc__.split("\n")[0])
+    parser.add_argument("inputs", nargs="+", help=".pas files, directories or glob patterns")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="files per task sent to a worker (default: about 4 tasks per worker)")
+    parser.add_argument("--ordered", action="store_true", help="write results in input order")
+    parser.add_argument("--mode", choices=minipascal.EXECUTION_MODES, default="vm")
+    parser.add_argument("-O", "--opt-level", type=int, choices=(0, 1, 2), default=1)
+    parser.add_argument("--registers", type=int, default=4, help="register bank size")
+    parser.add_argument("--max-steps", type=int, help="stop a program after this many instructions")
+    parser.add_argument("--time-limit", type=float, help="stop a program after this many seconds")
+    parser.add_argument("--tail-outputs", type=int, metavar="N",
+                        help="keep only the last N values each program writes, so memory does not grow with them")
+    parser.add_argument("--cache-dir", help="share compiled artifacts through this directory")
+    parser.add_argument("--stats", action="store_true",
+                        help="add per-stage timings and the run's instruction profile to each result")
+    parser.add_argument("--scaling", action="store_true",
+                        help="time the batch for 1, 2, 4, ... workers instead of writing results")
+    return parser.parse_args(arguments)
+
+
+def main(arguments=None):
+    arguments = parse_arguments(arguments)
+    if arguments.workers < 1:
+        raise SystemExit("minipascal: --workers must be at least 1")
+    if arguments.tail_outputs is not None and arguments.tail_outputs < 1:
+        raise SystemExit("minipascal: --tail-outputs must be at least 1")
+    paths = expand_inputs(arguments.inputs)
+    if not paths:
+        raise SystemExit("minipascal: no input files")
+    options = {"opt_level": arguments.opt_level, "register_count": arguments.registers, "mode": arguments.mode,
+               "cache_directory": arguments.cache_dir, "max_steps": arguments.max_steps,
+               "time_limit": arguments.time_limit, "stats": arguments.stats,
+               "tail_outputs": arguments.tail_outputs}
+    chunk_size = arguments.chunk_size or max(1, len(paths) // (arguments.workers * 4))
+
+    if arguments.scaling:
+        baseline = None
+        for workers in worker_counts(arguments.workers):
+            started = time.perf_counter()
+            failed = sum(not result["ok"] for result in run_batch(paths, options, workers, chunk_size))
+            elapsed = time.perf_counter() - started
+            baseline = baseline or elapsed
+            print(json.dumps({"workers": workers, "files": len(paths), "failed": failed,
+                              "seconds": round(elapsed, 3), "files_per_second": round(len(paths) / elapsed, 1),
+                              "speedup": round(baseline / elapsed, 2)}), flush=True)
+        return 0
+
+    started = time.perf_counter()
+    failed = 0
+    for result in run_batch(paths, options, arguments.workers, chunk_size, arguments.ordered):
+        failed += not result["ok"]
+        sys.stdout.write(json.dumps(result) + "\n")
+    sys.stdout.flush()
+    elapsed = time.perf_counter() - started
+    print(f"minipascal: {len(paths)} files, {failed} failed, {elapsed:.2f}s, "
+          f"{len(paths) / elapsed:.1f} files/s with -j {arguments.workers}", file=sys.stderr)
+    return 1 if failed else 0
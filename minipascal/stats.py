@@ -0,0 +1,130 @@
+"""Where the time of a compilation and of a run goes.
+
+    result = minipascal.run(source, stats=True)
+    print(result.stats.format())
+
+Each stage is timed, and its allocations counted, as it runs. A run on the Interpreter also
+records which instructions it executed (Interpreter.Profile), summed per opcode and per source
+line once it is over. Without stats=True nothing of this is measured.
+"""
+import sys
+import time
+import tracemalloc
+from contextlib import nullcontext
+
+# Stands for the measurement of a stage when there is no Stats to record it in
+NOT_MEASURED = nullcontext()
+
+
+class Phase:
+    """Measurements of one stage.
+
+    blocks is the net change in the number of memory blocks Python has allocated, which
+    costs nothing to read; bytes and peak_bytes are only measured while tracemalloc traces.
+    """
+    __slots__ = ("name", "seconds", "blocks", "bytes", "peak_bytes")
+
+    def __init__(self, name, seconds, blocks, bytes=None, peak_bytes=None):
+        self.name = name
+        self.seconds = seconds
+        self.blocks = blocks
+        self.bytes = bytes
+        self.peak_bytes = peak_bytes
+
+    def as_dict(self):
+        phase = {"name": self.name, "ms": round(self.seconds * 1e3, 3), "blocks": self.blocks}
+        if self.bytes is not None:
+            phase["bytes"] = self.bytes
+            phase["peak_bytes"] = self.peak_bytes
+        return phase
+
+
+class Measurement:
+    """Context manager timing one stage into a Stats, even if the stage raises."""
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.tracing = tracemalloc.is_tracing()
+        if self.tracing:
+            tracemalloc.reset_peak()
+            self.traced = tracemalloc.get_traced_memory()[0]
+        self.blocks = sys.getallocatedblocks()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        seconds = time.perf_counter() - self.started
+        blocks = sys.getallocatedblocks() - self.blocks
+        phase = Phase(self.name, seconds, blocks)
+        if self.tracing:
+            traced, peak = tracemalloc.get_traced_memory()
+            phase.bytes = traced - self.traced
+            phase.peak_bytes = peak - self.traced
+        self.stats.phases.append(phase)
+        return False
+
+
+def measure(stats, name):
+    """Context manager measuring a stage into `stats`, or doing nothing if it is None."""
+    return NOT_MEASURED if stats is None else Measurement(stats, name)
+
+
+class Stats:
+    """Measurements of one compile() and of the execute() of its result, in the order the
+    stages ran. instructions, opcodes and lines are filled in by a run on the Interpreter:
+    opcodes and lines map an opcode name or a source line to the instructions executed for it,
+    most first."""
+
+    def __init__(self):
+        self.phases = []
+        self.instructions = None
+        self.opcodes = None
+        self.lines = None
+
+    def phase(self, name):
+        """The last measurement of the stage called `name`, or None."""
+        for phase in reversed(self.phases):
+            if phase.name == name:
+                return phase
+        return None
+
+    @property
+    def seconds(self):
+        return sum(phase.seconds for phase in self.phases)
+
+    def record_profile(self, profile, program, steps):
+        self.instructions = steps
+        self.opcodes = profile.opcode_counts(program)
+        self.lines = profile.line_counts(program)
+
+    def as_dict(self, top_lines=None):
+        """JSON-ready dict; only the `top_lines` hottest lines are kept if it is given."""
+        stats = {"phases": [phase.as_dict() for phase in self.phases], "total_ms": round(self.seconds * 1e3, 3)}
+        if self.instructions is not None:
+            lines = list(self.lines.items())
+            if top_lines is not None:
+                lines = lines[:top_lines]
+            stats["instructions"] = self.instructions
+            stats["opcodes"] = self.opcodes
+            # JSON objects only have string keys: lines are listed as [line, count] pairs
+            stats["lines"] = [[line, count] for line, count in lines]
+        return stats
+
+    def format(self, top_lines=20):
+        """Human-readable report, for the GUI."""
+        rows = [f"{'Stage':14}{'ms':>12}{'blocks':>12}"]
+        for phase in self.phases:
+            rows.append(f"{phase.name:14}{phase.seconds * 1e3:12.3f}{phase.blocks:+12,}")
+        rows.append(f"{'total':14}{self.seconds * 1e3:12.3f}")
+        if self.instructions is not None:
+            total = self.instructions or 1
+            rows += ["", f"Instructions executed: {self.instructions:,}", "", f"{'Opcode':14}{'count':>14}{'%':>8}"]
+            for name, count in self.opcodes.items():
+                rows.append(f"{name:14}{count:14,}{count * 100 / total:8.1f}")
+            rows += ["", f"{'Line':14}{'count':>14}{'%':>8}"]
+            for line, count in list(self.lines.items())[:top_lines]:
+                rows.append(f"{line:<14}{count:14,}{count * 100 / total:8.1f}")
+        return "\n".join(rows)